@@ -0,0 +1,64 @@
+"""Measure how long doudough takes to import
+
+Runs each target in a fresh interpreter with `python -X importtime`, reporting
+the wall time (best of --repeat) and the modules with the largest cumulative
+import time.  Use it to check that the cli stays fast (`doudough --help` should
+not import dash, fava or pandas) and to see what a worker pays on boot:
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py doudough.app --top 30
+"""
+
+import argparse
+import subprocess
+import sys
+import time
+
+TARGETS = ["doudough", "doudough.cli", "doudough.app"]
+HEAVY = ["dash", "fava.core", "pandas", "plotly.express", "networkx", "beanquery"]
+
+
+def import_time(module: str) -> tuple[float, list[tuple[int, str]], list[str]]:
+    """Wall time (s), (cumulative us, module) per import, and heavy modules loaded"""
+    code = "import sys, {0}; print(*[m for m in {1!r} if m in sys.modules])".format(
+        module, HEAVY
+    )
+    t0 = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    elapsed = time.perf_counter() - t0
+
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        imports.append((int(cumulative), name.strip()))
+    return elapsed, sorted(imports, reverse=True), result.stdout.split()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("targets", nargs="*", default=TARGETS)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    for target in args.targets:
+        runs = [import_time(target) for _ in range(args.repeat)]
+        best, imports, heavy = min(runs, key=lambda run: run[0])
+        print(
+            "{}: {:.0f} ms (best of {}), heavy: {}".format(
+                target, best * 1000, args.repeat, ", ".join(heavy) or "none"
+            )
+        )
+        for cumulative, name in imports[: args.top]:
+            print("  {:>8.1f} ms  {}".format(cumulative / 1000, name))
+
+
+if __name__ == "__main__":
+    main()
@@ -1 +1,8 @@
-from .cli import main
+def __getattr__(name):
+    # Keep `import doudough` cheap: the cli (and the app behind it) are only
+    # imported when the entry point is actually used
+    if name == "main":
+        from .cli import main
+
+        return main
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
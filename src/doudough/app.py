@@ -1,5 +1,6 @@
 """Doudough app shell""" ""
 import importlib
+import logging
 import os
 import os.path
 from pathlib import Path
@@ -16,8 +17,11 @@ from dash_iconify import DashIconify
 from flask import Flask
 from flask_babel import Babel
 
+from . import compression, export, serialization
 from .pages import home
-from .pages.app_shell import header, navbar
+from .pages.app_shell import clientside, events, header, navbar, source_view
+
+log = logging.getLogger(__name__)
 
 # Required for dash_mantine_components
 _dash_renderer._set_react_version("18.2.0")
@@ -32,8 +36,19 @@ def create_app(
     *,
     # load: bool = False,
     incognito: bool = False,
-    # read_only: bool = False,
+    read_only: bool = False,
     fava_app=None,
+    compress_level: int = compression.DEFAULT_LEVEL,
+    compress_min_size: int = compression.DEFAULT_MIN_SIZE,
+    precompress_assets: bool = False,
+    max_ledgers: int | None = None,
+    ledger_ttl: float | None = None,
+    memory_budget: int | None = None,
+    warmup: bool = True,
+    snapshot_dir: str | None = None,
+    cache: str | None = "memory",
+    cache_size: int | None = None,
+    poll_watcher: bool = False,
 ) -> Flask:
     """Create a doudough Flask application.
 
@@ -42,6 +57,17 @@ def create_app(
         load: Whether to load the Beancount files directly.
         incognito: Whether to run in incognito mode.
         read_only: Whether to run in read-only mode.
+        compress_level: gzip/brotli level for responses, 0 to disable.
+        compress_min_size: Smallest response (bytes) worth compressing.
+        precompress_assets: Whether to write compressed copies of the assets.
+        max_ledgers: Most ledgers to keep loaded at once.
+        ledger_ttl: Unload ledgers idle for this many seconds.
+        memory_budget: Unload idle ledgers to stay under this many MB.
+        warmup: Whether to precompute default views after loading a ledger.
+        snapshot_dir: Where to share postings tables between worker processes.
+        cache: Cache backend for computed views, see `core.cache.create_cache`.
+        cache_size: Most MB the sqlite cache may hold.
+        poll_watcher: Whether to use the polling file watcher.
     """
 
     # Taken from fava.application.create_app, disabling the fava parts that dash does not need
@@ -57,6 +83,26 @@ def create_app(
 
     # fava_app.config["HAVE_EXCEL"] = HAVE_EXCEL
     fava_app.config["BEANCOUNT_FILES"] = [os.path.abspath(str(f)) for f in files]
+    fava_app.config["COMPRESS_LEVEL"] = compress_level
+    fava_app.config["COMPRESS_MIN_SIZE"] = (
+        compress_min_size if compress_level else float("inf")
+    )
+    if precompress_assets and compress_level:
+        try:
+            written = compression.precompress_assets(app.config.assets_folder)
+        except OSError as e:
+            log.warning("Could not precompress the assets: %s", e)
+        else:
+            log.info("Precompressed %d assets", len(written))
+    fava_app.config["LEDGER_MAX_LOADED"] = max_ledgers
+    fava_app.config["LEDGER_TTL"] = ledger_ttl
+    fava_app.config["LEDGER_MEMORY_BUDGET"] = memory_budget
+    fava_app.config["LEDGER_WARMUP"] = warmup
+    fava_app.config["SNAPSHOT_DIR"] = snapshot_dir
+    fava_app.config["CACHE_URL"] = cache
+    fava_app.config["CACHE_SIZE"] = cache_size
+    fava_app.config["POLL_WATCHER"] = poll_watcher
+    fava_app.config["READ_ONLY"] = read_only
     # fava_app.config["INCOGNITO"] = incognito
     # Don't load this - slows down serialization?? create ledger another way using global functions
     # fava_app.config["LEDGERS"] = _LedgerSlugLoader(
@@ -81,6 +127,8 @@ app = Dash(
 )
 
 # create_app(["personal.beancount"], fava_app=app.server)
+serialization.install(app)
+compression.init_app(app)
 
 dmc.add_figure_templates(default="mantine_light")
 ICON_STYLE = "-rounded"
@@ -98,8 +146,11 @@ register_page(
 for module, icon in [
     ("income_statement", "material-symbols:bar-chart" + ICON_STYLE),
     ("balance_sheet", "material-symbols:area-chart" + ICON_STYLE),
+    ("holdings", "material-symbols:pie-chart" + ICON_STYLE),
+    ("prices", "material-symbols:show-chart" + ICON_STYLE),
     ("journal", "material-symbols:lists" + ICON_STYLE),
     ("payee_renamer", "material-symbols:account-balance" + ICON_STYLE),
+    ("duplicates", "material-symbols:content-copy" + ICON_STYLE),
     ("errors", "material-symbols:error" + ICON_STYLE),
     ("options", "material-symbols:settings" + ICON_STYLE),
 ]:
@@ -119,6 +170,8 @@ for module, icon in [
 shell = dmc.AppShell(
     [
         header.layout,
+        *events.layout,
+        *source_view.layout,
         navbar.layout(),  # Create after pages have registered
         dmc.AppShellMain(page_container),
         # aside.layout,
@@ -146,3 +199,6 @@ layout = dmc.MantineProvider(shell, theme={"primaryColor": "green"})
 
 
 app.layout = layout
+events.init_app(app)
+export.init_app(app)
+clientside.init_app(app)  # After all pages have declared their callbacks
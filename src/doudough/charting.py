@@ -1,21 +1,24 @@
 from collections import defaultdict
 from dataclasses import dataclass
-from typing import List
+from typing import TYPE_CHECKING, List
 
-import networkx as nx
+import numpy as np
 from beancount.core.convert import get_weight
 from beancount.core.data import Transaction
-from fava.core.tree import SerialisedTreeNode
-from plotly import express as px, graph_objects as go
+from plotly import graph_objects as go
 
 from .pages.utils import yield_tree_nodes
 
+if TYPE_CHECKING:
+    from fava.core.tree import SerialisedTreeNode
+
 
 class CHART_TYPES:
 
     class BREAKDOWN:
-        icycle = px.icicle
-        sunburst = px.sunburst
+        # Names of plotly.express functions, which is only imported to draw
+        icycle = "icicle"
+        sunburst = "sunburst"
 
 
 @dataclass
@@ -49,7 +52,7 @@ class BreakdownParams:
 
 
 def create_breakdown_chart(
-    node: SerialisedTreeNode,
+    node: "SerialisedTreeNode",
     currency,
     graph_type="icycle",
     scale="Blues",
@@ -78,6 +81,11 @@ def create_breakdown_chart(
         for n in yield_tree_nodes(node)
     }
 
+    if isinstance(graph_type, str):
+        from plotly import express as px
+
+        graph_type = getattr(px, getattr(CHART_TYPES.BREAKDOWN, graph_type))
+
     sd = []
     mx = max(lookup.values())
     if mx < 0:
@@ -112,9 +120,6 @@ def create_breakdown_chart(
             }
         )
 
-    if isinstance(graph_type, str):
-        graph_type = getattr(CHART_TYPES.BREAKDOWN, graph_type)
-
     fig = graph_type(
         sd,
         names="name",
@@ -136,7 +141,7 @@ def truncate_account(acct: str, maxdepth: int):
 
 
 def _to_hierarchy_links(
-    root_node: SerialisedTreeNode, currency, max_hierarchy=2
+    root_node: "SerialisedTreeNode", currency, max_hierarchy=2
 ) -> list:
 
     bp = BreakdownParams.from_account(root_node.account)
@@ -170,8 +175,8 @@ def _to_hierarchy_links(
 
 
 def create_hierarchy_sankey_data(
-    left: SerialisedTreeNode,
-    right: SerialisedTreeNode,
+    left: "SerialisedTreeNode",
+    right: "SerialisedTreeNode",
     currency,
     net_labels=("PROFIT", "LOSS"),
     max_hierarchy=2,
@@ -226,6 +231,8 @@ def create_hierarchy_sankey_data(
     # The default layout doesn't work super well in plotly
     # Results are better if we sort the nodes first with a good
     # digraph algorithm
+    import networkx as nx
+
     dag = nx.DiGraph([l[:2] for l in links])
     # pos = nx.multipartite_layout(dag)
     label = list(nx.topological_sort(dag))
@@ -241,9 +248,9 @@ def create_hierarchy_sankey_data(
         "align": "left",
     }
     link = {
-        "source": [idx[s] for s in source],
-        "target": [idx[t] for t in target],
-        "value": value,
+        "source": np.array([idx[s] for s in source], dtype="i4"),
+        "target": np.array([idx[t] for t in target], dtype="i4"),
+        "value": np.array(value, dtype=float),
     }
     return node, link
 
@@ -326,9 +333,9 @@ def to_sankey_data(txns: List[Transaction], maxdepth=2):
         # y=[i / len(nodes) for i in range(len(nodes))],
     )
     link = dict(
-        source=source,
-        target=target,
-        value=list(map(float, value)),
+        source=np.array(source, dtype="i4"),
+        target=np.array(target, dtype="i4"),
+        value=np.array(value, dtype=float),
     )
 
     return node, link
@@ -6,9 +6,22 @@ from pathlib import Path
 
 import click
 from fava import __version__
-from fava.cli import NonAbsolutePathError, NoFileSpecifiedError
 
-from .app import app, create_app
+from .compression import DEFAULT_LEVEL, DEFAULT_MIN_SIZE
+
+# The app (and with it dash, fava and every page) is only imported once the
+# command line has been parsed, so that --help and --version stay fast
+
+
+class NonAbsolutePathError(click.UsageError):  # noqa: D101
+    # As fava.cli.NonAbsolutePathError, which would import all of fava
+    def __init__(self, path: str) -> None:
+        super().__init__(f"Paths in BEANCOUNT_FILE need to be absolute: {path}")
+
+
+class NoFileSpecifiedError(click.UsageError):  # noqa: D101
+    def __init__(self) -> None:
+        super().__init__("No file specified")
 
 
 def _add_env_filenames(filenames: tuple[str, ...]) -> tuple[str, ...]:
@@ -73,6 +86,70 @@ def _add_env_filenames(filenames: tuple[str, ...]) -> tuple[str, ...]:
     help="Output directory for profiling data.",
 )
 @click.option("--poll-watcher", is_flag=True, help="Use old polling-based watcher.")
+@click.option(
+    "--max-ledgers",
+    type=click.IntRange(1),
+    metavar="<n>",
+    help="Keep at most this many ledgers loaded, loading others on demand.",
+)
+@click.option(
+    "--ledger-ttl",
+    type=click.FloatRange(0, min_open=True),
+    metavar="<seconds>",
+    help="Unload ledgers which have not been used for this long.",
+)
+@click.option(
+    "--memory-budget",
+    type=click.IntRange(1),
+    metavar="<MB>",
+    help="Unload least recently used ledgers to stay under this much memory.",
+)
+@click.option(
+    "--warmup/--no-warmup",
+    default=True,
+    show_default=True,
+    help="Precompute the default views of each ledger after it loads.",
+)
+@click.option(
+    "--snapshot-dir",
+    type=click.Path(file_okay=False),
+    help="Share postings tables between worker processes through this directory.",
+)
+@click.option(
+    "--cache",
+    default="memory",
+    show_default=True,
+    metavar="<url>",
+    help="Where to cache computed views: none, memory, sqlite:///<path> (shared "
+    "by the workers on a host) or redis://<host>:<port>/<db>.",
+)
+@click.option(
+    "--cache-size",
+    type=click.IntRange(1),
+    metavar="<MB>",
+    help="Most the sqlite cache may hold (default 256).",
+)
+@click.option(
+    "--compress-level",
+    type=click.IntRange(0, 9),
+    default=DEFAULT_LEVEL,
+    show_default=True,
+    help="gzip/brotli compression level for responses, 0 to disable.",
+)
+@click.option(
+    "--compress-min-size",
+    type=int,
+    default=DEFAULT_MIN_SIZE,
+    show_default=True,
+    metavar="<bytes>",
+    help="Only compress responses larger than this.",
+)
+@click.option(
+    "--precompress-assets",
+    is_flag=True,
+    help="Write compressed copies of the static assets at startup, so they "
+    "are not compressed on each request.",
+)
 @click.version_option(version=__version__, prog_name="fava")
 def main(  # noqa: PLR0913
     *,
@@ -86,6 +163,16 @@ def main(  # noqa: PLR0913
     profile: bool = False,
     profile_dir: str | None = None,
     poll_watcher: bool = False,
+    max_ledgers: int | None = None,
+    ledger_ttl: float | None = None,
+    memory_budget: int | None = None,
+    warmup: bool = True,
+    snapshot_dir: str | None = None,
+    cache: str = "memory",
+    cache_size: int | None = None,
+    compress_level: int = DEFAULT_LEVEL,
+    compress_min_size: int = DEFAULT_MIN_SIZE,
+    precompress_assets: bool = False,
 ) -> None:  # pragma: no cover
     """Start Doudough for FILENAMES on http://<host>:<port>.
 
@@ -102,12 +189,24 @@ def main(  # noqa: PLR0913
     if not all_filenames:
         raise NoFileSpecifiedError
 
+    from .app import app, create_app
+
     create_app(
         all_filenames,
         # incognito=incognito,
-        # read_only=read_only,
-        # poll_watcher=poll_watcher,
+        read_only=read_only,
+        poll_watcher=poll_watcher,
         fava_app=app.server,
+        max_ledgers=max_ledgers,
+        ledger_ttl=ledger_ttl,
+        memory_budget=memory_budget,
+        warmup=warmup,
+        snapshot_dir=snapshot_dir,
+        cache=cache,
+        cache_size=cache_size,
+        compress_level=compress_level,
+        compress_min_size=compress_min_size,
+        precompress_assets=precompress_assets,
     )
 
     # if prefix:
@@ -0,0 +1,171 @@
+"""gzip/brotli compression of dash responses
+
+Callback responses (journal rows, payee tables, figures) are plain JSON and
+compress very well.  Responses are compressed after the request if the client
+accepts it and they are larger than COMPRESS_MIN_SIZE.  Static assets with a
+precompressed `.br` or `.gz` sibling are served from that file instead, see
+`precompress_assets`.
+
+Brotli is used when the optional `brotli` package is installed.
+"""
+
+import gzip
+import mimetypes
+import os
+from pathlib import Path
+
+from flask import Flask, Response, request, send_file
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+DEFAULT_MIN_SIZE = 1024
+DEFAULT_LEVEL = 6
+
+COMPRESSIBLE_TYPES = {
+    "application/json",
+    "application/javascript",
+    "text/javascript",
+    "text/html",
+    "text/css",
+    "text/plain",
+    "text/csv",
+    "image/svg+xml",
+}
+
+#: Content-Encoding and precompressed file suffix, in order of preference
+ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+
+
+def accepted_encodings(header: str) -> set[str]:
+    """Parse an Accept-Encoding header, ignoring anything with q=0"""
+    accepted = set()
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(name)
+    return accepted
+
+
+def _available(accepted: set[str]) -> list[tuple[str, str]]:
+    return [
+        (encoding, suffix)
+        for encoding, suffix in ENCODINGS
+        if (encoding in accepted or "*" in accepted)
+        and (encoding != "br" or brotli is not None)
+    ]
+
+
+def compress(data: bytes, encoding: str, level: int = DEFAULT_LEVEL) -> bytes:
+    if encoding == "br":
+        # Brotli quality runs 0-11 rather than 1-9
+        return brotli.compress(data, quality=min(11, level + 2))
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=level, mtime=0)
+    raise ValueError(encoding)
+
+
+def precompress_assets(folder: str | Path, level: int = 9) -> list[Path]:
+    """Write .gz (and .br) siblings of compressible files in an assets folder
+
+    Only files which are missing or older than their source are written.
+    Returns the paths written.
+    """
+    written = []
+    for path in Path(folder).rglob("*"):
+        if not path.is_file() or path.suffix in (".gz", ".br"):
+            continue
+        if mimetypes.guess_type(path.name)[0] not in COMPRESSIBLE_TYPES:
+            continue
+        data = None
+        for encoding, suffix in _available({"*"}):
+            target = path.with_name(path.name + suffix)
+            if target.exists() and target.stat().st_mtime >= path.stat().st_mtime:
+                continue
+            data = data if data is not None else path.read_bytes()
+            target.write_bytes(compress(data, encoding, level))
+            written.append(target)
+    return written
+
+
+def init_app(app, min_size: int = DEFAULT_MIN_SIZE, level: int = DEFAULT_LEVEL):
+    """Enable response compression on a dash app's server
+
+    COMPRESS_MIN_SIZE and COMPRESS_LEVEL in the server config may be changed
+    later, eg by `create_app`.
+    """
+    server: Flask = app.server
+    server.config.setdefault("COMPRESS_MIN_SIZE", min_size)
+    server.config.setdefault("COMPRESS_LEVEL", level)
+
+    assets_url = "/" + "/".join(
+        p.strip("/")
+        for p in (app.config.requests_pathname_prefix, app.config.assets_url_path)
+        if p.strip("/")
+    )
+    assets_folder = app.config.assets_folder
+
+    @server.before_request
+    def serve_precompressed_asset():
+        if not request.path.startswith(assets_url + "/"):
+            return None
+        path = safe_join(assets_folder, request.path[len(assets_url) + 1 :])
+        if path is None:
+            return None
+        accepted = accepted_encodings(request.headers.get("Accept-Encoding"))
+        for encoding, suffix in _available(accepted):
+            if os.path.isfile(path + suffix):
+                response = send_file(
+                    path + suffix,
+                    mimetype=mimetypes.guess_type(path)[0],
+                    conditional=True,
+                )
+                response.headers["Content-Encoding"] = encoding
+                response.vary.add("Accept-Encoding")
+                return response
+        return None
+
+    @server.after_request
+    def compress_response(response: Response) -> Response:
+        if (
+            response.direct_passthrough
+            or response.is_streamed
+            or not 200 <= response.status_code < 300
+            or response.status_code == 204
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIBLE_TYPES
+        ):
+            return response
+
+        response.vary.add("Accept-Encoding")
+        available = _available(
+            accepted_encodings(request.headers.get("Accept-Encoding"))
+        )
+        if not available:
+            return response
+        data = response.get_data()
+        if len(data) < server.config["COMPRESS_MIN_SIZE"]:
+            return response
+
+        encoding = available[0][0]
+        response.set_data(compress(data, encoding, server.config["COMPRESS_LEVEL"]))
+        response.headers["Content-Encoding"] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            # The bytes differ from the uncompressed representation
+            response.set_etag(etag, weak=True)
+        return response
+
+    return app
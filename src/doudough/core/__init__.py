@@ -0,0 +1,214 @@
+"""Data doudough derives from loaded ledgers
+
+Everything precomputed from a ledger hangs off a `LedgerGeneration`, which
+represents a single load of a FavaLedger.  A new generation (with a new, ever
+increasing number) starts whenever the ledger's entries are reloaded, so
+anything cached on a generation is invalidated by construction.
+
+Generations are only kept for ledgers which are being served (see
+`track_ledger`); a request still holding a ledger which has since been
+replaced or evicted gets a throwaway generation.
+"""
+
+import itertools
+import os
+import threading
+from collections import OrderedDict
+from functools import cached_property
+from typing import TYPE_CHECKING
+
+# The indexes (and beancount/fava behind them) are imported when first built
+if TYPE_CHECKING:
+    import pandas as pd
+    from fava.core import FavaLedger
+
+    from .conversion import ConversionEngine
+    from .entries import EntryIndex
+    from .errors import ErrorIndex
+    from .payees import PayeeCluster
+    from .postings import PostingsTable
+    from .source import SourceIndex
+
+_COUNTER = itertools.count(1)
+_LOCK = threading.Lock()
+_GENERATIONS: dict[int, "LedgerGeneration | None"] = {}
+
+#: Indexes a patched generation shares with its predecessor, see `patch`
+CARRIED = ("entry_totals", "conversion", "source_index", "error_index", "lots")
+
+#: Indexes built by `LedgerGeneration.prepare`
+PREPARED = (
+    "entry_index",
+    "postings",
+    "entry_totals",
+    "conversion",
+    "source_index",
+    "error_index",
+)
+
+
+class LedgerGeneration:
+    def __init__(self, ledger: "FavaLedger", number: int, entries=None):
+        self.ledger = ledger
+        self.number = number
+        self.entries = ledger.all_entries if entries is None else entries
+        self._memo = OrderedDict()
+        self._memo_lock = threading.Lock()
+
+    def __repr__(self):
+        return "<{} {} of {}>".format(
+            type(self).__name__, self.number, self.ledger.beancount_file_path
+        )
+
+    @cached_property
+    def entry_index(self) -> "EntryIndex":
+        from .entries import EntryIndex
+
+        return EntryIndex(self.entries, self.fingerprint)
+
+    @cached_property
+    def source_index(self) -> "SourceIndex":
+        from .source import SourceIndex
+
+        return SourceIndex(self.entries)
+
+    @cached_property
+    def postings(self) -> "PostingsTable":
+        from .postings import PostingsTable
+
+        return PostingsTable(self.entries)
+
+    @cached_property
+    def entry_totals(self):
+        """Amount moved by each entry (by position), see `PostingsTable.entry_totals`"""
+        return self.postings.entry_totals()
+
+    @cached_property
+    def conversion(self) -> "ConversionEngine":
+        from .conversion import ConversionEngine
+
+        return ConversionEngine.from_entries(self.entries)
+
+    @cached_property
+    def lots(self) -> "pd.DataFrame":
+        """Postings held at cost, see `holdings.lot_table`"""
+        from .holdings import lot_table
+
+        return lot_table(self.postings)
+
+    @cached_property
+    def payee_clusters(self) -> list["PayeeCluster"]:
+        """Near-duplicate payees, see `payees`"""
+        from .payees import payee_clusters
+
+        return payee_clusters(self)
+
+    @cached_property
+    def fingerprint(self) -> str:
+        """Identifies the entries across processes, unlike `number`"""
+        from .snapshot import fingerprint
+
+        return fingerprint(ledger_files(self.ledger), self.entries)
+
+    @cached_property
+    def error_index(self) -> "ErrorIndex":
+        from .errors import ErrorIndex
+
+        return ErrorIndex(
+            self.ledger.errors, os.path.dirname(self.ledger.beancount_file_path)
+        )
+
+    def memoize(self, key, func, *args, maxsize: int = 256):
+        """func(*args), computed once per generation and key (LRU, maxsize keys)"""
+        with self._memo_lock:
+            if key in self._memo:
+                self._memo.move_to_end(key)
+                return self._memo[key]
+        value = func(*args)
+        with self._memo_lock:
+            self._memo[key] = value
+            while len(self._memo) > maxsize:
+                self._memo.popitem(last=False)
+        return value
+
+    def prepare(self) -> None:
+        """Build the indexes every page uses, eg before publishing a reload"""
+        for name in PREPARED:
+            getattr(self, name)
+
+    def patch(self, position: int, entry) -> "LedgerGeneration":
+        """Replace the entry at position in the ledger, starting a generation
+
+        Only for changes which do not affect booking or balances (eg. payee or
+        narration): the new generation keeps this one's indexes, patched for
+        the entry, instead of reloading.
+        """
+        ledger = self.ledger
+        old = self.entries[position]
+        entries = list(self.entries)
+        entries[position] = entry
+        carried = {k: v for k, v in vars(self).items() if k in CARRIED}
+        if "postings" in vars(self):
+            postings = self.postings
+            if entry.payee != old.payee:
+                postings = postings.with_payee(position, entry.payee)
+            carried["postings"] = postings
+
+        with _LOCK:
+            generation = LedgerGeneration(ledger, next(_COUNTER), entries)
+            vars(generation).update(carried)
+            if "entry_index" in vars(self):
+                generation.entry_index = self.entry_index.replaced(
+                    entries, generation.fingerprint, position
+                )
+            # fava's lists of entries by type share the entry objects
+            by_type = getattr(ledger, "all_entries_by_type", None)
+            same_type = getattr(by_type, type(old).__name__, None) or []
+            for i, e in enumerate(same_type):
+                if e is old:
+                    same_type[i] = entry
+                    break
+            ledger.all_entries = entries
+            # fava's cached filtered views hold the old entries
+            cache_clear = getattr(ledger.get_filtered, "cache_clear", None)
+            if cache_clear is not None:
+                cache_clear()
+            if id(ledger) in _GENERATIONS:
+                _GENERATIONS[id(ledger)] = generation
+        return generation
+
+    def get_entry_slice(self, entry) -> tuple[str, str]:
+        """The source of an entry and its sha256, see `SourceIndex`"""
+        return self.source_index.get_entry_slice(
+            entry, self.entry_index.position(entry)
+        )
+
+
+def ledger_files(ledger: "FavaLedger") -> list[str]:
+    """All files a ledger was loaded from"""
+    return ledger.options.get("include") or [ledger.beancount_file_path]
+
+
+def get_generation(ledger: "FavaLedger") -> LedgerGeneration:
+    """The current generation of a ledger, starting a new one if it was reloaded"""
+    with _LOCK:
+        if id(ledger) not in _GENERATIONS:
+            # No longer (or not yet) served, don't keep it alive
+            return LedgerGeneration(ledger, next(_COUNTER))
+        generation = _GENERATIONS[id(ledger)]
+        if generation is None or generation.entries is not ledger.all_entries:
+            generation = LedgerGeneration(ledger, next(_COUNTER))
+            _GENERATIONS[id(ledger)] = generation
+        return generation
+
+
+def track_ledger(ledger: "FavaLedger") -> None:
+    """Keep the generations of a ledger which is (about to be) served"""
+    with _LOCK:
+        _GENERATIONS.setdefault(id(ledger), None)
+
+
+def forget_ledger(ledger: "FavaLedger") -> None:
+    """Drop all derived data for a ledger which is no longer served"""
+    with _LOCK:
+        _GENERATIONS.pop(id(ledger), None)
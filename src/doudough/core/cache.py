@@ -0,0 +1,229 @@
+"""Cache backends for computed views, shareable between worker processes
+
+`Context.cached` results are kept on their ledger generation (in process) and
+stored in a backend, keyed by the generation's `fingerprint` (the same in every
+worker which loaded the same files) and the view's name, filters and
+arguments:
+
+- ``memory``: an LRU of at most max_entries results, in this process
+- ``sqlite:///path/to/cache.db``: a file shared by the workers on one host,
+  evicting least recently used results beyond max_bytes
+- ``redis://host:port/db``: a Redis (or compatible) server, needing the
+  optional `redis` package; results expire after a day, bound its size with
+  the server's maxmemory policy
+
+Values are pickled for the shared backends; anything which fails to pickle is
+just not shared.  Views must not hold anything specific to one process or
+generation: entry ids, for one, are derived from the fingerprint (see
+`EntryIndex`).
+"""
+
+import hashlib
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable
+
+log = logging.getLogger(__name__)
+
+MISSING = object()
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+REDIS_TTL = 24 * 60 * 60
+
+
+def cache_key(fingerprint: str, key: Hashable) -> str:
+    """A key for the same view of the same ledger contents in any process"""
+    digest = hashlib.sha256(repr(key).encode()).hexdigest()[:32]
+    return "doudough:{}:{}".format(fingerprint, digest)
+
+
+class CacheBackend:
+    """Base class counting hits and misses; backends implement _get and _set"""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.sets = 0
+        self.errors = 0
+
+    def get(self, key: str):
+        """The cached value, or MISSING"""
+        try:
+            value = self._get(key)
+        except Exception:
+            log.exception("Cache lookup failed")
+            self.errors += 1
+            value = MISSING
+        if value is MISSING:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value) -> None:
+        try:
+            self._set(key, value)
+        except (pickle.PicklingError, TypeError, AttributeError) as e:
+            log.debug("Not caching %s: %s", key, e)
+            self.errors += 1
+        except Exception:
+            log.exception("Cache store failed")
+            self.errors += 1
+        else:
+            self.sets += 1
+
+    def _get(self, key: str):
+        raise NotImplementedError
+
+    def _set(self, key: str, value) -> None:
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "sets": self.sets,
+            "errors": self.errors,
+        }
+
+
+class MemoryCache(CacheBackend):
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        super().__init__()
+        self.max_entries = max_entries
+        self._values = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        with self._lock:
+            if key not in self._values:
+                return MISSING
+            self._values.move_to_end(key)
+            return self._values[key]
+
+    def _set(self, key, value):
+        with self._lock:
+            self._values[key] = value
+            self._values.move_to_end(key)
+            while len(self._values) > self.max_entries:
+                self._values.popitem(last=False)
+
+    def stats(self):
+        return dict(super().stats(), entries=len(self._values))
+
+
+class SqliteCache(CacheBackend):
+    def __init__(self, path: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        super().__init__()
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        db = self._db()
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value BLOB, size INTEGER, accessed REAL)"
+        )
+        db.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)")
+
+    def _db(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def _get(self, key):
+        db = self._db()
+        row = db.execute("SELECT value FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return MISSING
+        db.execute("UPDATE cache SET accessed = ? WHERE key = ?", (time.time(), key))
+        return pickle.loads(row[0])
+
+    def _set(self, key, value):
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.max_bytes:
+            return
+        db = self._db()
+        db.execute(
+            "INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)",
+            (key, data, len(data), time.time()),
+        )
+        self._evict(db)
+
+    def _evict(self, db):
+        (total,) = db.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()
+        while total > self.max_bytes:
+            rows = db.execute(
+                "SELECT key, size FROM cache ORDER BY accessed LIMIT 16"
+            ).fetchall()
+            if not rows:
+                break
+            db.executemany("DELETE FROM cache WHERE key = ?", [(k,) for k, _ in rows])
+            total -= sum(size for _, size in rows)
+
+    def stats(self):
+        entries, size = self._db().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache"
+        ).fetchone()
+        return dict(super().stats(), entries=entries, bytes=size)
+
+
+class RedisCache(CacheBackend):
+    def __init__(self, url: str, ttl: int = REDIS_TTL):
+        import redis
+
+        super().__init__()
+        self.ttl = ttl
+        self._redis = redis.Redis.from_url(url)
+
+    def _get(self, key):
+        data = self._redis.get(key)
+        return MISSING if data is None else pickle.loads(data)
+
+    def _set(self, key, value):
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        self._redis.set(key, data, ex=self.ttl)
+
+
+def create_cache(
+    url: str | None = "memory", max_bytes: int | None = None
+) -> CacheBackend | None:
+    """The backend for a --cache url, None for "none" """
+    if not url or url == "none":
+        return None
+    if url == "memory":
+        return MemoryCache()
+    if url.startswith("sqlite://"):
+        return SqliteCache(url[len("sqlite://") :], max_bytes or DEFAULT_MAX_BYTES)
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisCache(url)
+    raise ValueError("Unknown cache backend {}".format(url))
+
+
+def cached_call(backend: CacheBackend | None, generation, key, func, *args):
+    """func(*args), memoized on the generation and stored in backend"""
+
+    def compute():
+        if backend is None:
+            return func(*args)
+        shared_key = cache_key(generation.fingerprint, key)
+        value = backend.get(shared_key)
+        if value is MISSING:
+            value = func(*args)
+            backend.set(shared_key, value)
+        return value
+
+    return generation.memoize(key, compute)
@@ -0,0 +1,143 @@
+"""Post-load compaction of a ledger's entries
+
+The beancount parser creates a new string for every account, currency, payee
+and tag token, so a large ledger holds millions of copies of a few thousand
+distinct strings.  `compact_ledger` interns them, rebuilding the (immutable)
+transactions and balances which referenced copies.
+"""
+
+import logging
+from dataclasses import dataclass
+from sys import intern
+
+from beancount.core.amount import Amount
+from beancount.core.data import Balance, Transaction
+from fava.core import FavaLedger
+from fava.core.group_entries import group_entries_by_type
+
+from .memory import current_rss, format_bytes, release_memory
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class CompactionStats:
+    entries: int = 0
+    replaced: int = 0
+    rss_before: int | None = None
+    rss_after: int | None = None
+
+    @property
+    def saved(self) -> int | None:
+        if self.rss_before is None or self.rss_after is None:
+            return None
+        return self.rss_before - self.rss_after
+
+    def __str__(self):
+        return "{}/{} entries compacted, {} saved".format(
+            self.replaced, self.entries, format_bytes(self.saved)
+        )
+
+
+class _Interner:
+    def __init__(self):
+        self.frozensets = {}
+
+    @staticmethod
+    def string(s):
+        return s if s is None else intern(s)
+
+    def frozenset(self, s):
+        if not s:
+            return s
+        return self.frozensets.setdefault(s, frozenset(map(intern, s)))
+
+    def amount(self, amount):
+        if amount is None or amount.currency is None:
+            return amount
+        currency = intern(amount.currency)
+        if currency is amount.currency:
+            return amount
+        return Amount(amount.number, currency)
+
+    def cost(self, cost):
+        if cost is None or getattr(cost, "currency", None) is None:
+            return cost
+        currency = intern(cost.currency)
+        if currency is cost.currency:
+            return cost
+        return cost._replace(currency=currency)
+
+    @staticmethod
+    def meta(meta):
+        if meta and isinstance(meta.get("filename"), str):
+            meta["filename"] = intern(meta["filename"])
+        return meta
+
+    def posting(self, posting):
+        replaced = posting._replace(
+            account=intern(posting.account),
+            units=self.amount(posting.units),
+            cost=self.cost(posting.cost),
+            price=self.amount(posting.price),
+        )
+        self.meta(posting.meta)
+        return posting if all(map(_same, replaced, posting)) else replaced
+
+    def entry(self, entry):
+        self.meta(entry.meta)
+        if isinstance(entry, Transaction):
+            replaced = entry._replace(
+                payee=self.string(entry.payee),
+                tags=self.frozenset(entry.tags),
+                links=self.frozenset(entry.links),
+                postings=[self.posting(p) for p in entry.postings],
+            )
+            postings_same = all(map(_same, replaced.postings, entry.postings))
+            if postings_same and all(map(_same, replaced[:-1], entry[:-1])):
+                return entry
+            return replaced
+        if isinstance(entry, Balance):
+            replaced = entry._replace(
+                account=intern(entry.account), amount=self.amount(entry.amount)
+            )
+            return entry if all(map(_same, replaced, entry)) else replaced
+        return entry
+
+
+def _same(a, b) -> bool:
+    return a is b
+
+
+def compact_entries(entries: list) -> int:
+    """Intern the strings of entries, replacing them in place
+
+    Returns the number of entries replaced.
+    """
+    interner = _Interner()
+    replaced = 0
+    for i, entry in enumerate(entries):
+        compacted = interner.entry(entry)
+        if compacted is not entry:
+            entries[i] = compacted
+            replaced += 1
+    return replaced
+
+
+def compact_ledger(ledger: FavaLedger) -> CompactionStats:
+    """Compact a freshly loaded ledger, before anything is derived from it"""
+    stats = CompactionStats(entries=len(ledger.all_entries))
+    stats.rss_before = current_rss()
+
+    stats.replaced = compact_entries(ledger.all_entries)
+    if stats.replaced:
+        ledger.all_entries_by_type = group_entries_by_type(ledger.all_entries)
+        cache_clear = getattr(ledger.get_filtered, "cache_clear", None)
+        if cache_clear is not None:
+            cache_clear()
+
+    # Once, after interning: collecting is slow on a freshly parsed ledger
+    release_memory()
+    stats.rss_after = current_rss()
+    log.info("%s: %s", ledger.beancount_file_path, stats)
+    return stats
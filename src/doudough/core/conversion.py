@@ -0,0 +1,185 @@
+"""Currency conversion with prices looked up for whole arrays of dates at once
+
+The ledger's prices are collected once per generation into a sorted array of
+dates and one of rates per currency pair (with the inverse of every pair which
+has no prices of its own), so the rate of a pair as of any number of dates is
+one `searchsorted`.  Pairs without prices are converted through one
+intermediate currency if possible (eg. a fund priced in EUR, to USD).
+
+The same arrays serve as the price store for charts: `series` slices the
+prices of a pair between two dates, and `downsample` thins them for drawing.
+"""
+
+import datetime
+from collections import defaultdict
+from typing import Iterable, Mapping, Sequence
+
+import numpy as np
+
+from .postings import PostingsTable
+
+Pair = tuple[str, str]
+
+
+def _day(d) -> np.datetime64:
+    return np.datetime64(d or datetime.date.today(), "D")
+
+
+class ConversionEngine:
+    def __init__(self, prices: Mapping[Pair, Iterable[tuple[datetime.date, float]]]):
+        #: (base, quote) -> (dates, rates), dates sorted and distinct
+        self.pairs: dict[Pair, tuple[np.ndarray, np.ndarray]] = {}
+        for pair, points in prices.items():
+            dates, rates = self._arrays(points)
+            if len(dates):
+                self.pairs[pair] = dates, rates
+        #: Pairs with prices of their own
+        self.quoted: list[Pair] = sorted(self.pairs)
+        for (base, quote), (dates, rates) in list(self.pairs.items()):
+            if (quote, base) not in self.pairs:
+                with np.errstate(divide="ignore"):
+                    self.pairs[quote, base] = dates, 1 / rates
+
+        self.quotes: dict[str, set[str]] = defaultdict(set)
+        for base, quote in self.pairs:
+            self.quotes[base].add(quote)
+
+    @staticmethod
+    def _arrays(points) -> tuple[np.ndarray, np.ndarray]:
+        points = list(points)
+        dates = np.array([d for d, _ in points], dtype="datetime64[D]")
+        rates = np.array([r for _, r in points], dtype=np.float64)
+        order = np.argsort(dates, kind="stable")
+        dates, rates = dates[order], rates[order]
+        # The last price of a day wins, as in beancount's price map
+        last = np.append(dates[1:] != dates[:-1], True)[: len(dates)]
+        return dates[last], rates[last]
+
+    @classmethod
+    def from_entries(cls, entries: Sequence) -> "ConversionEngine":
+        """The prices of the Price directives among entries"""
+        from beancount.core.data import Price
+
+        prices = defaultdict(list)
+        for entry in entries:
+            if isinstance(entry, Price) and entry.amount.number is not None:
+                pair = entry.currency, entry.amount.currency
+                prices[pair].append((entry.date, float(entry.amount.number)))
+        return cls(prices)
+
+    def _direct(self, base: str, quote: str, dates: np.ndarray) -> np.ndarray:
+        pair_dates, pair_rates = self.pairs[base, quote]
+        index = np.searchsorted(pair_dates, dates, side="right") - 1
+        rates = pair_rates[np.maximum(index, 0)]
+        return np.where(index >= 0, rates, np.nan)
+
+    def rates(self, base: str, quote: str, dates) -> np.ndarray:
+        """Rates of base in quote as of each of dates (nan where unknown)"""
+        dates = np.asarray(dates, dtype="datetime64[D]")
+        if base == quote:
+            return np.ones(dates.shape)
+        if (base, quote) in self.pairs:
+            return self._direct(base, quote, dates)
+
+        rates = np.full(dates.shape, np.nan)
+        for via in sorted(self.quotes.get(base, ())):
+            if (via, quote) not in self.pairs:
+                continue
+            hop = self._direct(base, via, dates) * self._direct(via, quote, dates)
+            rates = np.where(np.isnan(rates), hop, rates)
+        return rates
+
+    def series(
+        self, base: str, quote: str, begin=None, end=None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Dates and prices of base in quote from begin to end (inclusive)
+
+        Prices of a pair without prices of its own are implied (see `rates`) at
+        the dates of the prices they are implied from.
+        """
+        if (base, quote) in self.pairs:
+            dates, rates = self.pairs[base, quote]
+        else:
+            legs = [
+                self.pairs[pair][0]
+                for via in self.quotes.get(base, ())
+                for pair in ((base, via), (via, quote))
+                if (via, quote) in self.pairs
+            ]
+            dates = np.unique(np.concatenate(legs)) if legs else np.array([], "M8[D]")
+            rates = self.rates(base, quote, dates)
+            known = ~np.isnan(rates)
+            dates, rates = dates[known], rates[known]
+
+        start = np.searchsorted(dates, _day(begin)) if begin else 0
+        stop = np.searchsorted(dates, _day(end), side="right") if end else len(dates)
+        return dates[start:stop], rates[start:stop]
+
+    def convert_postings(
+        self,
+        table: PostingsTable,
+        target: str,
+        at: str = "market",
+        on: datetime.date | None = None,
+        rows: np.ndarray | None = None,
+    ) -> np.ndarray:
+        """The postings (or some rows of them) in target, nan where unknown
+
+        At "cost", the weight of each posting converted as of its date; at
+        "market", its units converted as of `on` (default: today).
+        """
+        rows = slice(None) if rows is None else rows
+        if at == "cost":
+            numbers, codes = table.weight[rows], table.weight_currency[rows]
+            dates = table.date[rows]
+        elif at == "market":
+            numbers, codes = table.number[rows], table.currency[rows]
+            dates = _day(on)
+        else:
+            raise ValueError("Unknown conversion {}".format(at))
+
+        converted = np.full(len(numbers), np.nan)
+        dates = np.broadcast_to(dates, numbers.shape)
+        for code in np.unique(codes).tolist():
+            if code < 0:
+                continue
+            mask = codes == code
+            rates = self.rates(table.currencies.get(code), target, dates[mask])
+            converted[mask] = numbers[mask] * rates
+        return converted
+
+    def value(
+        self, balance: Mapping[str, object], target: str, on=None
+    ) -> tuple[float, dict]:
+        """The total of balance (currency -> number) in target as of on (default:
+        today), and the part of balance which could not be converted
+        """
+        total, unconverted = 0.0, {}
+        when = np.array([_day(on)])
+        for currency, number in balance.items():
+            if not number:
+                continue
+            rate = self.rates(currency, target, when)[0]
+            if np.isnan(rate):
+                unconverted[currency] = number
+            else:
+                total += float(number) * rate
+        return total, unconverted
+
+
+def downsample(
+    dates: np.ndarray, values: np.ndarray, max_points: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """At most max_points of a series, keeping the lowest and highest value of
+    each of max_points / 2 equal slices (so spikes survive), in order"""
+    n = len(dates)
+    buckets = max_points // 2
+    if n <= max_points or buckets < 1:
+        return dates, values
+    bucket = np.arange(n) * buckets // n
+    # Within each bucket by value: its first is the minimum, its last the maximum
+    order = np.lexsort((values, bucket))
+    starts = np.searchsorted(bucket, np.arange(buckets))
+    stops = np.append(starts[1:], n)
+    keep = np.union1d(order[starts], order[stops - 1])
+    return dates[keep], values[keep]
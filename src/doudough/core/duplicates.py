@@ -0,0 +1,136 @@
+"""Candidate duplicate transactions, found through a blocking index
+
+Postings are blocked on (account, currency, amount): sorted by these and their
+date, each block is a run, and candidates are the postings of the same block
+at most WINDOW days apart.  These are found by comparing each
+posting to the next few of its block (at most NEIGHBOURS), so the search is
+linear in the number of postings (plus a sort) and never pairwise.
+
+Candidate pairs of transactions are then scored by the similarity of their
+payees and narrations (see `similarity`).
+"""
+
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import TYPE_CHECKING, Iterable
+
+import numpy as np
+
+from .payees import shingles
+
+if TYPE_CHECKING:
+    from . import LedgerGeneration
+
+#: Days between the dates of duplicates
+WINDOW = 3
+#: Postings of a block compared to each posting (bounds recurring amounts)
+NEIGHBOURS = 20
+#: Lowest score of a reported pair
+THRESHOLD = 0.5
+#: Weight of the payee in the score, when both transactions have one
+PAYEE_WEIGHT = 0.5
+
+
+@lru_cache(maxsize=65536)
+def _shingles(text: str) -> frozenset[str]:
+    return frozenset(shingles(text)) if text else frozenset()
+
+
+def jaccard(a: str, b: str) -> float:
+    """Overlap of the character shingles of a and b (1.0 if both are empty)"""
+    sa, sb = _shingles(a or ""), _shingles(b or "")
+    if not sa and not sb:
+        return 1.0
+    return len(sa & sb) / len(sa | sb)
+
+
+def similarity(a, b) -> float:
+    """How alike the descriptions of transactions a and b are, from 0 to 1
+
+    Payees and narrations are compared separately when both transactions have
+    a payee; otherwise an importer may have put the payee in the narration, so
+    both are compared as one text.
+    """
+    if a.payee and b.payee:
+        payee = jaccard(a.payee, b.payee)
+        narration = jaccard(a.narration, b.narration)
+        return PAYEE_WEIGHT * payee + (1 - PAYEE_WEIGHT) * narration
+    return jaccard(
+        " ".join(filter(None, (a.payee, a.narration))),
+        " ".join(filter(None, (b.payee, b.narration))),
+    )
+
+
+def candidate_pairs(
+    generation: "LedgerGeneration",
+    positions: Iterable[int],
+    window: int = WINDOW,
+    neighbours: int = NEIGHBOURS,
+) -> np.ndarray:
+    """Distinct pairs (first, second) of positions among positions whose
+    transactions share a posting amount, currency and account within window
+    days, one row each"""
+    table = generation.postings
+    wanted = np.zeros(len(table.entry_offsets) - 1, dtype=bool)
+    wanted[np.fromiter(positions, dtype=np.int64)] = True
+    rows = table.rows(np.flatnonzero(wanted))
+    rows = rows[np.isfinite(table.number[rows])]
+    if len(rows) < 2:
+        return np.zeros((0, 2), dtype=np.int64)
+
+    # Blocks are runs of equal (account, currency, cents) once sorted
+    account, currency = table.account[rows], table.currency[rows]
+    cents = np.round(table.number[rows] * 100).astype(np.int64)
+    days = table.date[rows].astype(np.int64)
+    order = np.lexsort((days, cents, currency, account))
+    account, currency, cents = account[order], currency[order], cents[order]
+    days, entries = days[order], table.entry[rows[order]]
+
+    def same_block(k):
+        return (
+            (account[k:] == account[:-k])
+            & (currency[k:] == currency[:-k])
+            & (cents[k:] == cents[:-k])
+        )
+
+    pairs = []
+    for k in range(1, neighbours + 1):
+        near = same_block(k) & (days[k:] - days[:-k] <= window)
+        if not near.any():
+            break
+        first, second = entries[:-k][near], entries[k:][near]
+        pairs.append(np.stack([first, second], axis=1))
+    if not pairs:
+        return np.zeros((0, 2), dtype=np.int64)
+    pairs = np.sort(np.concatenate(pairs), axis=1).astype(np.int64)
+    pairs = pairs[pairs[:, 0] != pairs[:, 1]]
+    return np.unique(pairs, axis=0)
+
+
+@dataclass
+class Duplicate:
+    #: Positions in all_entries, the earlier entry first
+    first: int
+    second: int
+    #: Similarity of the descriptions, see `similarity`
+    score: float
+    days: int
+
+
+def find_duplicates(
+    generation: "LedgerGeneration",
+    positions: Iterable[int],
+    window: int = WINDOW,
+    threshold: float = THRESHOLD,
+) -> list[Duplicate]:
+    """Likely duplicate transactions among those at positions, best first"""
+    entries = generation.entries
+    duplicates = []
+    for first, second in candidate_pairs(generation, positions, window).tolist():
+        a, b = entries[first], entries[second]
+        score = similarity(a, b)
+        if score >= threshold:
+            days = abs((b.date - a.date).days)
+            duplicates.append(Duplicate(first, second, score, days))
+    duplicates.sort(key=lambda d: (-d.score, d.days, d.first))
+    return duplicates
@@ -0,0 +1,205 @@
+"""Rewriting entries in their source files
+
+Edits are located through the generation's `SourceIndex`, so editing any
+number of entries reads and writes each file once: the edited header lines
+are spliced into the file's bytes in one pass, and the result replaces the
+file atomically.  The caller then reloads the ledger once, or for a single
+edit which does not affect balances, `edit_entry` patches the loaded ledger.
+
+A file which changed on disk since the generation was loaded is not edited
+(its entry offsets are stale); `SourceChangedError` is raised before any file
+is written.
+"""
+
+import logging
+import os
+import re
+import tempfile
+from collections import defaultdict
+from datetime import date
+from typing import TYPE_CHECKING, Callable, Iterable
+
+from . import LedgerGeneration, get_generation
+
+if TYPE_CHECKING:
+    from .loader import LedgerLoader
+
+log = logging.getLogger(__name__)
+
+#: A transaction header: date, flag, then its strings (payee, narration)
+_HEADER = re.compile(
+    r"^(?P<date>\d{4}-\d{2}-\d{2})\s+(?P<flag>txn|[*!&#?%PSTCURM])"
+    r"(?P<strings>(?:\s+\"(?:[^\"\\]|\\.)*\")*)"
+)
+_STRING = re.compile(r"\"((?:[^\"\\]|\\.)*)\"")
+_FLAGS = "*!&#?%PSTCURM"
+
+#: Transaction fields which can be edited in place
+EDITABLE = ("date", "flag", "payee", "narration")
+#: Fields whose edit may reorder entries or change balances: reload after them
+RELOAD_FIELDS = ("date",)
+
+
+class SourceChangedError(Exception):
+    """A file to edit changed since the ledger was loaded"""
+
+
+def quote(s: str) -> str:
+    """s as a beancount string"""
+    return '"{}"'.format(s.replace("\\", "\\\\").replace('"', '\\"'))
+
+
+def edit_header(header: str, **changes) -> str | None:
+    """A transaction header line with some of its date, flag, payee and
+    narration changed, None if it is not one"""
+    match = _HEADER.match(header)
+    if match is None:
+        return None
+    strings = ['"{}"'.format(s) for s in _STRING.findall(match.group("strings"))]
+    fields = {
+        "date": match.group("date"),
+        "flag": match.group("flag"),
+        "payee": strings[0] if len(strings) > 1 else None,
+        "narration": strings[-1] if strings else '""',
+    }
+    for name, value in changes.items():
+        if name in ("payee", "narration"):
+            value = quote(value) if value is not None else None
+        fields[name] = value if value is None else str(value)
+    parts = [fields["date"], fields["flag"], fields["payee"], fields["narration"]]
+    return " ".join(p for p in parts if p is not None) + header[match.end() :]
+
+
+def set_payee(header: str, payee: str | None) -> str | None:
+    """A transaction header line with its payee replaced, None if not one"""
+    return edit_header(header, payee=payee)
+
+
+def _write(path: str, data: bytes) -> None:
+    """Replace path with data, atomically"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".doudough-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.chmod(tmp, os.stat(path).st_mode & 0o7777)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def rewrite_headers(
+    generation: LedgerGeneration,
+    positions: Iterable[int],
+    edit: Callable[[str], str | None],
+) -> dict[str, int]:
+    """Replace the first line of the entries at positions with edit(line)
+
+    edit returns None to leave a line alone.  Returns the number of entries
+    rewritten per file.
+    """
+    index = generation.source_index
+    by_file = defaultdict(list)
+    for position in positions:
+        number = index.file_numbers[position]
+        if number >= 0:
+            by_file[int(number)].append(int(position))
+
+    # Check every file first, so a conflict leaves all of them untouched
+    sources = {}
+    for number in by_file:
+        source = index.files[number]
+        if source is None or not source.is_current():
+            path = source.path if source is not None else "a source file"
+            raise SourceChangedError("{} changed since it was loaded".format(path))
+        sources[number] = source
+
+    edited = {}
+    for number, file_positions in by_file.items():
+        source = sources[number]
+        with open(source.path, "rb") as f:
+            data = f.read()
+        chunks, done, count = [], 0, 0
+        for position in sorted(set(file_positions), key=lambda p: index.offsets[p]):
+            offset = int(index.offsets[position])
+            end = data.find(b"\n", offset, offset + int(index.lengths[position]))
+            end = offset + int(index.lengths[position]) if end < 0 else end
+            line = data[offset:end].decode("utf-8")
+            new = edit(line.rstrip("\r"))
+            if new is None:
+                log.warning("Not editing %s:%d", source.path, offset)
+                continue
+            if line.endswith("\r"):
+                new += "\r"
+            chunks += [data[done:offset], new.encode("utf-8")]
+            done = end
+            count += 1
+        if count:
+            _write(source.path, b"".join(chunks) + data[done:])
+            edited[source.path] = count
+    return edited
+
+
+def rename_payees(
+    generation: LedgerGeneration, positions: Iterable[int], payee: str | None
+) -> dict[str, int]:
+    """Set the payee of the transactions at positions, see `rewrite_headers`"""
+    return rewrite_headers(generation, positions, lambda line: set_payee(line, payee))
+
+
+def parse_field(field: str, value):
+    """The value of an edited transaction field; raises ValueError if invalid"""
+    if field not in EDITABLE:
+        raise ValueError("{} can not be edited".format(field))
+    if field == "date":
+        return value if isinstance(value, date) else date.fromisoformat(str(value))
+    if field == "flag":
+        value = str(value or "").strip()
+        value = "*" if value == "txn" else value
+        if len(value) != 1 or value not in _FLAGS:
+            raise ValueError("Not a transaction flag: {!r}".format(value))
+        return value
+    value = (value or "").strip()
+    if field == "payee":
+        return value or None
+    return value
+
+
+def edit_entry(
+    loader: "LedgerLoader", slug: str, entry_id: str, field: str, value
+) -> LedgerGeneration:
+    """Set a field of a transaction, in its source file and in the loaded ledger
+
+    Fields which do not affect booking are patched into the served ledger (see
+    `LedgerGeneration.patch`) instead of reloading it; others (RELOAD_FIELDS)
+    reload it.  Either way the watcher ignores the write (`LedgerLoader.wrote`).
+    Raises KeyError if the entry is unknown (eg. the ledger was reloaded),
+    ValueError for invalid edits and `SourceChangedError`.
+    """
+    from beancount.core.data import Transaction
+
+    value = parse_field(field, value)
+    ledger = loader[slug]
+    generation = get_generation(ledger)
+    entry = generation.entry_index.get(entry_id)
+    position = generation.entry_index.position(entry)
+    if not isinstance(entry, Transaction) or position is None:
+        raise ValueError("Only transactions of the ledger can be edited")
+
+    edited = rewrite_headers(
+        generation, [position], lambda line: edit_header(line, **{field: value})
+    )
+    if not edited:
+        raise ValueError("Could not find the transaction in its source")
+    loader.wrote(slug, edited)
+    if field in RELOAD_FIELDS:
+        loader.reload(slug)
+        return generation
+
+    # Line numbers are unchanged, so the (shared) source index is remapped
+    (path,) = edited
+    generation.source_index.refresh(path, generation.entries)
+    patched = generation.patch(position, entry._replace(**{field: value}))
+    loader.patched(slug, ledger)
+    return patched
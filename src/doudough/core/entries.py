@@ -0,0 +1,79 @@
+"""Compact entry ids, assigned once per load"""
+
+from functools import cached_property
+from typing import Sequence
+
+from beancount.core.data import Directive
+from fava.beans.funcs import hash_entry
+
+#: Characters of the fingerprint used in ids
+KEY_LENGTH = 12
+
+
+class EntryIndex:
+    """Maps entries of one ledger generation to and from compact ids
+
+    Ids are "<key>-<position in all_entries>", so building a journal row needs
+    no hashing and looking an entry back up is a list index.  The key is a
+    prefix of the generation's fingerprint, so ids stay valid in every process
+    (and reload) which parsed the same files, and views holding them can be
+    shared through the cache.  Entries synthesized by filters (eg opening
+    balances of a time filter) are not part of all_entries and get an id which
+    can not be looked up.
+
+    Fava's entry hashes are still accepted by `get`, and are only computed if
+    one is used.
+    """
+
+    def __init__(self, entries: Sequence[Directive], fingerprint: str):
+        self.entries = entries
+        self.key = fingerprint[:KEY_LENGTH]
+        self._positions = {id(entry): i for i, entry in enumerate(entries)}
+
+    def replaced(
+        self, entries: Sequence[Directive], fingerprint: str, position: int
+    ) -> "EntryIndex":
+        """The index of entries, a copy of these with the one at position
+        replaced, for a new generation"""
+        index = self.__class__.__new__(self.__class__)
+        index.entries = entries
+        index.key = fingerprint[:KEY_LENGTH]
+        index._positions = dict(self._positions)
+        index._positions.pop(id(self.entries[position]), None)
+        index._positions[id(entries[position])] = position
+        return index
+
+    def __len__(self):
+        return len(self.entries)
+
+    def position(self, entry: Directive) -> int | None:
+        """Position of an entry in all_entries, or None if it is not there"""
+        i = self._positions.get(id(entry))
+        if i is None or self.entries[i] is not entry:
+            return None
+        return i
+
+    def entry_id(self, entry: Directive) -> str:
+        i = self.position(entry)
+        if i is None:
+            return "{}-x{}".format(self.key, id(entry))
+        return "{}-{}".format(self.key, i)
+
+    @cached_property
+    def by_hash(self) -> dict[str, Directive]:
+        return {hash_entry(entry): entry for entry in self.entries}
+
+    def get(self, entry_id: str) -> Directive:
+        """Look up an entry by id (or fava hash); raises KeyError if unknown
+
+        Ids from other versions of the files are unknown, as positions may have
+        moved.
+        """
+        key, sep, position = entry_id.partition("-")
+        if sep:
+            if key == self.key and position.isdigit():
+                i = int(position)
+                if i < len(self.entries):
+                    return self.entries[i]
+            raise KeyError(entry_id)
+        return self.by_hash[entry_id]
@@ -0,0 +1,73 @@
+"""Ledger errors, indexed by type, file and account"""
+
+import os
+from collections import Counter
+from typing import Sequence
+
+NONE = "(none)"
+
+GROUPINGS = {"type": "Type", "file": "File", "account": "Account"}
+
+
+def _error_account(error) -> str:
+    entry = getattr(error, "entry", None)
+    account = getattr(entry, "account", None)
+    if account:
+        return account
+    postings = getattr(entry, "postings", None)
+    if postings:
+        return postings[0].account
+    return NONE
+
+
+class ErrorIndex:
+    """Errors of one ledger generation, grouped for paging through them"""
+
+    def __init__(self, errors: Sequence, root: str = ""):
+        self.errors = list(errors)
+        self.root = root
+
+        self.keys = {grouping: [] for grouping in GROUPINGS}
+        self.locations = []
+        for error in self.errors:
+            source = getattr(error, "source", None) or {}
+            filename = source.get("filename") or NONE
+            lineno = source.get("lineno")
+            self.keys["type"].append(type(error).__name__)
+            self.keys["file"].append(filename)
+            self.keys["account"].append(_error_account(error))
+            self.locations.append(
+                "{}:{}".format(self.display_file(filename), lineno)
+                if lineno
+                else self.display_file(filename)
+            )
+
+        self.counts = {
+            grouping: Counter(keys).most_common()
+            for grouping, keys in self.keys.items()
+        }
+        self._selections = {}
+
+    def __len__(self):
+        return len(self.errors)
+
+    def display_file(self, filename: str) -> str:
+        if filename == NONE or not self.root or filename.startswith("<"):
+            return filename
+        return os.path.relpath(filename, self.root)
+
+    def select(self, grouping: str | None = None, value: str | None = None) -> list:
+        """Positions of the errors in a group, or all errors if value is None"""
+        if not grouping or value is None:
+            return list(range(len(self.errors)))
+        key = (grouping, value)
+        if key not in self._selections:
+            self._selections[key] = [
+                i for i, v in enumerate(self.keys[grouping]) if v == value
+            ]
+        return self._selections[key]
+
+    def page(self, selection: list, page: int, page_size: int) -> list:
+        """Positions of the errors on a (1-based) page of a selection"""
+        start = (max(page, 1) - 1) * page_size
+        return selection[start : start + page_size]
@@ -0,0 +1,33 @@
+"""Notifications of newly published ledger generations"""
+
+import threading
+
+
+class GenerationEvents:
+    """The fingerprint of the current generation of each ledger, and waiting
+    for changes
+
+    Fingerprints rather than generation numbers, which are per process: a
+    stream reconnecting to another worker then sees the same value.
+    """
+
+    def __init__(self):
+        self._current: dict[str, str] = {}
+        self._condition = threading.Condition()
+
+    def publish(self, slug: str, fingerprint: str) -> None:
+        with self._condition:
+            self._current[slug] = fingerprint
+            self._condition.notify_all()
+
+    def current(self, slug: str) -> str | None:
+        with self._condition:
+            return self._current.get(slug)
+
+    def wait(self, slug: str, last: str | None, timeout: float) -> str | None:
+        """The current generation of slug, once it is not last (or on timeout)"""
+        with self._condition:
+            self._condition.wait_for(
+                lambda: self._current.get(slug) != last, timeout=timeout
+            )
+            return self._current.get(slug)
@@ -0,0 +1,139 @@
+"""Lots held at cost, aggregated with pandas rather than beancount inventories
+
+The lot table of a generation holds one row per posting held at cost (account,
+commodity, cost and units), taken from the columnar postings table once per
+load.  Holdings as of a date are the lots summed per account, commodity and
+cost, valued with the conversion engine's prices in one pass per currency
+pair.
+"""
+
+import datetime
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from .conversion import ConversionEngine
+from .postings import PostingsTable
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+LOT = ["account", "currency", "cost_currency", "cost_number", "cost_date"]
+
+
+def lot_table(table: PostingsTable) -> "pd.DataFrame":
+    """One row per posting held at cost"""
+    import pandas as pd
+
+    rows = np.flatnonzero(table.cost_currency >= 0)
+    accounts = table.accounts.strings
+    currencies = table.currencies.strings
+    return pd.DataFrame(
+        {
+            "account": pd.Categorical.from_codes(table.account[rows], accounts),
+            "currency": pd.Categorical.from_codes(table.currency[rows], currencies),
+            "cost_currency": pd.Categorical.from_codes(
+                table.cost_currency[rows], currencies
+            ),
+            "cost_number": table.cost_number[rows],
+            "cost_date": table.cost_date[rows],
+            "date": table.date[rows],
+            "units": table.number[rows],
+        }
+    )
+
+
+def _rates(
+    conversion: ConversionEngine, base: "pd.Series", quote: "pd.Series", on
+) -> np.ndarray:
+    """Rates of base[i] in quote[i] as of on, per distinct pair"""
+    rates = np.full(len(base), np.nan)
+    when = np.array([np.datetime64(on, "D")])
+    pairs = np.stack([base.astype(str), np.asarray(quote, dtype=str)], axis=1)
+    for b, q in {tuple(pair) for pair in pairs.tolist()}:
+        mask = (pairs[:, 0] == b) & (pairs[:, 1] == q)
+        rates[mask] = conversion.rates(b, q, when)[0]
+    return rates
+
+
+def holdings(
+    lots: "pd.DataFrame",
+    conversion: ConversionEngine,
+    currency: str,
+    on: datetime.date | None = None,
+    account: str | None = None,
+) -> "pd.DataFrame":
+    """Open lots as of on (default: today), valued at market and in currency
+
+    Book and market values and the gain are in the cost currency of each lot,
+    `value` and `gain_value` in currency (nan where there is no price).
+    "postings" counts the postings of each lot.
+    """
+    on = on or datetime.date.today()
+    lots = lots[lots["date"] <= np.datetime64(on, "D")]
+    if account:
+        names = lots["account"].astype(str)
+        lots = lots[(names == account) | names.str.startswith(account + ":")]
+
+    held = lots.groupby(LOT, observed=True, sort=False)["units"].agg(["sum", "size"])
+    held = held.rename(columns={"sum": "units", "size": "postings"}).reset_index()
+    held = held[held["units"].abs() > 1e-9].reset_index(drop=True)
+
+    held["book_value"] = held["units"] * held["cost_number"]
+    price = _rates(conversion, held["currency"], held["cost_currency"], on)
+    held["price"] = price
+    held["market_value"] = held["units"] * price
+    held["gain"] = held["market_value"] - held["book_value"]
+    to_currency = _rates(
+        conversion, held["cost_currency"], np.full(len(held), currency), on
+    )
+    held["value"] = held["market_value"] * to_currency
+    held["gain_value"] = held["gain"] * to_currency
+    return held
+
+
+def by_commodity(held: "pd.DataFrame") -> "pd.DataFrame":
+    """Holdings summed per account and commodity"""
+    held = held.assign(unpriced=held["price"].isna())
+    sums = {
+        column: (column, "sum")
+        for column in ("units", "book_value", "market_value", "gain", "value")
+    }
+    grouped = held.groupby(
+        ["account", "currency", "cost_currency"], observed=True, sort=True
+    )
+    return grouped.agg(
+        lots=("units", "size"), unpriced=("unpriced", "any"), **sums
+    ).reset_index()
+
+
+@dataclass
+class AllocationNode:
+    """An account tree node, enough for `charting.create_breakdown_chart`"""
+
+    account: str
+    balance_children: dict = field(default_factory=dict)
+    children: list["AllocationNode"] = field(default_factory=list)
+
+
+def allocation_tree(
+    values: dict[str, float], currency: str, root: str
+) -> AllocationNode:
+    """The tree of the values of (colon separated) names below root"""
+    top = AllocationNode(root, {currency: 0.0})
+    nodes = {root: top}
+    for name, value in values.items():
+        if not value or value != value:
+            continue
+        parts = name.split(":")
+        if parts[0] != root:
+            continue
+        for depth in range(1, len(parts) + 1):
+            path = ":".join(parts[:depth])
+            node = nodes.get(path)
+            if node is None:
+                node = nodes[path] = AllocationNode(path, {currency: 0.0})
+                nodes[":".join(parts[: depth - 1])].children.append(node)
+            node.balance_children[currency] += value
+    return top
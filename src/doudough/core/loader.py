@@ -0,0 +1,408 @@
+"""Lazy, memory-bounded loading of many ledgers"""
+
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable
+
+from fava.util import slugify
+
+from . import forget_ledger, get_generation, ledger_files, track_ledger
+from .cache import create_cache
+from .events import GenerationEvents
+from .memory import format_bytes, release_memory, sampled_size
+from .payees import drop_payee_index
+from .warmup import WarmupScheduler
+from .watcher import create_watcher, file_stamp
+
+if TYPE_CHECKING:
+    from fava.core import FavaLedger
+
+    from .cache import CacheBackend
+
+    from .compact import CompactionStats
+
+log = logging.getLogger(__name__)
+
+_TITLE = re.compile(r'^option\s+"title"\s+"((?:[^"\\]|\\.)*)"', re.MULTILINE)
+
+
+def path_slug(path: str) -> str:
+    """The slug fava would give a ledger, without loading it
+
+    Fava slugifies the title option; this scans the main file for it, falling
+    back to the file name.
+    """
+    try:
+        match = _TITLE.search(Path(path).read_text(encoding="utf-8"))
+    except (OSError, UnicodeDecodeError):
+        match = None
+    slug = slugify(match.group(1)) if match else ""
+    return slug or slugify(Path(path).stem) or slugify(path)
+
+
+@dataclass
+class LoadedLedger:
+    ledger: "FavaLedger"
+    #: Approximate memory held by the ledger's entries, see `sampled_size`
+    size: int = 0
+    compaction: "CompactionStats | None" = None
+    last_access: float = field(default_factory=time.monotonic)
+
+
+class LedgerLoader:
+    """Loads ledgers on the first access to their slug, evicting idle ones
+
+    Ledgers are evicted (least recently used first) when more than `max_loaded`
+    are loaded or their total size exceeds `memory_budget` bytes, and once they
+    have not been accessed for `ttl` seconds.  With none of those set every
+    ledger stays loaded once used, as in fava.  Evicted ledgers, and everything
+    derived from them, are dropped and loaded again on the next access.
+
+    With a `snapshot_dir`, the postings tables are shared with other worker
+    processes (see `snapshot`), and with a `cache` so are computed views (see
+    `cache`).
+
+    After each load the default views of the ledger are computed in the
+    background (see `warmup`), unless disabled.
+
+    Loaded ledgers' files are watched (see `watcher`), and changed ledgers are
+    reloaded double-buffered: the new ledger, its indexes
+    and warm caches are built in the background while the previous one keeps
+    being served, and then swapped in at once (see `reload`).  Changes made by
+    doudough itself (see `editor`) are left to the editor, see `wrote`.
+
+    Implements the parts of fava's _LedgerSlugLoader doudough uses.
+    """
+
+    def __init__(
+        self,
+        paths: Iterable[str],
+        *,
+        max_loaded: int | None = None,
+        ttl: float | None = None,
+        memory_budget: int | None = None,
+        poll_watcher: bool = False,
+        warmup: bool = True,
+        snapshot_dir: str | None = None,
+        cache: "CacheBackend | None" = None,
+    ):
+        self.paths: dict[str, str] = {}
+        for path in paths:
+            slug = path_slug(path)
+            while slug in self.paths:
+                slug += "-"
+            self.paths[slug] = path
+
+        self.max_loaded = max_loaded
+        self.ttl = ttl
+        self.memory_budget = memory_budget
+        self.poll_watcher = poll_watcher
+        self.warmup = WarmupScheduler(self) if warmup else None
+        self.snapshot_dir = snapshot_dir
+        self.cache = cache
+
+        self._loaded: OrderedDict[str, LoadedLedger] = OrderedDict()
+        self._lock = threading.RLock()
+        #: Slug -> lock serializing the loads of that ledger only
+        self._load_locks: dict[str, threading.Lock] = {}
+        #: Slugs being reloaded, and whether they changed again meanwhile
+        self._reloading: dict[str, bool] = {}
+        #: Files doudough wrote itself, and their stats after writing
+        self._written: dict[str, dict[str, tuple | None]] = {}
+        self._local = threading.local()
+        self.events = GenerationEvents()
+        self.watcher = create_watcher(self._files_changed, poll=poll_watcher)
+
+        if ttl:
+            threading.Thread(
+                target=self._expire_loop, name="doudough-ledger-ttl", daemon=True
+            ).start()
+
+    @classmethod
+    def from_config(cls, config) -> "LedgerLoader":
+        budget = config.get("LEDGER_MEMORY_BUDGET")
+        cache_size = config.get("CACHE_SIZE")
+        cache = create_cache(
+            config.get("CACHE_URL", "memory"),
+            cache_size * 1024 * 1024 if cache_size else None,
+        )
+        return cls(
+            config["BEANCOUNT_FILES"],
+            max_loaded=config.get("LEDGER_MAX_LOADED"),
+            ttl=config.get("LEDGER_TTL"),
+            memory_budget=budget * 1024 * 1024 if budget else None,
+            poll_watcher=config.get("POLL_WATCHER", False),
+            warmup=config.get("LEDGER_WARMUP", True),
+            snapshot_dir=config.get("SNAPSHOT_DIR"),
+            cache=cache,
+        )
+
+    @property
+    def slugs(self) -> list[str]:
+        return list(self.paths)
+
+    def first_slug(self) -> str:
+        return next(iter(self.paths))
+
+    @property
+    def ledgers_by_slug(self) -> dict[str, "FavaLedger"]:
+        """The currently loaded ledgers"""
+        with self._lock:
+            return {slug: loaded.ledger for slug, loaded in self._loaded.items()}
+
+    @property
+    def ledgers(self) -> list["FavaLedger"]:
+        return list(self.ledgers_by_slug.values())
+
+    def __contains__(self, slug) -> bool:
+        return slug in self.paths
+
+    def loaded(self, slug: str) -> "FavaLedger | None":
+        """The ledger if it is loaded, without loading it or counting an access"""
+        staged = self._staged_ledger(slug)
+        if staged is not None:
+            return staged
+        with self._lock:
+            loaded = self._loaded.get(slug)
+            return loaded.ledger if loaded is not None else None
+
+    def __getitem__(self, slug: str) -> "FavaLedger":
+        if slug not in self.paths:
+            raise KeyError(slug)
+        staged = self._staged_ledger(slug)
+        if staged is not None:
+            return staged
+        with self._lock:
+            loaded = self._loaded.get(slug)
+            if loaded is not None:
+                loaded.last_access = time.monotonic()
+                self._loaded.move_to_end(slug)
+                return loaded.ledger
+
+        # Loading is slow, so don't hold up access to other ledgers meanwhile
+        with self._load_lock(slug):
+            with self._lock:
+                if slug in self._loaded:
+                    return self[slug]
+            loaded = self._load(slug)
+            with self._lock:
+                self._loaded[slug] = loaded
+                self._evict(keep=slug)
+            self.watcher.watch(slug, ledger_files(loaded.ledger))
+            self.events.publish(slug, get_generation(loaded.ledger).fingerprint)
+            if self.warmup is not None:
+                self.warmup.schedule(slug)
+            return loaded.ledger
+
+    def _load_lock(self, slug: str) -> threading.Lock:
+        with self._lock:
+            return self._load_locks.setdefault(slug, threading.Lock())
+
+    def _load(self, slug: str) -> LoadedLedger:
+        from fava.core import FavaLedger
+
+        from .compact import compact_ledger
+
+        t0 = time.monotonic()
+        # Changes are detected by self.watcher; fava's polling watcher is
+        # passive, so it costs nothing
+        ledger = FavaLedger(self.paths[slug], poll_watcher=True)
+        track_ledger(ledger)
+        compaction = compact_ledger(ledger)
+        # While the files are as parsed
+        get_generation(ledger).fingerprint
+        if self.snapshot_dir:
+            self._map_snapshot(slug, ledger)
+        # Measured per ledger: the process does not shrink after evictions, and
+        # other ledgers may load meanwhile
+        size = sampled_size(ledger.all_entries)
+        log.info(
+            "Loaded %s in %.1fs (%s)", slug, time.monotonic() - t0, format_bytes(size)
+        )
+        return LoadedLedger(ledger, size, compaction)
+
+    def _map_snapshot(self, slug: str, ledger: "FavaLedger") -> None:
+        from .snapshot import shared_postings
+
+        generation = get_generation(ledger)
+        try:
+            table = shared_postings(
+                self.snapshot_dir, slug, generation.fingerprint, ledger.all_entries
+            )
+        except OSError:
+            log.exception("Could not share the postings of %s", slug)
+            return
+        generation.postings = table
+
+    def _staged_ledger(self, slug: str) -> "FavaLedger | None":
+        staged = getattr(self._local, "staged", None)
+        if staged is not None and staged[0] == slug:
+            return staged[1]
+        return None
+
+    @contextmanager
+    def _staging(self, slug: str, ledger: "FavaLedger"):
+        """Serve ledger for slug, on this thread only (to warm it up unpublished)"""
+        self._local.staged = (slug, ledger)
+        try:
+            yield
+        finally:
+            self._local.staged = None
+
+    def reload(self, slug: str) -> None:
+        """Reload a loaded ledger in the background
+
+        Until the new ledger is fully built and warmed up, requests are served
+        the previous one.  Changes during a reload trigger one more reload.
+        """
+        with self._lock:
+            if slug not in self._loaded:
+                return
+            if slug in self._reloading:
+                self._reloading[slug] = True
+                return
+            self._reloading[slug] = False
+        threading.Thread(
+            target=self._reload, args=(slug,), name="doudough-reload", daemon=True
+        ).start()
+
+    def _reload(self, slug: str) -> None:
+        again = True
+        while again:
+            loaded = None
+            try:
+                with self._load_lock(slug):
+                    loaded = self._load(slug)
+                generation = get_generation(loaded.ledger)
+                generation.prepare()
+                if self.warmup is not None:
+                    with self._staging(slug, loaded.ledger):
+                        self.warmup.warm(slug)
+            except Exception:
+                log.exception("Reloading %s failed, keeping the previous load", slug)
+                if loaded is not None:
+                    forget_ledger(loaded.ledger)
+                loaded = None
+
+            with self._lock:
+                previous = self._loaded.get(slug)
+                # Stop if evicted meanwhile, otherwise go again if changed
+                again = self._reloading.pop(slug) and previous is not None
+                if again:
+                    self._reloading[slug] = False
+                if loaded is not None and previous is not None:
+                    # Same position in the LRU order
+                    loaded.last_access = previous.last_access
+                    self._loaded[slug] = loaded
+                    self._evict(keep=slug)
+
+            if loaded is not None:
+                if previous is not None:
+                    log.info("Published %s", generation)
+                    self.events.publish(slug, generation.fingerprint)
+                    # Includes may have changed
+                    self.watcher.watch(slug, ledger_files(loaded.ledger))
+                    forget_ledger(previous.ledger)
+                else:
+                    forget_ledger(loaded.ledger)
+            previous = loaded = None
+            release_memory()
+
+    def wrote(self, slug: str, paths: Iterable[str]) -> None:
+        """doudough wrote paths of slug, and updates (or reloads) the ledger
+        itself: the watcher should not reload it for these writes"""
+        stats = {os.path.abspath(path): file_stamp(path) for path in paths}
+        with self._lock:
+            self._written.setdefault(slug, {}).update(stats)
+
+    def _files_changed(self, slug: str, paths: set[str]) -> None:
+        """Reload slug, unless only files doudough wrote (as it wrote them)
+        changed"""
+        with self._lock:
+            written = self._written.get(slug, {})
+            own = {p for p in paths if p in written}
+            stamps = {p: written.pop(p) for p in own}
+        own = {p for p in own if file_stamp(p) == stamps[p]}
+        if own and own == paths:
+            log.info("Not reloading %s for its own edits", slug)
+            return
+        self.reload(slug)
+
+    def patched(self, slug: str, ledger: "FavaLedger") -> None:
+        """Publish the generation ledger was patched to (see `editor`)
+
+        If ledger is no longer the one served, or is being reloaded (possibly
+        from the files before the edit), reload it instead.
+        """
+        with self._lock:
+            loaded = self._loaded.get(slug)
+            stale = loaded is None or loaded.ledger is not ledger
+            stale = stale or slug in self._reloading
+        if stale:
+            self.reload(slug)
+            return
+        self.events.publish(slug, get_generation(ledger).fingerprint)
+        if self.warmup is not None:
+            self.warmup.schedule(slug)
+
+    def stats(self) -> dict[str, dict]:
+        """Memory use of the loaded ledgers"""
+        with self._lock:
+            return {
+                slug: {
+                    "size": format_bytes(loaded.size),
+                    "compaction": str(loaded.compaction),
+                    "idle": "{:.0f}s".format(time.monotonic() - loaded.last_access),
+                }
+                for slug, loaded in self._loaded.items()
+            }
+
+    def evict(self, slug: str) -> None:
+        with self._lock:
+            loaded = self._loaded.pop(slug, None)
+        if loaded is not None:
+            log.info("Evicting %s (%s)", slug, format_bytes(loaded.size))
+            self.watcher.unwatch(slug)
+            # Kept across reloads, but not once evicted
+            drop_payee_index(loaded.ledger.beancount_file_path)
+            forget_ledger(loaded.ledger)
+            loaded = None
+            release_memory()
+
+    def _over_budget(self) -> bool:
+        if self.max_loaded and len(self._loaded) > self.max_loaded:
+            return True
+        if self.memory_budget:
+            total = sum(loaded.size for loaded in self._loaded.values())
+            return total > self.memory_budget
+        return False
+
+    def _evict(self, keep: str) -> None:
+        """Evict least recently used ledgers (other than `keep`) until in budget"""
+        while self._over_budget():
+            victim = next((s for s in self._loaded if s != keep), None)
+            if victim is None:
+                break
+            self.evict(victim)
+
+    def expire(self) -> None:
+        """Evict ledgers which have not been accessed within the ttl"""
+        if not self.ttl:
+            return
+        cutoff = time.monotonic() - self.ttl
+        with self._lock:
+            expired = [s for s, l in self._loaded.items() if l.last_access < cutoff]
+        for slug in expired:
+            self.evict(slug)
+
+    def _expire_loop(self):
+        while True:
+            time.sleep(max(1.0, min(self.ttl / 2, 60.0)))
+            self.expire()
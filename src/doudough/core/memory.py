@@ -0,0 +1,82 @@
+"""Process memory helpers"""
+
+import ctypes
+import ctypes.util
+import gc
+import os
+import sys
+from typing import Sequence
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def current_rss() -> int | None:
+    """Resident set size of this process in bytes, if it can be measured"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        pass
+    if resource is None:
+        return None
+    # Peak rather than current usage, but better than nothing
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def sampled_size(items: Sequence, sample: int = 1000) -> int:
+    """Approximate memory held by items and the objects they reference
+
+    Measured on an even sample of at most `sample` items and scaled up.
+    Objects shared by the sampled items (eg. interned strings) are counted once.
+    """
+    if not items:
+        return sys.getsizeof(items)
+    step = max(1, len(items) // sample)
+    sampled = range(0, len(items), step)
+    seen = set()
+    size = sum(_deep_size(items[i], seen) for i in sampled)
+    return sys.getsizeof(items) + size * len(items) // len(sampled)
+
+
+def _deep_size(obj, seen: set) -> int:
+    size = 0
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+    return size
+
+
+def release_memory() -> None:
+    """Collect garbage and hand freed heap pages back to the OS where possible"""
+    gc.collect()
+    libc_name = ctypes.util.find_library("c")
+    if not libc_name:
+        return
+    try:
+        ctypes.CDLL(libc_name).malloc_trim(0)
+    except (OSError, AttributeError):
+        pass  # Not glibc
+
+
+def format_bytes(n: int | None) -> str:
+    if n is None:
+        return "?"
+    for unit in ("B", "kB", "MB", "GB"):
+        if abs(n) < 1024 or unit == "GB":
+            return "{:.1f} {}".format(n, unit) if unit != "B" else "{} B".format(n)
+        n /= 1024
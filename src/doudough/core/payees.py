@@ -0,0 +1,223 @@
+"""Clusters of near-duplicate payees, found with MinHash and LSH
+
+Each payee is normalized (case, digits and punctuation dropped), cut into
+character shingles and summarized by a MinHash signature, whose rows agree
+between two payees about as often as their shingle sets overlap (Jaccard
+similarity).  Signatures are split into bands, and payees sharing any band
+are candidates; candidates whose signatures agree on at least THRESHOLD of
+their rows are clustered.  Nothing is compared pairwise.
+
+A `PayeeIndex` is kept per ledger file across reloads, so a reload only
+hashes payees it has not seen before.  Payees with less than SHINGLE
+characters left once normalized (eg. only digits) are not indexed: they would
+all look alike.
+"""
+
+import re
+import threading
+import zlib
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Iterable
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from . import LedgerGeneration
+
+SHINGLE = 3
+BANDS = 16
+ROWS = 4
+NUM_PERM = BANDS * ROWS
+THRESHOLD = 0.5
+
+#: Permutations are approximated by (a * hash + b) % prime, letting the product
+#: wrap around 2**64 as numpy does (as datasketch's MinHash does)
+_PRIME = np.uint64((1 << 61) - 1)
+_RNG = np.random.default_rng(20240101)
+_A = _RNG.integers(1, _PRIME, NUM_PERM, dtype=np.uint64)[:, None]
+_B = _RNG.integers(0, _PRIME, NUM_PERM, dtype=np.uint64)[:, None]
+
+#: Shingles hashed at once (bounds the NUM_PERM x CHUNK working array)
+CHUNK = 50000
+
+_NOISE = re.compile(r"[\W\d_]+")
+
+
+def normalize(payee: str) -> str:
+    return " ".join(_NOISE.sub(" ", payee.lower()).split())
+
+
+def shingles(payee: str) -> set[str]:
+    text = " {} ".format(normalize(payee))
+    if len(text) <= SHINGLE:
+        return {text}
+    return {text[i : i + SHINGLE] for i in range(len(text) - SHINGLE + 1)}
+
+
+def indexable(payee: str) -> bool:
+    """Whether payee has enough text to be compared"""
+    return len(normalize(payee)) >= SHINGLE
+
+
+def signatures(payees: list[str]) -> np.ndarray:
+    """MinHash signatures of payees, one row of NUM_PERM each"""
+    hashes, owners = [], []
+    for i, payee in enumerate(payees):
+        for shingle in shingles(payee):
+            hashes.append(zlib.crc32(shingle.encode("utf-8")))
+            owners.append(i)
+    hashes = np.array(hashes, dtype=np.uint64)
+    owners = np.array(owners, dtype=np.int64)
+
+    result = np.full((len(payees), NUM_PERM), np.iinfo(np.uint64).max, np.uint64)
+    for start in range(0, len(hashes), CHUNK):
+        chunk = hashes[start : start + CHUNK]
+        hashed = (_A * chunk + _B) % _PRIME
+        # Every payee's shingles are contiguous, so each chunk holds runs
+        chunk_owners = owners[start : start + CHUNK]
+        runs = np.flatnonzero(np.diff(chunk_owners, prepend=-1))
+        mins = np.minimum.reduceat(hashed, runs, axis=1).T
+        ids = chunk_owners[runs]
+        result[ids] = np.minimum(result[ids], mins)
+    return result
+
+
+class PayeeIndex:
+    """MinHash signatures and LSH buckets of every payee seen so far"""
+
+    def __init__(self):
+        self.ids: dict[str, int] = {}
+        self.payees: list[str] = []
+        #: Payees too short to compare, see `indexable`
+        self.skipped: set[str] = set()
+        self.signatures = np.zeros((0, NUM_PERM), dtype=np.uint64)
+        self.buckets: list[dict[bytes, list[int]]] = [
+            defaultdict(list) for _ in range(BANDS)
+        ]
+        self._lock = threading.Lock()
+
+    def update(self, payees: Iterable[str]) -> int:
+        """Index the payees not seen before, returning how many were indexed"""
+        with self._lock:
+            new = {p for p in payees if p not in self.ids and p not in self.skipped}
+            skipped = {p for p in new if not indexable(p)}
+            self.skipped |= skipped
+            new = sorted(new - skipped)
+            if not new:
+                return 0
+            first = len(self.payees)
+            sigs = signatures(new)
+            self.signatures = np.concatenate([self.signatures, sigs])
+            for offset, payee in enumerate(new):
+                self.ids[payee] = first + offset
+            self.payees.extend(new)
+            for band, buckets in enumerate(self.buckets):
+                rows = sigs[:, band * ROWS : (band + 1) * ROWS]
+                for offset, key in enumerate(rows):
+                    buckets[key.tobytes()].append(first + offset)
+            return len(new)
+
+    def clusters(
+        self, payees: Iterable[str], threshold: float = THRESHOLD
+    ) -> list[list[str]]:
+        """Groups of (at least two) likely identical payees among payees"""
+        with self._lock:
+            wanted = {self.ids[p] for p in payees if p in self.ids}
+            parent = {i: i for i in wanted}
+
+            def root(i):
+                while parent[i] != i:
+                    parent[i] = parent[parent[i]]
+                    i = parent[i]
+                return i
+
+            for buckets in self.buckets:
+                for members in buckets.values():
+                    if len(members) < 2:
+                        continue
+                    members = [m for m in members if m in wanted]
+                    if len(members) < 2:
+                        continue
+                    # Compared to the first member only, so a bucket is linear
+                    first = self.signatures[members[0]]
+                    agree = (self.signatures[members[1:]] == first).mean(axis=1)
+                    for member, similarity in zip(members[1:], agree):
+                        if similarity >= threshold:
+                            parent[root(member)] = root(members[0])
+
+            groups = defaultdict(list)
+            for i in wanted:
+                groups[root(i)].append(self.payees[i])
+        return [sorted(g) for g in groups.values() if len(g) > 1]
+
+
+_INDEXES: dict[str, PayeeIndex] = {}
+_INDEXES_LOCK = threading.Lock()
+
+
+def payee_index(key: str) -> PayeeIndex:
+    """The index kept for a ledger (by its main file) across reloads"""
+    with _INDEXES_LOCK:
+        index = _INDEXES.get(key)
+        if index is None:
+            index = _INDEXES[key] = PayeeIndex()
+        return index
+
+
+def drop_payee_index(key: str) -> None:
+    """Free the index of a ledger which is no longer loaded (not reloaded)"""
+    with _INDEXES_LOCK:
+        _INDEXES.pop(key, None)
+
+
+@dataclass
+class PayeeCluster:
+    #: The most used spelling
+    name: str
+    payees: list[str]
+    #: Transactions per payee
+    counts: list[int]
+    #: Amount moved per payee (see `PostingsTable.entry_totals`)
+    totals: list[float]
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    @property
+    def total(self) -> float:
+        return sum(self.totals)
+
+
+def payee_clusters(generation: "LedgerGeneration") -> list[PayeeCluster]:
+    """Clusters of the payees of a generation, most used first"""
+    table = generation.postings
+    names = table.payees.strings
+    index = payee_index(generation.ledger.beancount_file_path)
+    index.update(names)
+
+    # One row per transaction: its payee and the amount it moved
+    starts, ends = table.entry_offsets[:-1], table.entry_offsets[1:]
+    transactions = np.flatnonzero(ends > starts)
+    codes = table.payee[starts[transactions]]
+    named = codes >= 0
+    codes = codes[named]
+    counts = np.bincount(codes, minlength=len(names))
+    moved = generation.entry_totals[transactions][named]
+    totals = np.bincount(codes, weights=moved, minlength=len(names))
+
+    code = {name: i for i, name in enumerate(names)}
+    clusters = []
+    for group in index.clusters(names):
+        ordered = sorted(group, key=lambda p: -counts[code[p]])
+        clusters.append(
+            PayeeCluster(
+                name=ordered[0],
+                payees=ordered,
+                counts=[int(counts[code[p]]) for p in ordered],
+                totals=[float(totals[code[p]]) for p in ordered],
+            )
+        )
+    clusters.sort(key=lambda c: -c.count)
+    return clusters
@@ -0,0 +1,200 @@
+"""Columnar (array-backed) table of every posting of a ledger generation"""
+
+import copy
+from typing import Iterable, Sequence
+
+import numpy as np
+from beancount.core.convert import get_weight
+from beancount.core.data import Directive, Transaction
+
+
+class StringTable:
+    """Distinct strings and their integer codes"""
+
+    def __init__(self):
+        self.strings: list[str] = []
+        self._codes: dict[str, int] = {}
+
+    @classmethod
+    def from_strings(cls, strings: list[str]) -> "StringTable":
+        table = cls()
+        table.strings = list(strings)
+        table._codes = {s: code for code, s in enumerate(table.strings)}
+        return table
+
+    def __len__(self):
+        return len(self.strings)
+
+    def code(self, s: str | None) -> int:
+        if s is None:
+            return -1
+        code = self._codes.get(s)
+        if code is None:
+            code = self._codes[s] = len(self.strings)
+            self.strings.append(s)
+        return code
+
+    def get(self, code: int) -> str | None:
+        return self.strings[code] if code >= 0 else None
+
+    def lookup(self, codes: Iterable[int], missing=None) -> list:
+        strings = self.strings
+        return [strings[c] if c >= 0 else missing for c in codes]
+
+    def codes_of(self, predicate) -> np.ndarray:
+        """Codes of all strings for which predicate(string) is true"""
+        return np.array(
+            [c for c, s in enumerate(self.strings) if predicate(s)], dtype=np.int32
+        )
+
+
+def _nan_or_float(number) -> float:
+    return float(number) if number is not None else np.nan
+
+
+#: The columns of a PostingsTable, and its string tables
+ARRAYS = (
+    "entry",
+    "date",
+    "account",
+    "payee",
+    "number",
+    "currency",
+    "weight",
+    "weight_currency",
+    "cost_number",
+    "cost_currency",
+    "cost_date",
+    "entry_offsets",
+)
+STRING_TABLES = ("accounts", "currencies", "payees")
+
+
+def posting_counts(entries: Sequence[Directive]) -> np.ndarray:
+    """Number of postings of each entry (0 for other directives)"""
+    return np.fromiter(
+        (len(e.postings) if isinstance(e, Transaction) else 0 for e in entries),
+        dtype=np.int64,
+        count=len(entries),
+    )
+
+
+class PostingsTable:
+    """One row per transaction posting, built once per load
+
+    Numbers are float64 (exact Decimals stay on the entries).  Strings are
+    stored as int32 codes into the `accounts`, `currencies` and `payees` tables,
+    with -1 for None.  The postings of the entry at position i of all_entries
+    are rows entry_offsets[i]:entry_offsets[i + 1].
+    """
+
+    def __init__(self, entries: Sequence[Directive]):
+        self.accounts = StringTable()
+        self.currencies = StringTable()
+        self.payees = StringTable()
+
+        entry, date, account, payee = [], [], [], []
+        number, currency = [], []
+        weight, weight_currency = [], []
+        cost_number, cost_currency, cost_date = [], [], []
+        counts = np.zeros(len(entries), dtype=np.int64)
+
+        for position, txn in enumerate(entries):
+            if not isinstance(txn, Transaction):
+                continue
+            counts[position] = len(txn.postings)
+            payee_code = self.payees.code(txn.payee)
+            for posting in txn.postings:
+                entry.append(position)
+                date.append(txn.date)
+                account.append(self.accounts.code(posting.account))
+                payee.append(payee_code)
+                units = posting.units
+                number.append(_nan_or_float(units.number))
+                currency.append(self.currencies.code(units.currency))
+                w = get_weight(posting)
+                weight.append(_nan_or_float(w.number))
+                weight_currency.append(self.currencies.code(w.currency))
+                cost = posting.cost
+                if cost is not None:
+                    cost_number.append(_nan_or_float(cost.number))
+                    cost_currency.append(self.currencies.code(cost.currency))
+                    cost_date.append(cost.date or txn.date)
+                else:
+                    cost_number.append(np.nan)
+                    cost_currency.append(-1)
+                    cost_date.append(txn.date)
+
+        self.entry = np.array(entry, dtype=np.int32)
+        self.date = np.array(date, dtype="datetime64[D]")
+        self.account = np.array(account, dtype=np.int32)
+        self.payee = np.array(payee, dtype=np.int32)
+        self.number = np.array(number, dtype=np.float64)
+        self.currency = np.array(currency, dtype=np.int32)
+        self.weight = np.array(weight, dtype=np.float64)
+        self.weight_currency = np.array(weight_currency, dtype=np.int32)
+        self.cost_number = np.array(cost_number, dtype=np.float64)
+        self.cost_currency = np.array(cost_currency, dtype=np.int32)
+        self.cost_date = np.array(cost_date, dtype="datetime64[D]")
+        self.entry_offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    @classmethod
+    def from_arrays(
+        cls, arrays: dict[str, np.ndarray], strings: dict[str, list[str]]
+    ) -> "PostingsTable":
+        """A table of existing columns, eg. memory mapped from a snapshot"""
+        table = cls.__new__(cls)
+        for name in ARRAYS:
+            setattr(table, name, arrays[name])
+        for name in STRING_TABLES:
+            setattr(table, name, StringTable.from_strings(strings[name]))
+        return table
+
+    def __len__(self):
+        return len(self.entry)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = [v for v in vars(self).values() if isinstance(v, np.ndarray)]
+        return sum(array.nbytes for array in arrays)
+
+    def main_currency(self) -> str | None:
+        """The currency most postings are weighed in"""
+        codes = self.weight_currency[self.weight_currency >= 0]
+        if not len(codes):
+            return None
+        return self.currencies.get(int(np.bincount(codes).argmax()))
+
+    def with_payee(self, position: int, payee: str | None) -> "PostingsTable":
+        """A copy with the payee of the entry at position changed
+
+        Only the payee column is copied, other columns are shared.
+        """
+        table = copy.copy(self)
+        table.payees = StringTable.from_strings(self.payees.strings)
+        table.payee = np.array(self.payee)
+        start, stop = self.entry_offsets[position], self.entry_offsets[position + 1]
+        table.payee[start:stop] = table.payees.code(payee)
+        return table
+
+    def rows(self, positions) -> np.ndarray:
+        """Rows of the postings of the entries at the given positions, in order"""
+        positions = np.asarray(positions, dtype=np.int64)
+        starts = self.entry_offsets[positions]
+        lengths = self.entry_offsets[positions + 1] - starts
+        offsets = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+        return offsets + np.arange(lengths.sum())
+
+    def entry_totals(self) -> np.ndarray:
+        """Per entry position: half the sum of absolute posting weights
+
+        ie the amount moved by a balanced transaction, regardless of currency.
+        """
+        return (
+            np.bincount(
+                self.entry,
+                weights=np.abs(np.nan_to_num(self.weight)),
+                minlength=len(self.entry_offsets) - 1,
+            )
+            / 2
+        )
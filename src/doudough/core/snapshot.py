@@ -0,0 +1,119 @@
+"""Postings tables shared between worker processes through memory-mapped files
+
+With several workers every process parses its own copy of each ledger (fava
+needs the entries), but the bulk columnar data derived from them only has to
+be built once: the first worker to load a version of a ledger writes its
+PostingsTable to SNAPSHOT_DIR as .npy files, and every worker (including
+itself) maps them read-only, so the pages are shared by the OS.
+
+Snapshots are keyed by a fingerprint of the ledger's files (paths, sizes and
+modification times) and of the number of postings of every entry, so workers
+which parsed different versions of a file never share.  Each is built under a
+file lock, so only one worker builds it, and published by an atomic rename.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+from contextlib import contextmanager
+from typing import Iterable, Sequence
+
+import numpy as np
+
+from .postings import ARRAYS, STRING_TABLES, PostingsTable, posting_counts
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+log = logging.getLogger(__name__)
+
+#: Bump when the layout of a PostingsTable changes
+VERSION = 1
+
+
+def fingerprint(paths: Iterable[str], entries: Sequence) -> str:
+    """Identifies the entries parsed from the files, without reading them again"""
+    h = hashlib.sha256(str(VERSION).encode())
+    h.update(posting_counts(entries).tobytes())
+    for path in sorted(paths):
+        try:
+            st = os.stat(path)
+        except OSError:
+            stamp = None
+        else:
+            stamp = st.st_size, st.st_mtime_ns
+        h.update(json.dumps([path, stamp]).encode())
+    return h.hexdigest()[:32]
+
+
+@contextmanager
+def _locked(path: str):
+    with open(path, "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def save(table: PostingsTable, directory: str) -> None:
+    """Write table to directory, which appears atomically"""
+    parent = os.path.dirname(directory)
+    tmp = tempfile.mkdtemp(dir=parent, prefix=".building-")
+    try:
+        for name in ARRAYS:
+            np.save(os.path.join(tmp, name + ".npy"), getattr(table, name))
+        with open(os.path.join(tmp, "strings.json"), "w", encoding="utf-8") as f:
+            strings = {name: getattr(table, name).strings for name in STRING_TABLES}
+            json.dump(strings, f)
+        os.rename(tmp, directory)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+
+def load(directory: str) -> PostingsTable:
+    """Map a saved table (read-only)"""
+    arrays = {
+        name: np.load(os.path.join(directory, name + ".npy"), mmap_mode="r")
+        for name in ARRAYS
+    }
+    with open(os.path.join(directory, "strings.json"), encoding="utf-8") as f:
+        strings = json.load(f)
+    return PostingsTable.from_arrays(arrays, strings)
+
+
+def _remove_stale(root: str, slug: str, keep: str) -> None:
+    pattern = re.compile(re.escape(slug) + "-[0-9a-f]{32}")
+    for name in os.listdir(root):
+        if pattern.fullmatch(name) and name != keep:
+            # Workers still mapping it keep their pages until they unmap
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+
+def shared_postings(
+    root: str, slug: str, fingerprint: str, entries: Sequence
+) -> PostingsTable:
+    """The postings table of entries, from (or published to) a snapshot in root
+
+    fingerprint is that of the generation of entries, see `fingerprint`.
+    """
+    os.makedirs(root, exist_ok=True)
+    name = "{}-{}".format(slug, fingerprint)
+    directory = os.path.join(root, name)
+
+    with _locked(os.path.join(root, slug + ".lock")):
+        if not os.path.isdir(directory):
+            save(PostingsTable(entries), directory)
+            _remove_stale(root, slug, keep=name)
+            log.info("Published postings snapshot %s", name)
+
+    return load(directory)
@@ -0,0 +1,158 @@
+"""Byte extents of every entry in its source file, read through mmap"""
+
+import mmap
+import os
+from collections import defaultdict
+from hashlib import sha256
+from typing import Sequence
+
+import numpy as np
+from beancount.core.data import Directive
+from fava.core.file import get_entry_slice
+
+_WHITESPACE = b" \t\r\n\f"
+
+
+class SourceFile:
+    """A read-only memory map of a source file, with the extent of every entry
+
+    An entry spans its first line plus the indented, non-blank lines which
+    follow it (the same rule as fava's `get_entry_slice`).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self.stamp = _stamp(os.fstat(f.fileno()))
+            self.data = b""
+            if self.stamp[1]:
+                self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        buf = np.frombuffer(self.data, dtype=np.uint8)
+        starts = np.concatenate([[0], np.flatnonzero(buf == ord("\n")) + 1])
+        self.line_starts = starts[starts < len(buf)]
+
+        if len(self.line_starts):
+            whitespace = np.isin(buf, np.frombuffer(_WHITESPACE, dtype=np.uint8))
+            has_content = (
+                np.add.reduceat(~whitespace, self.line_starts, dtype=np.int64) > 0
+            )
+            first = buf[self.line_starts]
+            indented = (first == ord(" ")) | (first == ord("\t"))
+            self._breaks = np.flatnonzero(~(indented & has_content))
+        else:
+            self._breaks = np.zeros(0, dtype=np.int64)
+
+    def is_current(self) -> bool:
+        """Whether the file is unchanged since it was mapped"""
+        try:
+            return _stamp(os.stat(self.path)) == self.stamp
+        except OSError:
+            return False
+
+    def extents(self, linenos) -> tuple[np.ndarray, np.ndarray]:
+        """Byte offsets and lengths of the entries starting at (1-based) linenos"""
+        lines = np.asarray(linenos, dtype=np.int64) - 1
+        nlines = len(self.line_starts)
+        lines = np.clip(lines, 0, max(nlines - 1, 0))
+        if not nlines:
+            return np.zeros(len(lines), np.int64), np.zeros(len(lines), np.int64)
+
+        # The entry ends at the next line (after its first) which is not a
+        # continuation
+        next_break = np.searchsorted(self._breaks, lines, side="right")
+        end_lines = np.append(self._breaks, nlines)[next_break]
+        ends = np.append(self.line_starts, len(self.data))[end_lines]
+        offsets = self.line_starts[lines]
+
+        # Trailing newlines are not part of the entry
+        lengths = ends - offsets
+        for i in np.flatnonzero(lengths):
+            while lengths[i] and self.data[offsets[i] + lengths[i] - 1] in b"\r\n":
+                lengths[i] -= 1
+        return offsets, lengths
+
+    def read(self, offset: int, length: int) -> str:
+        return self.data[offset : offset + length].decode("utf-8")
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+
+
+def _stamp(stat: os.stat_result) -> tuple[int, int]:
+    return stat.st_mtime_ns, stat.st_size
+
+
+class SourceIndex:
+    """(file, byte offset, length) of every entry of a ledger generation
+
+    Source lookups are then a slice of a memory-mapped file.  If a file changes
+    on disk its map is dropped, and lookups fall back to fava (reading the
+    file) until the ledger is reloaded.
+    """
+
+    def __init__(self, entries: Sequence[Directive]):
+        by_file = defaultdict(list)
+        for position, entry in enumerate(entries):
+            meta = entry.meta or {}
+            filename = meta.get("filename")
+            lineno = meta.get("lineno")
+            if filename and lineno and not filename.startswith("<"):
+                by_file[filename].append((position, lineno))
+
+        self.files: list[SourceFile | None] = []
+        self.paths: list[str] = []
+        self.file_numbers = np.full(len(entries), -1, dtype=np.int32)
+        self.offsets = np.zeros(len(entries), dtype=np.int64)
+        self.lengths = np.zeros(len(entries), dtype=np.int64)
+
+        for filename, items in by_file.items():
+            try:
+                source = SourceFile(filename)
+            except OSError:
+                continue
+            positions, linenos = np.array(items, dtype=np.int64).T
+            self.file_numbers[positions] = len(self.files)
+            self.offsets[positions], self.lengths[positions] = source.extents(linenos)
+            self.files.append(source)
+            self.paths.append(filename)
+
+    def refresh(self, path: str, entries: Sequence[Directive]) -> None:
+        """Map path again after lines of it were rewritten in place (the line
+        numbers of its entries unchanged), see `editor`"""
+        number = self.paths.index(path)
+        positions = np.flatnonzero(self.file_numbers == number)
+        linenos = [entries[p].meta["lineno"] for p in positions.tolist()]
+        source = SourceFile(path)
+        self.offsets[positions], self.lengths[positions] = source.extents(linenos)
+        # The previous map is dropped rather than closed, as in `source`
+        self.files[number] = source
+
+    def source(self, position: int) -> str | None:
+        """Source text of the entry at a position in all_entries, if still valid"""
+        number = self.file_numbers[position]
+        if number < 0:
+            return None
+        source = self.files[number]
+        if source is None:
+            return None
+        if not source.is_current():
+            # Dropped rather than closed, another thread may be reading it
+            self.files[number] = None
+            return None
+        return source.read(self.offsets[position], self.lengths[position])
+
+    def get_entry_slice(
+        self, entry: Directive, position: int | None
+    ) -> tuple[str, str]:
+        """Like fava's get_entry_slice: the entry's source and its sha256"""
+        source = self.source(position) if position is not None else None
+        if source is None:
+            return get_entry_slice(entry)
+        return source, sha256(source.encode("utf-8")).hexdigest()
+
+    def close(self):
+        for source in self.files:
+            if source is not None:
+                source.close()
@@ -0,0 +1,84 @@
+"""Background precomputation of the default views of freshly loaded ledgers
+
+Pages register a function computing their default (unfiltered) view into the
+ledger generation's caches, see `pages.app_shell.controls.warmup`.  After
+each load, the loader schedules them to run on a background thread, so the
+first visit to a page is a cache hit.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Callable
+
+from . import get_generation
+
+if TYPE_CHECKING:
+    from fava.core import FavaLedger
+
+    from .loader import LedgerLoader
+
+log = logging.getLogger(__name__)
+
+#: Functions of a ledger slug and the ledger, computing a view into the
+#: generation caches
+VIEWS: list[Callable[[str, "FavaLedger"], object]] = []
+
+
+def register(
+    func: Callable[[str, "FavaLedger"], object]
+) -> Callable[[str, "FavaLedger"], object]:
+    VIEWS.append(func)
+    return func
+
+
+class WarmupScheduler:
+    """Runs the registered views for each scheduled ledger, one at a time
+
+    Scheduling a ledger which is already pending is a no-op.  Warming stops
+    early if the ledger is evicted or reloaded meanwhile, as the results would
+    be dropped anyway; the views are given the ledger, so that warming never
+    loads an evicted one again.
+    """
+
+    def __init__(self, loader: "LedgerLoader"):
+        self.loader = loader
+        self._pending: OrderedDict[str, None] = OrderedDict()
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def schedule(self, slug: str) -> None:
+        with self._condition:
+            self._pending[slug] = None
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="doudough-warmup", daemon=True
+                )
+                self._thread.start()
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+                slug, _ = self._pending.popitem(last=False)
+            self.warm(slug)
+
+    def warm(self, slug: str) -> None:
+        ledger = self.loader.loaded(slug)
+        if ledger is None:
+            return
+        generation = get_generation(ledger)
+        t0 = time.monotonic()
+        for view in VIEWS:
+            current = self.loader.loaded(slug)
+            if current is not ledger or get_generation(ledger) is not generation:
+                log.info("Warm-up of %s superseded", slug)
+                return
+            try:
+                view(slug, ledger)
+            except Exception:
+                log.exception("Warm-up of %s failed in %s", slug, view.__qualname__)
+        log.info("Warmed up %s in %.1fs", generation, time.monotonic() - t0)
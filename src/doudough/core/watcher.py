@@ -0,0 +1,301 @@
+"""Watching ledger files for changes
+
+`Watcher` calls back with a key (the ledger slug) and its files which changed,
+coalescing bursts of writes (an editor saving several includes, an importer
+appending entry by entry) into one call: the callback runs once no file of
+the key changed for `debounce` seconds, or `max_delay` seconds after
+the first change of a continuous burst.
+
+On Linux the changes come from inotify, so an idle watcher thread is blocked
+in the kernel; elsewhere, or with --poll-watcher, the files are polled.
+"""
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Hashable, Iterable
+
+log = logging.getLogger(__name__)
+
+DEFAULT_DEBOUNCE = 0.3
+DEFAULT_MAX_DELAY = 3.0
+DEFAULT_POLL_INTERVAL = 1.0
+
+
+class Watcher:
+    """Base class, backends implement `_wait` (and `_add_path`/`_remove_path`)"""
+
+    def __init__(
+        self,
+        callback: Callable[[Hashable, set[str]], None],
+        *,
+        debounce: float = DEFAULT_DEBOUNCE,
+        max_delay: float = DEFAULT_MAX_DELAY,
+    ):
+        self.callback = callback
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        #: Watched (absolute) path -> keys watching it
+        self._paths: dict[str, set] = defaultdict(set)
+        self._keys: dict[Hashable, set[str]] = {}
+        #: Key -> (time of first, time of last) change of the current burst
+        self._pending: dict[Hashable, tuple[float, float]] = {}
+        #: Key -> paths changed in the current burst
+        self._changed: dict[Hashable, set[str]] = defaultdict(set)
+        self._thread = None
+
+    def watch(self, key: Hashable, paths: Iterable[str]) -> None:
+        """Watch paths for key, replacing what was watched for it before"""
+        paths = {os.path.abspath(p) for p in paths}
+        with self._lock:
+            old = self._keys.get(key, set())
+            for path in old - paths:
+                self._unwatch_path(key, path)
+            for path in paths - old:
+                if not self._paths[path]:
+                    self._add_path(path)
+                self._paths[path].add(key)
+            self._keys[key] = paths
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="doudough-watcher", daemon=True
+                )
+                self._thread.start()
+
+    def unwatch(self, key: Hashable) -> None:
+        with self._lock:
+            for path in self._keys.pop(key, set()):
+                self._unwatch_path(key, path)
+            self._pending.pop(key, None)
+            self._changed.pop(key, None)
+
+    def _unwatch_path(self, key, path):
+        self._paths[path].discard(key)
+        if not self._paths[path]:
+            del self._paths[path]
+            self._remove_path(path)
+
+    def _add_path(self, path: str) -> None:
+        pass
+
+    def _remove_path(self, path: str) -> None:
+        pass
+
+    def _wait(self, timeout: float | None) -> set[str]:
+        """Paths changed within timeout seconds (None: block until a change)"""
+        raise NotImplementedError
+
+    def _timeout(self, now: float) -> float | None:
+        with self._lock:
+            if not self._pending:
+                return None
+            due = min(
+                min(last + self.debounce, first + self.max_delay)
+                for first, last in self._pending.values()
+            )
+        return max(0.0, due - now)
+
+    def _run(self):
+        while True:
+            try:
+                changed = self._wait(self._timeout(time.monotonic()))
+            except Exception:
+                log.exception("Watching files failed")
+                time.sleep(DEFAULT_POLL_INTERVAL)
+                continue
+
+            now = time.monotonic()
+            due = []
+            with self._lock:
+                for path in changed:
+                    for key in self._paths.get(path, ()):
+                        first, _ = self._pending.get(key, (now, now))
+                        self._pending[key] = (first, now)
+                        self._changed[key].add(path)
+                for key, (first, last) in list(self._pending.items()):
+                    if now >= min(last + self.debounce, first + self.max_delay):
+                        del self._pending[key]
+                        due.append((key, self._changed.pop(key, set())))
+
+            for key, paths in due:
+                log.info("Files of %s changed", key)
+                try:
+                    self.callback(key, paths)
+                except Exception:
+                    log.exception("Change callback for %s failed", key)
+
+
+def file_stamp(path: str) -> tuple[int, int] | None:
+    """Modification time and size of path, None if missing"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class PollingWatcher(Watcher):
+    """Stats the watched files every `interval` seconds"""
+
+    def __init__(self, callback, *, interval: float = DEFAULT_POLL_INTERVAL, **kwargs):
+        super().__init__(callback, **kwargs)
+        self.interval = interval
+        self._stats: dict[str, tuple | None] = {}
+
+    def _add_path(self, path):
+        self._stats[path] = file_stamp(path)
+
+    def _remove_path(self, path):
+        self._stats.pop(path, None)
+
+    def _wait(self, timeout):
+        time.sleep(self.interval if timeout is None else min(timeout, self.interval))
+        with self._lock:
+            paths = list(self._stats)
+        changed = set()
+        for path in paths:
+            stat = file_stamp(path)
+            with self._lock:
+                if path in self._stats and self._stats[path] != stat:
+                    self._stats[path] = stat
+                    changed.add(path)
+        return changed
+
+
+# From <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_CLOEXEC = 0o2000000
+
+#: Editors often save by writing a temporary file and renaming it over the
+#: original, so the directories are watched rather than the files
+WATCH_MASK = (
+    IN_MODIFY
+    | IN_ATTRIB
+    | IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_ONLYDIR
+)
+
+_EVENT = struct.Struct("iIII")
+
+
+def _libc():
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1
+    except (OSError, AttributeError):
+        return None
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+    return libc
+
+
+class InotifyWatcher(Watcher):
+    """Watches the directories of the watched files with inotify"""
+
+    def __init__(self, callback, **kwargs):
+        super().__init__(callback, **kwargs)
+        self._libc = _libc()
+        if self._libc is None:
+            raise OSError("inotify is not available")
+        self._fd = self._libc.inotify_init1(IN_CLOEXEC)
+        if self._fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        #: Directory -> (watch descriptor, number of watched paths in it)
+        self._dirs: dict[str, tuple[int, int]] = {}
+        self._wds: dict[int, str] = {}
+
+    def _add_path(self, path):
+        directory = os.path.dirname(path)
+        if directory in self._dirs:
+            wd, count = self._dirs[directory]
+            self._dirs[directory] = wd, count + 1
+            return
+        wd = self._libc.inotify_add_watch(
+            self._fd, os.fsencode(directory), WATCH_MASK
+        )
+        if wd < 0:
+            errno = ctypes.get_errno()
+            log.warning("Cannot watch %s: %s", directory, os.strerror(errno))
+            return
+        self._dirs[directory] = wd, 1
+        self._wds[wd] = directory
+
+    def _remove_path(self, path):
+        directory = os.path.dirname(path)
+        if directory not in self._dirs:
+            return
+        wd, count = self._dirs[directory]
+        if count > 1:
+            self._dirs[directory] = wd, count - 1
+            return
+        del self._dirs[directory]
+        self._wds.pop(wd, None)
+        self._libc.inotify_rm_watch(self._fd, wd)
+
+    def _wait(self, timeout):
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return set()
+        data = os.read(self._fd, 64 * 1024)
+
+        changed = set()
+        with self._lock:
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = _EVENT.unpack_from(data, offset)
+                offset += _EVENT.size
+                name = data[offset : offset + length].rstrip(b"\0")
+                offset += length
+                if mask & IN_Q_OVERFLOW:
+                    # Events were lost, assume everything changed
+                    changed.update(self._paths)
+                    continue
+                directory = self._wds.get(wd)
+                if directory is None:
+                    continue
+                if mask & IN_IGNORED:
+                    # The directory is gone
+                    self._wds.pop(wd, None)
+                    self._dirs.pop(directory, None)
+                    changed.update(
+                        p for p in self._paths if os.path.dirname(p) == directory
+                    )
+                    continue
+                changed.add(os.path.join(directory, os.fsdecode(name)))
+        return changed
+
+
+def create_watcher(
+    callback, *, poll: bool = False, interval: float = DEFAULT_POLL_INTERVAL, **kwargs
+) -> Watcher:
+    """An inotify watcher, or a polling one if asked for or inotify is unavailable"""
+    if not poll:
+        try:
+            return InotifyWatcher(callback, **kwargs)
+        except OSError as e:
+            log.info("Falling back to polling for file changes: %s", e)
+    return PollingWatcher(callback, interval=interval, **kwargs)
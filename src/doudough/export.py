@@ -0,0 +1,242 @@
+"""Streaming exports of the filtered postings
+
+    /_doudough/export/<format>?bfile=<slug>&account=...&filter=...&time=...
+
+takes the same parameters as `filtered_ledger_callback` (filter may be
+repeated) and streams one row per posting as csv, parquet or arrow (IPC
+stream).  Rows are produced from the columnar postings table in chunks of
+CHUNK_ENTRIES entries, so memory use does not grow with the export and the
+download starts right away.
+
+Parquet and arrow need the optional `pyarrow` package.
+"""
+
+import csv
+import io
+from typing import Iterable, Iterator
+from urllib.parse import urlencode
+
+from beancount.core.convert import get_weight
+from beancount.core.data import Transaction
+from flask import Response, request
+
+from .core import LedgerGeneration, get_generation
+from .pages.app_shell.controls import Context, get_loader
+
+EXPORT_PATH = "/_doudough/export/<format>"
+CHUNK_ENTRIES = 20000
+
+COLUMNS = [
+    "date",
+    "flag",
+    "payee",
+    "narration",
+    "account",
+    "number",
+    "currency",
+    "weight",
+    "weight_currency",
+    "cost_number",
+    "cost_currency",
+]
+
+FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrow"),
+}
+
+
+def _table_chunk(generation: LedgerGeneration, positions: list) -> dict[str, list]:
+    table = generation.postings
+    rows = table.rows(positions)
+    entries = [generation.entries[e] for e in table.entry[rows].tolist()]
+    return {
+        "date": table.date[rows].tolist(),
+        "flag": [entry.flag for entry in entries],
+        "payee": table.payees.lookup(table.payee[rows].tolist()),
+        "narration": [entry.narration for entry in entries],
+        "account": table.accounts.lookup(table.account[rows].tolist()),
+        "number": table.number[rows].tolist(),
+        "currency": table.currencies.lookup(table.currency[rows].tolist()),
+        "weight": table.weight[rows].tolist(),
+        "weight_currency": table.currencies.lookup(
+            table.weight_currency[rows].tolist()
+        ),
+        "cost_number": table.cost_number[rows].tolist(),
+        "cost_currency": table.currencies.lookup(table.cost_currency[rows].tolist()),
+    }
+
+
+def _float(number) -> float | None:
+    return float(number) if number is not None else None
+
+
+def _entry_chunk(entry: Transaction) -> dict[str, list]:
+    """Rows of an entry which is not in the postings table (eg. a summary)"""
+    chunk = {column: [] for column in COLUMNS}
+    for posting in entry.postings:
+        weight = get_weight(posting)
+        cost = posting.cost
+        row = [
+            entry.date,
+            entry.flag,
+            entry.payee,
+            entry.narration,
+            posting.account,
+            _float(posting.units.number),
+            posting.units.currency,
+            _float(weight.number),
+            weight.currency,
+            _float(cost.number) if cost is not None else None,
+            cost.currency if cost is not None else None,
+        ]
+        for column, value in zip(COLUMNS, row):
+            chunk[column].append(value)
+    return chunk
+
+
+def iter_chunks(
+    generation: LedgerGeneration, entries: Iterable, chunk_entries=CHUNK_ENTRIES
+) -> Iterator[dict[str, list]]:
+    """Columns of the postings of the transactions among entries, in chunks"""
+    index = generation.entry_index
+    positions = []
+    for entry in entries:
+        if not isinstance(entry, Transaction):
+            continue
+        position = index.position(entry)
+        if position is None:
+            if positions:
+                yield _table_chunk(generation, positions)
+                positions = []
+            yield _entry_chunk(entry)
+            continue
+        positions.append(position)
+        if len(positions) >= chunk_entries:
+            yield _table_chunk(generation, positions)
+            positions = []
+    if positions:
+        yield _table_chunk(generation, positions)
+
+
+def _none_if_nan(values: list) -> list:
+    return [None if v != v else v for v in values]
+
+
+def write_csv(chunks: Iterable[dict[str, list]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    for chunk in chunks:
+        for column in ("number", "weight", "cost_number"):
+            chunk[column] = _none_if_nan(chunk[column])
+        writer.writerows(zip(*(chunk[column] for column in COLUMNS)))
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+class _Sink(io.RawIOBase):
+    """A write-only file collecting what pyarrow writes, to be yielded"""
+
+    def __init__(self):
+        self.buffers = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.buffers.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def take(self) -> bytes:
+        data = b"".join(self.buffers)
+        self.buffers.clear()
+        return data
+
+
+def _arrow_schema(pa):
+    string, number = pa.string(), pa.float64()
+    types = {"date": pa.date32()}
+    types.update({c: number for c in ("number", "weight", "cost_number")})
+    return pa.schema([(column, types.get(column, string)) for column in COLUMNS])
+
+
+def write_arrow(chunks: Iterable[dict[str, list]], format="arrow") -> Iterator[bytes]:
+    import pyarrow as pa
+
+    schema = _arrow_schema(pa)
+    sink = _Sink()
+    if format == "parquet":
+        import pyarrow.parquet as pq
+
+        writer = pq.ParquetWriter(sink, schema)
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+
+    for chunk in chunks:
+        for column in ("number", "weight", "cost_number"):
+            chunk[column] = _none_if_nan(chunk[column])
+        writer.write_batch(pa.RecordBatch.from_pydict(chunk, schema=schema))
+        yield sink.take()
+    writer.close()
+    yield sink.take()
+
+
+def export_url(context: Context, format: str) -> str:
+    """Where to download the postings of a context"""
+    params = {
+        "bfile": context.bfile,
+        "account": context.account or "",
+        "filter": context.filter if isinstance(context.filter, list) else [],
+        "time": context.time or "",
+    }
+    path = EXPORT_PATH.replace("<format>", format)
+    return "{}?{}".format(path, urlencode(params, doseq=True))
+
+
+def export(format: str):
+    if format not in FORMATS:
+        return Response("Unknown format {}".format(format), status=404)
+    if format != "csv":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            return Response("{} export needs pyarrow".format(format), status=501)
+
+    loader = get_loader()
+    slug = request.args.get("bfile") or loader.first_slug()
+    if slug not in loader:
+        return Response("Unknown ledger", status=404)
+    context = Context(
+        bfile=slug,
+        account=request.args.get("account"),
+        filter=request.args.getlist("filter"),
+        time=request.args.get("time"),
+    )
+    # Neither changes, so a reload during the download does not affect it
+    filtered = context.filtered
+    chunks = iter_chunks(get_generation(filtered.ledger), filtered.entries)
+
+    mimetype, suffix = FORMATS[format]
+    body = write_csv(chunks) if format == "csv" else write_arrow(chunks, format)
+    return Response(
+        body,
+        mimetype=mimetype,
+        headers={
+            "Content-Disposition": 'attachment; filename="{}-postings.{}"'.format(
+                slug, suffix
+            )
+        },
+    )
+
+
+def init_app(app):
+    """Serve the exports"""
+    app.server.add_url_rule(EXPORT_PATH, "doudough_export", export)
@@ -0,0 +1,86 @@
+"""Clientside (javascript) callbacks declared next to page layouts
+
+Callbacks which only shuffle UI state around do not need a round trip to the
+server.  Pages declare them on a namespace::
+
+    CLIENTSIDE = ClientsideNamespace("journal")
+
+    CLIENTSIDE.callback(
+        Output(grid, "dashGridOptions"),
+        Input("journal_qf", "value"),
+        State(grid, "dashGridOptions"),
+        name="quickfilter",
+        function='''
+        function(value, options) {
+            return Object.assign({}, options, {quickFilterText: value});
+        }
+        ''',
+    )
+
+and all namespaces are served as a single script (see `init_app`), which
+registers them on `window.dash_clientside`.
+"""
+
+import json
+from textwrap import dedent
+
+from dash import ClientsideFunction, clientside_callback
+from flask import Response
+
+SCRIPT_PATH = "/_doudough/clientside.js"
+
+NAMESPACES: dict[str, "ClientsideNamespace"] = {}
+
+
+class ClientsideNamespace:
+    def __init__(self, name: str):
+        self.name = "doudough_" + name
+        self.functions: dict[str, str] = {}
+        self.scripts: list[str] = []
+        NAMESPACES[self.name] = self
+
+    def callback(self, *args, name: str, function: str, **kwargs):
+        """Register a javascript function as a clientside callback"""
+        if name in self.functions:
+            raise ValueError(
+                "Duplicate clientside function {}.{}".format(self.name, name)
+            )
+        self.functions[name] = dedent(function).strip()
+        clientside_callback(ClientsideFunction(self.name, name), *args, **kwargs)
+        return name
+
+    def script(self, source: str):
+        """Javascript run once when the page loads"""
+        self.scripts.append(dedent(source).strip())
+
+
+def render_script() -> str:
+    lines = ["window.dash_clientside = window.dash_clientside || {};"]
+    for namespace in NAMESPACES.values():
+        lines.append(
+            "window.dash_clientside[{}] = {{".format(json.dumps(namespace.name))
+        )
+        for name, function in namespace.functions.items():
+            lines.append("{}: {},".format(name, function))
+        lines.append("};")
+    for namespace in NAMESPACES.values():
+        for source in namespace.scripts:
+            lines.append("(function() {{\n{}\n}})();".format(source))
+    return "\n".join(lines)
+
+
+def init_app(app):
+    """Serve the clientside callbacks and add them to the dash index page
+
+    Call once every page module has been imported.
+    """
+    script = render_script()
+
+    app.server.add_url_rule(
+        SCRIPT_PATH,
+        "doudough_clientside",
+        lambda: Response(script, mimetype="text/javascript"),
+    )
+    app.config.external_scripts.append(
+        app.config.requests_pathname_prefix.rstrip("/") + SCRIPT_PATH
+    )
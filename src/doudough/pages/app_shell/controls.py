@@ -1,15 +1,23 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field, replace
+from datetime import date
+from decimal import Decimal
 from functools import wraps
-from typing import Tuple
+from typing import TYPE_CHECKING, Tuple
 from urllib.parse import parse_qs
 
-from beanquery.query import run_query
-from dash import Input, Output, dcc, State, callback
-from fava.application import _LedgerSlugLoader
-from fava.core import FavaLedger, FilteredLedger
+from dash import Input, Output, dcc, State, callback, ctx
 from fava.util.date import Interval
 from flask import current_app
 
+from ...core import LedgerGeneration, get_generation
+from ...core.cache import cached_call
+from ...core.loader import LedgerLoader
+from ...core.singleflight import SingleFlight, hashable
+from ...core.warmup import register as register_warmup
+
+if TYPE_CHECKING:
+    from fava.core import FavaLedger, FilteredLedger
+
 
 class CallbackHelper:
     _COPY_VALS: tuple = tuple()
@@ -90,10 +98,9 @@ class StoreHelper(CallbackHelper):
     MAIN_ATTRIBUTE = "data"
 
 
-LEDGER_LOADER: _LedgerSlugLoader = None
+LEDGER_LOADER: LedgerLoader = None
 LEDGER_SLUG = Control("bfile")
 BFILE = LEDGER_SLUG
-UPDATE_INTERVAL = IntervalHelper("update_interval")
 ENTRIES = Control("ledger_entries")
 ERRORS = Control("ledger_errors")
 OPTIONS_MAP = Control("ledger_options")
@@ -108,6 +115,13 @@ TIME_SELECTOR = Control(
     value="",
     # value="{} - day".format(datetime.now().year - 1),
 )
+CHART_WIDTH = StoreHelper("chart_width")
+#: The ledger generation, pushed to the browser on reloads (see `events`)
+GENERATION = StoreHelper("ledger_generation")
+
+#: Identical filtered callbacks running at once (eg. many tabs refreshing after
+#: a reload) share one computation
+SINGLE_FLIGHT = SingleFlight()
 
 
 @dataclass
@@ -129,20 +143,38 @@ class Context:
     # interval: str = "month"
     # conversion: str = "at_cost"
 
+    #: The ledger and its generation, fixed when the context is built: a reload
+    #: during a callback must not mix two generations (`window` keeps them)
+    _ledger: "FavaLedger" = field(default=None, repr=False, compare=False)
+    _generation: LedgerGeneration = field(default=None, repr=False, compare=False)
+
+    def __post_init__(self):
+        if self._ledger is None:
+            self._ledger = get_ledger(self.bfile)
+        if self._generation is None:
+            self._generation = get_generation(self._ledger)
+
     @property
     def operating_currency(self) -> str:
+        """The currency views are shown in, the first operating currency
+
+        Balances in any other currency are converted into it, see `value`.
+        """
         all_oc = self.operating_currencies
-        if len(all_oc) > 1:
-            raise NotImplementedError()
-        return all_oc[0]
+        return all_oc[0] if all_oc else self.generation.postings.main_currency()
 
     @property
     def operating_currencies(self) -> list:
         return self.ledger.options.get("operating_currency", [])
 
     @property
-    def ledger(self) -> FavaLedger:
-        return get_ledger(self.bfile)
+    def ledger(self) -> "FavaLedger":
+        return self._ledger
+
+    @property
+    def generation(self) -> LedgerGeneration:
+        """Derived data for the version of the ledger this context was built on"""
+        return self._generation
 
     # @property
     # def typed_conversion(self) -> Conversion:
@@ -155,7 +187,7 @@ class Context:
     #     return Interval.get(self.interval)
 
     @property
-    def filtered(self) -> FilteredLedger:
+    def filtered(self) -> "FilteredLedger":
         """The filtered ledger"""
         if isinstance(self.filter, list):
             f = " ".join(self.filter)
@@ -163,6 +195,36 @@ class Context:
             f = ""
         return self.ledger.get_filtered(account=self.account, filter=f, time=self.time)
 
+    def window(self, begin: date, end: date) -> "Context":
+        """This context, restricted to the dates begin..end (inclusive)"""
+        return replace(self, time="{} - {}".format(begin, end))
+
+    @property
+    def cache_key(self) -> tuple:
+        """The filters, normalized as `filtered` applies them"""
+        f = tuple(self.filter) if isinstance(self.filter, list) else ()
+        return self.account or "", f, self.time or ""
+
+    def cached(self, name: str, func, *args):
+        """func(self, *args), computed once per ledger generation, filters and args
+
+        and shared through the loader's cache backend, if any.
+        """
+        key = (name, self.cache_key, *args)
+        return cached_call(get_loader().cache, self.generation, key, func, self, *args)
+
+    def value(self, balance, on: date | None = None) -> float:
+        """balance (currency -> number) in the operating currency, at market
+        prices as of on (default: today); unknown prices are ignored"""
+        total, _ = self.generation.conversion.value(
+            balance, self.operating_currency, on
+        )
+        return total
+
+    def hierarchy(self, root: str):
+        """The (cached) account tree below root, in the operating currency"""
+        return self.cached("hierarchy", _hierarchy, root)
+
     # @classmethod
     # def from_urlpath(cls, path, query_string: str):
     #     if "/" in path:
@@ -177,9 +239,40 @@ class Context:
     #     return cls(beancount_file_slug=bfile, rargs=parse_search(query_string))
 
     def filtered_query(self, query, **kwargs):
+        from beanquery.query import run_query
+
         return run_query(self.filtered.entries, self.ledger.options, query, **kwargs)
 
 
+def _hierarchy(context: Context, root: str):
+    filtered = context.filtered
+    currency = context.operating_currency
+    tree = context.ledger.charts.hierarchy(filtered, root, currency)
+    return _in_currency(
+        tree, context.generation.conversion, currency, filtered.end_date
+    )
+
+
+def _in_currency(node, conversion, currency: str, on: date | None):
+    """node with the balances fava left in other currencies converted, where
+    there is a price (possibly through another currency)"""
+
+    def fold(balance):
+        # fava's inventories are mappings, but can not be iterated over
+        if balance.keys() <= {currency}:
+            return balance
+        total, rest = conversion.value(balance, currency, on)
+        # Decimal, as fava's balances the charts add it to
+        return {currency: Decimal(str(total)), **rest}
+
+    return replace(
+        node,
+        balance=fold(node.balance),
+        balance_children=fold(node.balance_children),
+        children=[_in_currency(c, conversion, currency, on) for c in node.children],
+    )
+
+
 # @callback(
 #     OPERATING_CURRENCY.output,
 #     LOADED.output,
@@ -199,7 +292,7 @@ def get_loader():
     # Avoid caching on flask.g - might hurt dash serialization??
     global LEDGER_LOADER
     if LEDGER_LOADER is None:
-        LEDGER_LOADER = _LedgerSlugLoader(current_app)
+        LEDGER_LOADER = LedgerLoader.from_config(current_app.config)
     return LEDGER_LOADER
 
 
@@ -217,6 +310,24 @@ def filtered_callback(*args, **kwargs):
     )
 
 
+def warmup(func):
+    """Register func(context) to precompute a page's default (unfiltered) view
+
+    Runs in the background after each ledger load, see `core.warmup`; func
+    should fill the same caches (`Context.cached`) its callbacks read.
+    """
+
+    @wraps(func)
+    def wrapped(slug, ledger):
+        context = Context(
+            bfile=slug, filter=FILTER.value, time=TIME_SELECTOR.value, _ledger=ledger
+        )
+        return func(context)
+
+    register_warmup(wrapped)
+    return func
+
+
 def ledger_callback(*args, **kwargs):
     def decorator(func):
         # First, wrap the function
@@ -261,10 +372,18 @@ def filtered_ledger_callback(*args, **kwargs):
     def decorator(func):
         # First, wrap the function
         @wraps(func)
-        def wrapped(bfile, account, filter, time, *a):
+        def wrapped(bfile, account, filter, time, generation, *a):
             # context = Context.from_urlpath(a[-2], a[-1])
             context = Context(bfile=bfile, account=account, filter=filter, time=time)
-            return func(context, *a)
+            key = (
+                func.__module__,
+                func.__qualname__,
+                hashable(ctx.triggered_id),
+                context.generation.number,
+                context.cache_key,
+                *map(hashable, a),
+            )
+            return SINGLE_FLIGHT.do(key, func, context, *a)
 
         # Then, generate the callback
         return callback(
@@ -275,6 +394,7 @@ def filtered_ledger_callback(*args, **kwargs):
                     ACCOUNT.input,
                     FILTER.input,
                     TIME_SELECTOR.input,
+                    GENERATION.input,
                 ],
                 args,
             ),
@@ -297,6 +417,11 @@ def filtered_ledger_callback(*args, **kwargs):
 #         g.ledger = loader.ledgers_by_slug[slug]
 
 
+def read_only() -> bool:
+    """Whether changes to the ledger files are disabled (--read-only)"""
+    return current_app.config.get("READ_ONLY", False)
+
+
 def get_ledger(slug=None):
 
     loader = get_loader()
@@ -311,7 +436,7 @@ def parse_search(search: str) -> dict:
 
 def get_filtered_ledger(
     account=None, filter=None, time=None, slug=None, **ignore
-) -> Tuple[FavaLedger, FilteredLedger]:
+) -> Tuple["FavaLedger", "FilteredLedger"]:
     ledger = get_ledger(slug=slug)
     return ledger, ledger.get_filtered(
         account=account or "",
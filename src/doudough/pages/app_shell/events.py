@@ -0,0 +1,93 @@
+"""Pushing new ledger generations to the browser
+
+Each tab keeps a server-sent events stream open for its ledger.  When a reload
+is published, the fingerprint of the new generation is pushed into the
+GENERATION store, which every `filtered_ledger_callback` takes as an input, so
+the page only refreshes when the ledger actually changed.  Generation numbers
+are per process; fingerprints are the same in every worker, so a stream which
+reconnects to another one does not refresh the page for nothing.
+
+There is no polling: an idle stream costs a keepalive comment every KEEPALIVE
+seconds.  But each open stream holds a server thread (or worker, for a
+synchronous server) for as long as its tab is open, so the server needs more
+threads than there are open tabs.
+"""
+
+import json
+
+from flask import Response, request
+
+from .clientside import ClientsideNamespace
+from .controls import BFILE, GENERATION, StoreHelper, get_loader
+
+EVENTS_PATH = "/_doudough/events"
+KEEPALIVE = 15.0
+
+#: The slug the tab is subscribed to
+SUBSCRIPTION = StoreHelper("ledger_subscription")
+
+CLIENTSIDE = ClientsideNamespace("events")
+
+layout = [GENERATION.make_widget(), SUBSCRIPTION.make_widget()]
+
+
+CLIENTSIDE.callback(
+    SUBSCRIPTION.output,
+    BFILE.input,
+    name="subscribe",
+    function="""
+    function(bfile) {
+        const events = window.doudough_events = window.doudough_events || {};
+        if (!bfile || bfile === events.bfile) {
+            return window.dash_clientside.no_update;
+        }
+        if (events.source) {
+            events.source.close();
+        }
+        // The first message is the generation this page was rendered from
+        events.bfile = bfile;
+        events.generation = null;
+        events.source = new EventSource(
+            %s + "?bfile=" + encodeURIComponent(bfile)
+        );
+        events.source.addEventListener("generation", function(e) {
+            const generation = JSON.parse(e.data);
+            if (events.generation !== null && generation !== events.generation) {
+                window.dash_clientside.set_props(%s, {data: generation});
+            }
+            events.generation = generation;
+        });
+        return bfile;
+    }
+    """
+    % (json.dumps(EVENTS_PATH), json.dumps(GENERATION.id)),
+)
+
+
+def _stream(events, slug: str):
+    yield "retry: 3000\n\n"
+    last = None
+    while True:
+        fingerprint = events.wait(slug, last, KEEPALIVE)
+        if fingerprint == last:
+            yield ": keepalive\n\n"
+            continue
+        last = fingerprint
+        yield "event: generation\ndata: {}\n\n".format(json.dumps(fingerprint))
+
+
+def stream_events():
+    slug = request.args.get("bfile", "")
+    loader = get_loader()
+    if slug not in loader:
+        return Response("Unknown ledger", status=404)
+    return Response(
+        _stream(loader.events, slug),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def init_app(app):
+    """Serve the events stream"""
+    app.server.add_url_rule(EVENTS_PATH, "doudough_events", stream_events)
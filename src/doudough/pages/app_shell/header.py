@@ -1,14 +1,15 @@
 import dash_mantine_components as dmc
 from beancount.core.data import Transaction
-from dash import dcc, callback, Output
+from dash import dcc, callback, Input, Output
 from dash.exceptions import PreventUpdate
 from dash_iconify import DashIconify
-from fava.application import _slug
 from fava.util.date import Interval
 
+from .clientside import ClientsideNamespace
 from .controls import (
     TIME_SELECTOR,
-    UPDATE_INTERVAL,
+    GENERATION,
+    CHART_WIDTH,
     SEARCH,
     BFILE,
     LOADED,
@@ -22,6 +23,8 @@ from .controls import (
 # with open(os.path.join(os.path.dirname(__file__), "doudou.jpg"), "rb") as _f:
 #     icon_src = "data:image/png;base64," + base64.b64encode(_f.read()).decode()
 
+CLIENTSIDE = ClientsideNamespace("header")
+
 SIZE = "xs"
 
 
@@ -61,7 +64,7 @@ layout = dmc.AppShellHeader(
                 id="loader",
                 # color="green",
             ),
-            UPDATE_INTERVAL.make_widget(dcc.Interval),
+            CHART_WIDTH.make_widget(),
             BFILE.make_widget(
                 dmc.Select,
                 size=SIZE,
@@ -186,14 +189,30 @@ layout = dmc.AppShellHeader(
 )
 
 
+# Charts only need to know roughly how many bars they can show, so report the
+# width of the main panel whenever a page is loaded
+CLIENTSIDE.callback(
+    CHART_WIDTH.output,
+    Input("_pages_location", "pathname"),
+    name="chart_width",
+    function="""
+    function(pathname) {
+        const main = document.querySelector(".mantine-AppShell-main");
+        return main ? main.clientWidth : window.innerWidth;
+    }
+    """,
+)
+
+
 @callback(
     # CONVERSION.output,
     # Output(CONVERSION.id, "data"),
     Output(ACCOUNT.id, "data"),
     Output(FILTER.id, "data"),
     BFILE.input,
+    GENERATION.input,
 )
-def update_autocompletes(bfile):
+def update_autocompletes(bfile, generation):
     ledger = get_ledger(bfile)
     ops = ledger.options["operating_currency"]
     if isinstance(ops, str):
@@ -271,14 +290,14 @@ def update_autocompletes(bfile):
     BFILE.output,
     BFILE.make_output("data"),
     BFILE.state,
-    UPDATE_INTERVAL.input,
+    GENERATION.input,
 )
-def first_load_metadata(current_slug, interval):
+def first_load_metadata(current_slug, generation):
 
     loader = get_loader()
-    if current_slug in loader.ledgers_by_slug:
+    if current_slug in loader:
         raise PreventUpdate()
     else:
         new_slug = loader.first_slug()
 
-    return new_slug, [_slug(ledger) for ledger in loader.ledgers]
+    return new_slug, loader.slugs
@@ -1,9 +1,11 @@
 import dash_mantine_components as dmc
-from dash import page_registry, callback, Input, Output, State, callback_context, ALL
+from dash import page_registry, Input, Output, ALL
 from dash_iconify import DashIconify
 
+from .clientside import ClientsideNamespace
 from .controls import LEDGER_SLUG
-from ..utils import fill_url
+
+CLIENTSIDE = ClientsideNamespace("navbar")
 
 
 # @default_file
@@ -64,25 +66,41 @@ def layout(bfile=None, **kwargs):
 #     return navbar
 
 
+# Javascript version of utils.fill_url
+_FILL_URL = """
+    const fill_url = (template, params) =>
+        template.replace(/<(\\w+)>/g, (match, key) => params[key]);
+"""
+
 # Callback (using the dcc.location provided by Dash Pages)
-@callback(
+CLIENTSIDE.callback(
     Output({"type": "navlink", "index": ALL}, "active"),
     Input("_pages_location", "pathname"),
     LEDGER_SLUG.input,
+    name="set_active_link",
+    function="""
+    function(pathname, bfile) {
+        %s
+        return dash_clientside.callback_context.outputs_list.map(
+            (control) => pathname === fill_url(control.id.index, {bfile: bfile})
+        );
+    }
+    """
+    % _FILL_URL,
 )
-def set_active_link(pathname, bfile):
-    return [
-        pathname == fill_url(control["id"]["index"], bfile=bfile)
-        for control in callback_context.outputs_list
-    ]
 
 
-@callback(
+CLIENTSIDE.callback(
     Output({"type": "navlink", "index": ALL}, "href"),
     LEDGER_SLUG.input,
+    name="update_navlinks",
+    function="""
+    function(bfile) {
+        %s
+        return dash_clientside.callback_context.outputs_list.map(
+            (link) => fill_url(link.id.index, {bfile: bfile})
+        );
+    }
+    """
+    % _FILL_URL,
 )
-def update_navlinks(bfile):
-    return [
-        fill_url(link["id"]["index"], bfile=bfile)
-        for link in callback_context.outputs_list
-    ]
@@ -0,0 +1,32 @@
+"""The Source View modal, showing an entry as written in its source file
+
+It is part of the app shell, so any page can open it: a callback outputs
+`show_source(bfile, entry_id)` to `OUTPUTS`.
+"""
+
+import dash_mantine_components as dmc
+from dash import Output
+
+from .controls import get_ledger
+from ...core import get_generation
+
+code = dmc.Code(block=True, id="source_view_code")
+modal = dmc.Modal(title="Source View", id="source_view", size="lg", children=[code])
+
+layout = [modal]
+
+OUTPUTS = (
+    Output(modal, "opened", allow_duplicate=True),
+    Output(code, "children", allow_duplicate=True),
+)
+
+
+def show_source(bfile: str, entry_id: str) -> tuple[bool, str]:
+    """Open the modal on an entry, by id (see `EntryIndex`)"""
+    generation = get_generation(get_ledger(bfile))
+    try:
+        entry = generation.entry_index.get(entry_id)
+    except KeyError:
+        return True, "Entry not found - has the ledger been reloaded?"
+    source, sha = generation.get_entry_slice(entry)
+    return True, source
@@ -1,15 +1,15 @@
 from datetime import date
 
 import dash_mantine_components as dmc
-import pandas as pd
 from dash import dcc, Output
 from fava.util.date import Interval
-from plotly import express as px, graph_objects as go
+from plotly import graph_objects as go
 
 from .app_shell.controls import (
     DataHelper,
     filtered_ledger_callback,
     INTERVAL,
+    warmup,
 )
 from .income_statement import _update_table, make_table
 from ..charting import create_breakdown_chart, create_hierarchy_sankey_data
@@ -69,18 +69,17 @@ layout = [
     LIABILITIES_TABLE.output,
 )
 def update_breakdowns(context):
+    return context.cached("balance_breakdowns", breakdowns)
+
+
+def breakdowns(context):
     roots = {
         "Assets": {"scale": "Blues"},
         "Liabilities": {"scale": "Reds"},
         "Equity": {"scale": "Purples"},
     }
 
-    data = {
-        root: context.ledger.charts.hierarchy(
-            context.filtered, root, context.operating_currency
-        )
-        for root in roots.keys()
-    }
+    data = {root: context.hierarchy(root) for root in roots.keys()}
 
     node, link = create_hierarchy_sankey_data(
         data["Assets"],
@@ -116,8 +115,12 @@ def update_breakdowns(context):
 
 @filtered_ledger_callback(Output("balance_net_graph", "figure"), INTERVAL.input)
 def update_nw_chart(context, interval):
+    return context.cached("net_worth", net_worth_chart, Interval.get(interval))
 
-    interval = Interval.get(interval)
+
+def net_worth_chart(context, interval):
+    import pandas as pd
+    from plotly import express as px
 
     nw = context.ledger.charts.net_worth(
         context.filtered, interval, context.operating_currency
@@ -129,7 +132,7 @@ def update_nw_chart(context, interval):
             [
                 (
                     it.date,
-                    it.balance.get(context.operating_currency, 0),
+                    context.value(it.balance, it.date),
                     it.date < today,
                 )
                 for it in nw
@@ -143,3 +146,9 @@ def update_nw_chart(context, interval):
     fig.update_layout(xaxis_title=None, yaxis_title=None)
 
     return fig
+
+
+@warmup
+def warm_up(context):
+    context.cached("balance_breakdowns", breakdowns)
+    context.cached("net_worth", net_worth_chart, INTERVAL.value)
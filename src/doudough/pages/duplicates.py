@@ -0,0 +1,137 @@
+import dash_ag_grid as dag
+import dash_mantine_components as dmc
+from dash import Input, Output, callback
+from dash.exceptions import PreventUpdate
+
+from .app_shell import source_view
+from .app_shell.controls import (
+    BFILE,
+    Context,
+    Control,
+    filtered_ledger_callback,
+    warmup,
+)
+from ..core.duplicates import THRESHOLD, WINDOW, find_duplicates
+
+WINDOW_DAYS = Control("duplicates_window", value=WINDOW)
+MIN_SCORE = Control("duplicates_min_score", value=THRESHOLD)
+
+#: Clicking a cell of these columns opens its entry in the Source View
+SOURCE_COLUMNS = ("first", "second")
+SOURCE_LINK = {
+    "valueFormatter": {"function": "'Source'"},
+    "cellStyle": {"cursor": "pointer", "textDecoration": "underline"},
+    "sortable": False,
+    "filter": False,
+    "width": 90,
+}
+
+COLUMN_DEFS = [
+    {
+        "field": "score",
+        "type": "numericColumn",
+        "sort": "desc",
+        "valueFormatter": {"function": "d3.format('.0%')(params.value)"},
+    },
+    {"field": "days", "type": "numericColumn"},
+    {"field": "date", "cellDataType": "dateString"},
+    {"field": "payee"},
+    {"field": "narration"},
+    {"field": "first", **SOURCE_LINK},
+    {"field": "other_date", "headerName": "Date", "cellDataType": "dateString"},
+    {"field": "other_payee", "headerName": "Payee"},
+    {"field": "other_narration", "headerName": "Narration"},
+    {"field": "second", **SOURCE_LINK},
+    {
+        "field": "value",
+        "type": "numericColumn",
+        "pinned": "right",
+        "valueFormatter": {"function": "d3.format('($,.2f')(params.value)"},
+    },
+]
+
+grid = dag.AgGrid(
+    id="duplicates",
+    rowData=[],
+    columnDefs=COLUMN_DEFS,
+    defaultColDef={"filter": True, "sortable": True},
+    columnSize="autoSize",
+    dashGridOptions={"pagination": True},
+    style={"height": "75vh"},
+)
+
+layout = dmc.Stack(
+    [
+        dmc.Group(
+            [
+                WINDOW_DAYS.make_widget(
+                    dmc.NumberInput, label="Days apart", min=0, max=31, w=120
+                ),
+                MIN_SCORE.make_widget(
+                    dmc.NumberInput,
+                    label="Minimum similarity",
+                    min=0,
+                    max=1,
+                    step=0.05,
+                    decimalScale=2,
+                    w=160,
+                ),
+            ]
+        ),
+        grid,
+    ]
+)
+
+
+@filtered_ledger_callback(Output(grid, "rowData"), WINDOW_DAYS.input, MIN_SCORE.input)
+def update_duplicates(context, window, threshold):
+    window = int(window if window is not None else WINDOW)
+    threshold = float(threshold if threshold is not None else THRESHOLD)
+    return context.cached("duplicates", duplicate_rows, window, threshold)
+
+
+def duplicate_rows(context: Context, window: int, threshold: float) -> list[dict]:
+    """Likely duplicates among the filtered transactions, one row per pair"""
+    generation = context.generation
+    index = generation.entry_index
+    positions = [index.position(e) for e in context.filtered.entries]
+    positions = [p for p in positions if p is not None]
+    entries, totals = generation.entries, generation.entry_totals
+
+    rows = []
+    for duplicate in find_duplicates(generation, positions, window, threshold):
+        a, b = entries[duplicate.first], entries[duplicate.second]
+        rows.append(
+            {
+                "id": "{}:{}".format(duplicate.first, duplicate.second),
+                "score": duplicate.score,
+                "days": duplicate.days,
+                "date": a.date,
+                "payee": a.payee,
+                "narration": a.narration,
+                "first": index.entry_id(a),
+                "other_date": b.date,
+                "other_payee": b.payee,
+                "other_narration": b.narration,
+                "second": index.entry_id(b),
+                "value": float(totals[duplicate.first]),
+            }
+        )
+    return rows
+
+
+@callback(
+    *source_view.OUTPUTS,
+    Input(grid, "cellClicked"),
+    BFILE.state,
+    prevent_initial_call=True,
+)
+def view_source(cell, bfile):
+    if not cell or cell.get("colId") not in SOURCE_COLUMNS:
+        raise PreventUpdate
+    return source_view.show_source(bfile, cell["value"])
+
+
+@warmup
+def warm_up(context):
+    context.cached("duplicates", duplicate_rows, WINDOW, THRESHOLD)
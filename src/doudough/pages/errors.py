@@ -1,33 +1,119 @@
-from pprint import pformat
-
 import dash_mantine_components as dmc
+from dash import Output, callback, ctx, html
 
 from .app_shell.controls import (
-    ledger_layout,
+    BFILE,
+    GENERATION,
+    Control,
+    get_ledger,
 )
+from ..core import get_generation
+from ..core.errors import GROUPINGS, ErrorIndex
+
+PAGE_SIZE = 50
+
+GROUPING = Control("errors_grouping", value="type")
+GROUP = Control("errors_group")
+PAGE = Control("errors_page", value=1)
+ERRORS_LIST = "errors_list"
+ERRORS_COUNT = "errors_count"
+
+
+layout = [
+    dmc.Group(
+        [
+            dmc.Badge(id=ERRORS_COUNT, color="red", variant="filled"),
+            GROUPING.make_widget(
+                dmc.SegmentedControl,
+                data=[
+                    {"value": value, "label": label}
+                    for value, label in GROUPINGS.items()
+                ],
+                size="xs",
+            ),
+            GROUP.make_widget(
+                dmc.Select,
+                data=[],
+                placeholder="All",
+                searchable=True,
+                clearable=True,
+                w=400,
+                size="xs",
+            ),
+            PAGE.make_widget(dmc.Pagination, total=1, size="xs"),
+        ],
+        mb="md",
+    ),
+    html.Div(id=ERRORS_LIST),
+]
+
 
+def _group_data(index: ErrorIndex, grouping: str) -> list:
+    display = index.display_file if grouping == "file" else str
+    return [
+        {"value": value, "label": "{} ({})".format(display(value), count)}
+        for value, count in index.counts[grouping]
+    ]
 
-# ERRORS = ChildrenHelper("ledger_errors")
 
+def _render_page(index: ErrorIndex, positions: list) -> list:
+    if not positions:
+        return [dmc.Alert("No errors", title="✓", color="green", variant="light")]
+    return [
+        dmc.Alert(
+            [
+                html.Div(index.errors[i].message),
+                dmc.Badge(index.keys["account"][i], variant="outline", size="xs"),
+            ],
+            title="{} · {}".format(index.keys["type"][i], index.locations[i]),
+            color="red",
+            variant="light",
+            mb="xs",
+        )
+        for i in positions
+    ]
 
-# layout = dmc.Code(id=ERRORS.id, block=True)
 
+def render_errors(bfile, grouping, value, page):
+    """Rendered page of errors and its selection size, cached per ledger generation"""
+    generation = get_generation(get_ledger(bfile))
+    index = generation.error_index
 
-@ledger_layout
-def layout(ledger, **kwargs):
-    if ledger:
-        return dmc.Code(pformat(ledger.errors), block=True)
+    def render():
+        selection = index.select(grouping, value)
+        return (
+            _render_page(index, index.page(selection, page, PAGE_SIZE)),
+            len(selection),
+        )
 
+    return generation.memoize(("errors", grouping, value, page), render)
 
-#
-# @callback(ERRORS.output, BFILE.input)
-# def update_options(bfile):
-#     if bfile:
-#         ledger = get_ledger(bfile)
-#         # if ledger.errors:
-#         #     b = dmc.Badge(str(len(ledger.errors)), color="red", variant="filled")
-#         # else:
-#         #     b = dmc.Badge("✓", color="green", variant="light")
-#         return pformat(ledger.errors)
-#     # db = dmc.Badge("?", color="grey", variant="outline")
-#     return "Not Loaded"
+
+@callback(
+    GROUP.make_output("data"),
+    GROUP.output,
+    Output(ERRORS_COUNT, "children"),
+    GROUPING.input,
+    BFILE.input,
+    GENERATION.input,
+)
+def update_groups(grouping, bfile, generation):
+    index = get_generation(get_ledger(bfile)).error_index
+    return _group_data(index, grouping), None, "{} errors".format(len(index))
+
+
+@callback(
+    Output(ERRORS_LIST, "children"),
+    PAGE.make_output("total"),
+    PAGE.output,
+    GROUP.input,
+    PAGE.input,
+    GROUPING.state,
+    BFILE.input,
+    GENERATION.input,
+)
+def update_errors(value, page, grouping, bfile, generation):
+    if ctx.triggered_id != PAGE.id:
+        page = 1  # New selection, back to the start
+    children, size = render_errors(bfile, grouping, value, page or 1)
+    return children, max(1, -(-size // PAGE_SIZE)), page
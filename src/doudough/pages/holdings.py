@@ -0,0 +1,91 @@
+import dash_ag_grid as dag
+import dash_mantine_components as dmc
+from dash import Output, dcc
+
+from .app_shell.controls import Context, filtered_ledger_callback, warmup
+from ..charting import create_breakdown_chart
+from ..core.holdings import allocation_tree, by_commodity, holdings
+
+MONEY = {
+    "function": "params.value == null ? '' : d3.format('($,.2f')(params.value)"
+}
+
+COLUMN_DEFS = [
+    {"field": "account"},
+    {"field": "currency", "headerName": "Commodity"},
+    {"field": "units", "type": "numericColumn"},
+    {"field": "lots", "type": "numericColumn"},
+    {"field": "cost_currency", "headerName": "Cost currency"},
+    {"field": "book_value", "type": "numericColumn", "valueFormatter": MONEY},
+    {"field": "market_value", "type": "numericColumn", "valueFormatter": MONEY},
+    {
+        "field": "gain",
+        "type": "numericColumn",
+        "valueFormatter": MONEY,
+        "cellStyle": {
+            "function": "params.value < 0 ? {color: 'red'} : {color: 'green'}"
+        },
+    },
+    {
+        "field": "value",
+        "type": "numericColumn",
+        "pinned": "right",
+        "valueFormatter": MONEY,
+    },
+]
+
+grid = dag.AgGrid(
+    id="holdings",
+    rowData=[],
+    columnDefs=COLUMN_DEFS,
+    defaultColDef={"filter": True, "sortable": True},
+    columnSize="responsiveSizeToFit",
+    style={"height": "60vh"},
+)
+
+layout = dmc.Stack([dcc.Graph("holdings_allocation_graph"), grid])
+
+
+@filtered_ledger_callback(
+    Output("holdings_allocation_graph", "figure"),
+    Output(grid, "rowData"),
+)
+def update_holdings(context):
+    return context.cached("holdings", holdings_view)
+
+
+def holdings_view(context: Context):
+    """Allocation and gains at market, as of the end of the time filter
+
+    Holdings are a point in time, so only the account and time filters apply.
+    """
+    currency = context.operating_currency
+    generation = context.generation
+    held = holdings(
+        generation.lots,
+        generation.conversion,
+        currency,
+        on=context.filtered.end_date,
+        account=context.account,
+    )
+    summary = by_commodity(held)
+
+    values = {
+        "{}:{}".format(row.account, row.currency): row.value
+        for row in summary.itertuples()
+    }
+    allocation = create_breakdown_chart(
+        allocation_tree(values, currency, "Assets"),
+        currency,
+        graph_type="sunburst",
+        scale="Greens",
+    )
+
+    rows = summary.astype({"account": str, "currency": str, "cost_currency": str})
+    rows = rows.astype(object).where(rows.notna(), None)
+    return allocation, rows.to_dict("records")
+
+
+@warmup
+def warm_up(context):
+    context.cached("holdings", holdings_view)
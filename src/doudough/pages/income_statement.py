@@ -1,6 +1,9 @@
+from datetime import date
+
 import dash_mantine_components as dmc
-from dash import dash_table, dcc
+from dash import dash_table, dcc, ctx, Input
 from fava.util.date import Interval
+from dash.exceptions import PreventUpdate
 from plotly import graph_objects as go
 
 from .app_shell.controls import (
@@ -10,8 +13,18 @@ from .app_shell.controls import (
     filtered_ledger_callback,
     Control,
     INTERVAL,
+    CHART_WIDTH,
+    warmup,
+)
+from .utils import (
+    interval_plot,
+    treeify_accounts,
+    yield_tree_nodes,
+    bar_budget,
+    lod_interval,
+    parse_relayout_range,
+    snap_window,
 )
-from .utils import interval_plot, treeify_accounts, yield_tree_nodes
 from ..charting import create_breakdown_chart, create_hierarchy_sankey_data
 
 INCOME_GRAPH = GraphHelper("income_timeline")
@@ -88,19 +101,82 @@ layout = [
 #     )
 
 
+TIMELINE_GRAPHS = ["net", "income_time", "expenses_time"]
+
+
 @filtered_ledger_callback(
-    *[
-        Output("{}_graph".format(f), "figure")
-        for f in ["net", "income_time", "expenses_time"]
-    ],
+    *[Output("{}_graph".format(f), "figure") for f in TIMELINE_GRAPHS],
     INTERVAL.input,
+    CHART_WIDTH.input,
+    *[Input("{}_graph".format(f), "relayoutData") for f in TIMELINE_GRAPHS],
 )
-def update_chart(context, interval):
-
-    root_accounts = ("Income", "Expenses")
+def update_chart(context, interval, width, *relayouts):
 
     interval = Interval.get(interval)
 
+    # Level of detail: zooming one of the graphs re-fetches just the visible
+    # window, at the finest interval which fits the chart width
+    window = None
+    graph_ids = ["{}_graph".format(f) for f in TIMELINE_GRAPHS]
+    if ctx.triggered_id in graph_ids:
+        relayout = relayouts[graph_ids.index(ctx.triggered_id)]
+        if relayout and not any(k.startswith("xaxis.") for k in relayout):
+            raise PreventUpdate  # eg autosize, nothing to refetch
+        window = parse_relayout_range(relayout)
+
+    span = date_span(context.filtered)
+    if span is None:
+        return tuple(go.Figure() for _ in TIMELINE_GRAPHS)
+
+    view = context
+    begin, end = span
+    max_bars = bar_budget(width)
+    requested = interval
+    if window is not None:
+        begin, end = max(begin, window[0]), min(end, window[1])
+        if begin > end:
+            raise PreventUpdate
+        interval = lod_interval(interval, begin, end, max_bars)
+        begin, end = snap_window(begin, end, interval)
+        # ...but still within the time filter
+        begin, end = max(begin, span[0]), min(end, span[1])
+        view = context.window(begin, end)
+    else:
+        interval = lod_interval(interval, begin, end, max_bars)
+
+    dates, *series = view.cached("income_timeline", timeline_series, interval)
+
+    figs = [
+        interval_plot(dates, data, interval=interval, max_bars=max_bars)
+        for data in series
+    ]
+    for fig in figs:
+        # Keep the user's zoom, the refetched bars only cover the window
+        fig.update_layout(
+            uirevision=str(
+                (context.bfile, context.account, context.filter, context.time, requested)
+            )
+        )
+        if window is not None:
+            fig.update_xaxes(range=[str(window[0]), str(window[1])])
+    return tuple(figs)
+
+
+def date_span(filtered) -> tuple[date, date] | None:
+    """The dates charted for a filtered ledger: those of its time filter, if
+    any (its entries include earlier Open directives), else of its entries"""
+    if filtered.date_range is not None:
+        return filtered.date_range.begin, filtered.date_range.end_inclusive
+    if not filtered.entries:
+        return None
+    return filtered.entries[0].date, filtered.entries[-1].date
+
+
+def timeline_series(context, interval) -> tuple[list, list, list, list]:
+    """Dates, and the net, income and expenses totals for each interval"""
+
+    root_accounts = ("Income", "Expenses")
+
     # match graph_type:
     #     case "net":
     #         root_accounts = ("Income", "Expenses")
@@ -120,11 +196,11 @@ def update_chart(context, interval):
     )
 
     dates = [it.date for it in interval_totals]
-    net = [it.balance.get(context.operating_currency, 0) for it in interval_totals]
+    net = [context.value(it.balance, it.date) for it in interval_totals]
     income = [
         sum(
             [
-                i.get(context.operating_currency, 0)
+                context.value(i, it.date)
                 for acct, i in it.account_balances.items()
                 if acct.startswith("I")
             ]
@@ -134,20 +210,14 @@ def update_chart(context, interval):
     expenses = [
         sum(
             [
-                i.get(context.operating_currency, 0)
+                context.value(i, it.date)
                 for acct, i in it.account_balances.items()
                 if acct.startswith("Ex")
             ]
         )
         for it in interval_totals
     ]
-
-    return tuple(
-        [
-            interval_plot(dates, data, interval=interval)
-            for data in [net, income, expenses]
-        ]
-    )
+    return dates, net, income, expenses
 
 
 @filtered_ledger_callback(
@@ -158,15 +228,14 @@ def update_chart(context, interval):
     EXPENSES_TABLE.output,
 )
 def update_breakdowns(context):
+    return context.cached("income_breakdowns", breakdowns)
+
+
+def breakdowns(context):
 
     roots = {"Income": {"scale": "Blues"}, "Expenses": {"scale": "Reds"}}
 
-    data = {
-        root: context.ledger.charts.hierarchy(
-            context.filtered, root, context.operating_currency
-        )
-        for root in roots.keys()
-    }
+    data = {root: context.hierarchy(root) for root in roots.keys()}
 
     node, link = create_hierarchy_sankey_data(
         data["Income"], data["Expenses"], context.operating_currency, max_hierarchy=3
@@ -207,9 +276,7 @@ def _update_table(context, account_root, invert=1):
 
 def get_hierarchy_data(context, account_root):
 
-    hierarchy = context.ledger.charts.hierarchy(
-        context.filtered, account_root, context.operating_currency
-    )  # need this directly for sankey
+    hierarchy = context.hierarchy(account_root)  # need this directly for sankey
     data = [
         {
             "account": node.account,
@@ -219,3 +286,13 @@ def get_hierarchy_data(context, account_root):
     ]
 
     return data
+
+
+@warmup
+def warm_up(context):
+    context.cached("income_breakdowns", breakdowns)
+
+    span = date_span(context.filtered)
+    if span is not None:
+        interval = lod_interval(INTERVAL.value, *span, bar_budget())
+        context.cached("income_timeline", timeline_series, interval)
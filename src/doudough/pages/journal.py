@@ -1,21 +1,31 @@
+import json
 from typing import List
 
 import dash_ag_grid as dag
 import dash_mantine_components as dmc
 from beancount.core import data as D
 from beancount.core.convert import get_weight
-from dash import Output, callback, Input, Patch, State
-from fava.beans.funcs import hash_entry
-from fava.core.file import get_entry_slice
+from dash import Output, callback, Input, State
 
+from .app_shell import source_view
+from .app_shell.clientside import ClientsideNamespace
 from .app_shell.controls import (
+    ChildrenHelper,
     DataHelper,
     filtered_ledger_callback,
-    get_ledger,
+    get_loader,
+    read_only,
     BFILE,
+    warmup,
 )
+from .. import export
+from ..core import LedgerGeneration
+from ..core.editor import SourceChangedError, edit_entry
+
+CLIENTSIDE = ClientsideNamespace("journal")
 
 JOURNAL_TABLE = DataHelper("journal")
+EDIT_STATUS = ChildrenHelper("journal_edit_status", children="")
 
 
 FILTER_BUTTONS = [
@@ -37,10 +47,16 @@ FILTER_BUTTONS = [
 ]
 FLAGS = ["!", "x", "*"]
 
+#: Transaction cells written back to the source file, see `edit_cell`
+EDITABLE = {"editable": {"function": "params.data.type === 'Transaction'"}}
+#: Grid columns by the transaction field they show
+FIELDS = {"f": "flag"}
+
 COLUMN_DEFS = [
     {
         "field": "date",
         "cellDataType": "dateString",
+        **EDITABLE,
         # "checkboxSelection": True,
         # "headerCheckboxSelection": True,
         # 'colSpan': {"function": "params.data.country === 'Russia' ? 2 : 1"}
@@ -52,9 +68,10 @@ COLUMN_DEFS = [
         "filterParams": {
             "maxNumConditions": 10,
         },
+        **EDITABLE,
     },
-    {"field": "payee"},
-    {"field": "narration"},
+    {"field": "payee", **EDITABLE},
+    {"field": "narration", **EDITABLE},
     # {"field": "weight"},
     # {"field": "pop", "headerName": "Population"},
     # {"field": "lifeExp", "headerName": "Life Expectancy"},
@@ -65,34 +82,25 @@ COLUMN_DEFS = [
         "valueFormatter": {"function": "d3.format('($,.2f')(params.value)"},
     },
 ]
-code = dmc.Code(block=True)
-modal = dmc.Modal(
-    title="Source View",
-    id="modal-simple",
-    size="lg",
-    children=[
-        code,
-        # dmc.Space(h=20),
-        # dmc.Group(
-        #     [
-        #         # dmc.Button("Close", id="modal-close-button"),
-        #         # dmc.Button(
-        #         #     "Close",
-        #         #     color="red",
-        #         #     variant="outline",
-        #         #     id="modal-close-button",
-        #         # ),
-        #     ],
-        #     justify="flex-end",
-        # ),
-    ],
+export_menu = dmc.Menu(
+    [
+        dmc.MenuTarget(dmc.Button("Export", size="xs", variant="subtle")),
+        dmc.MenuDropdown(
+            [
+                dmc.MenuItem(
+                    format.capitalize(), id="journal_export_" + format, href=""
+                )
+                for format in export.FORMATS
+            ]
+        ),
+    ]
 )
 grid = dag.AgGrid(
     id="ledger",
     rowData=[],
     columnDefs=COLUMN_DEFS,
     defaultColDef={
-        "editable": True,
+        "editable": False,
         "filter": True,
         # "floatingFilter": True,
         # "checkboxSelection": {
@@ -118,7 +126,6 @@ grid = dag.AgGrid(
 layout = [
     dmc.Group(
         [
-            modal,
             dmc.ChipGroup(
                 [
                     dmc.Chip(
@@ -133,7 +140,9 @@ layout = [
                 multiple=True,
                 id="filter_chips",
             ),
+            EDIT_STATUS.make_widget(dmc.Text, size="xs", c="dimmed"),
             dmc.TextInput(id="journal_qf", placeholder="filter..."),
+            export_menu,
         ],
         justify="flex-end",
         gap="xs",
@@ -143,11 +152,10 @@ layout = [
 
 
 @callback(
-    Output(modal, "opened"),
-    Output(code, "children"),
+    *source_view.OUTPUTS,
     Input(grid, "selectedRows"),
     BFILE.state,
-    State(modal, "opened"),
+    State(source_view.modal, "opened"),
     prevent_initial_call=True,
 )
 def view_source(selection, bfile, is_open):
@@ -158,41 +166,83 @@ def view_source(selection, bfile, is_open):
     if is_open:
         return False, ""
 
-    ledger = get_ledger(bfile)
-    entry = ledger.get_entry(selection[0]["id"])
-    source, sha = get_entry_slice(entry)
-    return True, source
-
-
-@callback(Output(grid, "dashGridOptions"), Input("journal_qf", "value"))
-def quickfilter(filter_value):
-    newFilter = Patch()
-    newFilter["quickFilterText"] = filter_value
-    return newFilter
-
-
-@callback(Output(grid, "filterModel"), Input("filter_chips", "value"))
-def filter_types(values):
-    f = Patch()
-    f["type"] = {
-        "filterType": "text",
-        "operator": "OR",
-        "conditions": [
-            {"filterType": "text", "type": "equals", "filter": t.capitalize()}
-            for t in values
-            if t not in FLAGS
-        ],
+    return source_view.show_source(bfile, selection[0]["id"])
+
+
+@callback(
+    EDIT_STATUS.output,
+    Input(grid, "cellValueChanged"),
+    BFILE.state,
+    prevent_initial_call=True,
+)
+def edit_cell(changes, bfile):
+    """Write an edited cell back to the transaction's source file
+
+    The journal then updates with the new generation, like after any change.
+    """
+    if read_only():
+        return "Read-only mode: edits are not saved"
+    if isinstance(changes, dict):
+        changes = [changes]
+    loader = get_loader()
+    slug = bfile or loader.first_slug()
+    messages = []
+    for change in changes or []:
+        column = change["colId"]
+        field = FIELDS.get(column, column)
+        try:
+            edit_entry(loader, slug, change["data"]["id"], field, change["value"])
+        except KeyError:
+            messages.append("Entry not found - has the ledger been reloaded?")
+        except (ValueError, SourceChangedError, OSError) as e:
+            messages.append(str(e))
+        else:
+            messages.append("Saved {}".format(field))
+    return "; ".join(messages)
+
+
+CLIENTSIDE.callback(
+    Output(grid, "dashGridOptions"),
+    Input("journal_qf", "value"),
+    State(grid, "dashGridOptions"),
+    name="quickfilter",
+    function="""
+    function(filter_value, options) {
+        return Object.assign({}, options, {quickFilterText: filter_value});
     }
-    f["f"] = {  # TODO: implement x
-        "filterType": "text",
-        "operator": "OR",
-        "conditions": [
-            {"filterType": "text", "type": "equals", "filter": f}
-            for f in values
-            if f in FLAGS
-        ],
+    """,
+)
+
+
+CLIENTSIDE.callback(
+    Output(grid, "filterModel"),
+    Input("filter_chips", "value"),
+    State(grid, "filterModel"),
+    name="filter_types",
+    function="""
+    function(values, model) {
+        const flags = %s;
+        const condition = (t) => ({filterType: "text", type: "equals", filter: t});
+        const capitalize = (t) => t.charAt(0).toUpperCase() + t.slice(1).toLowerCase();
+        return Object.assign({}, model, {
+            type: {
+                filterType: "text",
+                operator: "OR",
+                conditions: values
+                    .filter((t) => !flags.includes(t))
+                    .map((t) => condition(capitalize(t))),
+            },
+            // TODO: implement x
+            f: {
+                filterType: "text",
+                operator: "OR",
+                conditions: values.filter((t) => flags.includes(t)).map(condition),
+            },
+        });
     }
-    return f
+    """
+    % json.dumps(FLAGS),
+)
 
 
 # @callback(Output("graph-content", "figure"), Input("dropdown-selection", "value"))
@@ -201,14 +251,18 @@ def filter_types(values):
 #     return px.line(dff, x="year", y="pop")
 
 
-def to_datagrid(transactions: List[D.Directive]) -> List[dict]:
-    return list(map(_to_datagrid, transactions))
+def to_datagrid(
+    transactions: List[D.Directive], generation: LedgerGeneration
+) -> List[dict]:
+    return [_to_datagrid(t, generation) for t in transactions]
 
 
-def _to_datagrid(t: D.Directive) -> dict:
+def _to_datagrid(t: D.Directive, generation: LedgerGeneration) -> dict:
 
     typ = type(t)
-    r = {"id": hash_entry(t), "date": t.date, "type": typ.__name__}
+    index = generation.entry_index
+    position = index.position(t)
+    r = {"id": index.entry_id(t), "date": t.date, "type": typ.__name__}
 
     match typ:
         case D.Transaction:
@@ -217,7 +271,12 @@ def _to_datagrid(t: D.Directive) -> dict:
                     "f": t.flag,
                     "payee": t.payee,
                     "narration": t.narration,
-                    "value": sum([abs(get_weight(p).number) for p in t.postings]) / 2,
+                    "value": (
+                        float(generation.entry_totals[position])
+                        if position is not None
+                        else float(sum(abs(get_weight(p).number) for p in t.postings))
+                        / 2
+                    ),
                 }
             )
         case _:
@@ -265,4 +324,20 @@ def _to_datagrid(t: D.Directive) -> dict:
 
 @filtered_ledger_callback(Output(grid, "rowData"))
 def update_journal(context):
-    return to_datagrid(context.filtered.entries)
+    return context.cached("journal_rows", journal_rows)
+
+
+def journal_rows(context) -> List[dict]:
+    return to_datagrid(context.filtered.entries, context.generation)
+
+
+@warmup
+def warm_up(context):
+    context.cached("journal_rows", journal_rows)
+
+
+@filtered_ledger_callback(
+    *[Output("journal_export_" + format, "href") for format in export.FORMATS]
+)
+def update_export_links(context):
+    return tuple(export.export_url(context, format) for format in export.FORMATS)
@@ -3,10 +3,17 @@ from pprint import pformat
 import dash_mantine_components as dmc
 
 from .app_shell.controls import (
+    SINGLE_FLIGHT,
+    get_loader,
     ledger_layout,
 )
 
 
+def _cache_stats():
+    cache = get_loader().cache
+    return cache.stats() if cache is not None else "Disabled"
+
+
 #
 # FOPTS_MAP = ChildrenHelper("fava_options_map_display")
 # OPTIONS_MAP = ChildrenHelper("options_map_display")
@@ -19,6 +26,12 @@ def layout(ledger, **kwargs):
         dmc.Code(block=True, children=pformat(ledger.fava_options)),
         "Beancount options",
         dmc.Code(block=True, children=pformat(ledger.options)),
+        "Loaded ledgers",
+        dmc.Code(block=True, children=pformat(get_loader().stats())),
+        "Shared callback computations",
+        dmc.Code(block=True, children=pformat(SINGLE_FLIGHT.stats())),
+        "Cached views",
+        dmc.Code(block=True, children=pformat(_cache_stats())),
     ]
 
 
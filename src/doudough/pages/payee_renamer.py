@@ -1,19 +1,44 @@
 from time import time
-from typing import List
+from typing import TYPE_CHECKING, List
 
 import dash_ag_grid as dag
 import dash_mantine_components as dmc
+import numpy as np
 from beancount.core import data as D
-from dash import callback, Input
+from dash import Input, State, callback
 from dash.dash_table import DataTable
 from beancount.core.convert import get_weight
 from beancount.core.data import Transaction
 from dash.dash_table import DataTable
-from fava.beans.funcs import hash_entry
-from fava.core.group_entries import TransactionPosting
-from fava.core.tree import SerialisedTreeNode
 
-from .app_shell.controls import Output, filtered_ledger_callback, Context
+from .app_shell.clientside import ClientsideNamespace
+from .app_shell.controls import (
+    ACCOUNT,
+    BFILE,
+    FILTER,
+    TIME_SELECTOR,
+    ChildrenHelper,
+    Context,
+    Control,
+    Output,
+    filtered_ledger_callback,
+    get_loader,
+    read_only,
+    warmup,
+)
+from ..core import LedgerGeneration
+from ..core.editor import SourceChangedError, rename_payees
+
+if TYPE_CHECKING:
+    from fava.core.group_entries import TransactionPosting
+
+    from ..core.payees import PayeeCluster
+    from fava.core.tree import SerialisedTreeNode
+
+CLIENTSIDE = ClientsideNamespace("payee_renamer")
+
+#: Clusters of similar payees listed in the tree, most used first
+MAX_CLUSTERS = 500
 
 # layout = dmc.Accordion(id="expenses_payees", children=[], multiple=True)
 tree = dmc.Tree(
@@ -77,7 +102,20 @@ table = DataTable(
     sort_action="native",
     page_size=100,
 )
-layout = dmc.Grid(children=[dmc.GridCol(tree, span=3), dmc.GridCol(table, span=9)])
+NEW_PAYEE = Control("payee_rename_to", value="")
+RENAME_STATUS = ChildrenHelper("payee_rename_status", children="")
+rename = dmc.Group(
+    [
+        NEW_PAYEE.make_widget(
+            dmc.TextInput, placeholder="New payee of the selection", flex=1
+        ),
+        dmc.Button("Rename", id="payee_rename_button"),
+        RENAME_STATUS.make_widget(dmc.Text, size="sm"),
+    ]
+)
+layout = dmc.Grid(
+    children=[dmc.GridCol([rename, tree], span=3), dmc.GridCol(table, span=9)]
+)
 
 
 class MyTree:
@@ -91,7 +129,7 @@ class MyTree:
     def label(self):
         return self.v.split(":")[-1]
 
-    def add_tp(self, tp: TransactionPosting):
+    def add_tp(self, tp: "TransactionPosting"):
         key = tp.posting.account + ":" + (tp.transaction.payee or "-NONE-")
         parts = key.split(":")
 
@@ -136,7 +174,7 @@ class MyTree:
         )
 
 
-def to_tree_node(node: SerialisedTreeNode, currency, results) -> dict:
+def to_tree_node(node: "SerialisedTreeNode", currency, results) -> dict:
 
     my_payees = [r[1] or "-NONE-" for r in results if r[0] == node.account]
     child_results = [r for r in results if r[0].startswith(node.account + ":")]
@@ -151,8 +189,41 @@ def to_tree_node(node: SerialisedTreeNode, currency, results) -> dict:
     }
 
 
+def cluster_tree(clusters: List["PayeeCluster"]) -> dict:
+    """Clusters of similar payees, each selectable to rename all its spellings
+
+    Selections are ("", *payees): any account, one of payees.
+    """
+    return {
+        "value": "~clusters",
+        "label": "Similar payees ({})".format(len(clusters)),
+        "children": [
+            {
+                "value": ("", *cluster.payees),
+                "label": "{} ({} spellings, {} txns, {:,.0f})".format(
+                    cluster.name, len(cluster.payees), cluster.count, cluster.total
+                ),
+                "children": [
+                    {
+                        "value": ("", payee),
+                        "label": "{} ({}, {:,.0f})".format(payee, count, total),
+                    }
+                    for payee, count, total in zip(
+                        cluster.payees, cluster.counts, cluster.totals
+                    )
+                ],
+            }
+            for cluster in clusters[:MAX_CLUSTERS]
+        ],
+    }
+
+
 @filtered_ledger_callback(Output("expenses_payees", "data"))
 def update_tree(context: Context):
+    return context.cached("payee_tree", payee_tree)
+
+
+def payee_tree(context: Context) -> list:
     t0 = time()
     rtypes, results = context.filtered_query(
         "select account, payee where account ~ 'Income|Expenses' group by account, payee order by account, payee"
@@ -160,14 +231,13 @@ def update_tree(context: Context):
     t1 = time()
     hier = [
         to_tree_node(
-            context.ledger.charts.hierarchy(
-                context.filtered, root, context.operating_currency
-            ),
+            context.hierarchy(root),
             context.operating_currency,
             results,
         )
         for root in ["Income", "Expenses"]
     ]
+    hier.append(cluster_tree(context.generation.payee_clusters))
 
     print("query:", t1 - t0)
     print("hierarchy:", time() - t1)
@@ -189,13 +259,22 @@ def update_tree(context: Context):
 #     return [t.to_accordian_item() for n, t in sorted(tree.children.items())]
 
 
-def to_datagrid(transactions: List[D.Directive]) -> List[dict]:
+def to_datagrid(
+    transactions: List[D.Directive], generation: LedgerGeneration
+) -> List[dict]:
     out = []
 
     t0 = time()
+    index = generation.entry_index
+    positions = []
     for t in transactions:
         if not isinstance(t, Transaction):
             continue
+        position = index.position(t)
+        if position is not None:
+            positions.append(position)
+            continue
+        # Not a loaded entry (eg. summarized by a time filter)
         tr = {
             # "tid": hash_entry(t),
             "date": t.date,
@@ -205,6 +284,20 @@ def to_datagrid(transactions: List[D.Directive]) -> List[dict]:
         for p in t.postings:
 
             out.append(dict(account=p.account, value=get_weight(p).number, **tr))
+
+    table = generation.postings
+    rows = table.rows(positions)
+    entries = generation.entries
+    out.extend(
+        dict(date=date, payee=payee, narration=entries[e].narration, account=a, value=v)
+        for date, payee, e, a, v in zip(
+            table.date[rows].astype(str).tolist(),
+            table.payees.lookup(table.payee[rows].tolist(), ""),
+            table.entry[rows].tolist(),
+            table.accounts.lookup(table.account[rows].tolist()),
+            table.weight[rows].tolist(),
+        )
+    )
     print("dg:", time() - t0)
     return out
 
@@ -229,32 +322,109 @@ def to_datagrid(transactions: List[D.Directive]) -> List[dict]:
 
 @filtered_ledger_callback(Output(table, "data"))
 def update_journal(context):
-    return to_datagrid(context.filtered.entries)
-
-
-@callback(Output(table, "filter_query"), Input(tree, "selected"))
-def apply_filter(selected):
-    if not selected:
-        return ""
-    assert len(selected) == 1
-    s = selected[0]
-    if isinstance(s, str):
-        fq = " ".join(["{account}", "scontains", s])
-    else:
-        account, payee = s
-        if payee == "-NONE-":
-            payee = ""
-        fq = " ".join(
-            [
-                "{account}",
-                "scontains",
-                account,
-                "&&",
-                "{payee}",
-                "eq",
-                '"{}"'.format(payee),
-            ]
+    return context.cached("payee_rows", payee_rows)
+
+
+def payee_rows(context) -> List[dict]:
+    return to_datagrid(context.filtered.entries, context.generation)
+
+
+CLIENTSIDE.callback(
+    Output(table, "filter_query"),
+    Input(tree, "selected"),
+    name="apply_filter",
+    function="""
+    function(selected) {
+        if (!selected || !selected.length) {
+            return "";
+        }
+        const s = selected[0];
+        if (typeof s === "string") {
+            return ["{account}", "scontains", s].join(" ");
+        }
+        const [account, ...payees] = s;
+        const matches = payees.map(
+            (p) => "{payee} eq " + JSON.stringify(p === "-NONE-" ? "" : p)
+        );
+        const payee = "(" + matches.join(" || ") + ")";
+        if (!account) {
+            return payee;
+        }
+        return ["{account}", "scontains", account, "&&", payee].join(" ");
+    }
+    """,
+)
+
+
+@callback(Output("payee_rename_button", "disabled"), BFILE.input)
+def disable_rename(bfile):
+    return read_only()
+
+
+def selected_transactions(
+    context: Context, generation: LedgerGeneration, selected
+) -> list[int]:
+    """Positions of the filtered transactions under a payee node of the tree
+
+    selected is (account, *payees), "" being any account.
+    """
+    table = generation.postings
+    account, *payees = selected
+    rows = np.ones(len(table), dtype=bool)
+    if account:
+        accounts = table.accounts.codes_of(
+            lambda a: a == account or a.startswith(account + ":")
         )
+        rows &= np.isin(table.account, accounts)
+    wanted = set(payees)
+    codes = table.payees.codes_of(lambda p: p in wanted).tolist()
+    if "-NONE-" in wanted:
+        codes.append(-1)
+    rows &= np.isin(table.payee, codes)
+
+    index = generation.entry_index
+    visible = {index.position(e) for e in context.filtered.entries}
+    return [p for p in np.unique(table.entry[rows]).tolist() if p in visible]
+
+
+@callback(
+    RENAME_STATUS.output,
+    Input("payee_rename_button", "n_clicks"),
+    State(tree, "selected"),
+    NEW_PAYEE.state,
+    BFILE.state,
+    ACCOUNT.state,
+    FILTER.state,
+    TIME_SELECTOR.state,
+    prevent_initial_call=True,
+)
+def rename_selection(n_clicks, selected, payee, bfile, account, filter, time):
+    """Rewrite the payee of every transaction under the selected payee (or
+    cluster of payees), then reload the ledger once
+
+    Account nodes are not renamed: one click would rewrite every transaction
+    of the account.
+    """
+    if read_only():
+        return "Read-only mode"
+    if not selected or isinstance(selected[0], str):
+        return "Select a payee, or a cluster of similar payees"
+    context = Context(bfile=bfile, account=account, filter=filter, time=time)
+    generation = context.generation
+    positions = selected_transactions(context, generation, selected[0])
+    try:
+        edited = rename_payees(generation, positions, (payee or "").strip() or None)
+    except (SourceChangedError, OSError) as e:
+        return "Not renamed: {}".format(e)
+    if edited:
+        get_loader().wrote(context.bfile, edited)
+        get_loader().reload(context.bfile)
+    return "Renamed {} transactions in {} files".format(
+        sum(edited.values()), len(edited)
+    )
+
 
-    print(fq)
-    return fq
+@warmup
+def warm_up(context):
+    context.cached("payee_tree", payee_tree)
+    context.cached("payee_rows", payee_rows)
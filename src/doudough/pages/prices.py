@@ -0,0 +1,112 @@
+from datetime import date
+
+import dash_mantine_components as dmc
+import numpy as np
+from dash import Input
+from plotly import graph_objects as go
+
+from .app_shell.controls import (
+    Context,
+    Control,
+    GraphHelper,
+    filtered_ledger_callback,
+)
+from .utils import parse_relayout_range
+from ..core.conversion import downsample
+
+COMMODITIES = Control("price_commodities", value=[])
+QUOTE = Control("price_quote", value="quoted")
+PRICE_GRAPH = GraphHelper("prices_graph")
+
+#: Points drawn per series, however long its history
+MAX_POINTS = 2000
+#: Series drawn when no commodity is selected (those with the most prices)
+DEFAULT_SERIES = 10
+
+layout = [
+    dmc.Group(
+        [
+            COMMODITIES.make_widget(
+                dmc.MultiSelect,
+                data=[],
+                placeholder="Commodities",
+                searchable=True,
+                clearable=True,
+                w=500,
+            ),
+            QUOTE.make_widget(
+                dmc.SegmentedControl,
+                data=[
+                    {"value": "quoted", "label": "As quoted"},
+                    {"value": "converted", "label": "In operating currency"},
+                ],
+            ),
+        ]
+    ),
+    PRICE_GRAPH.make_widget(style={"height": "75vh"}),
+]
+
+
+@filtered_ledger_callback(COMMODITIES.make_output("data"))
+def update_commodities(context):
+    return sorted({base for base, _ in context.generation.conversion.quoted})
+
+
+@filtered_ledger_callback(
+    PRICE_GRAPH.output,
+    COMMODITIES.input,
+    QUOTE.input,
+    Input(PRICE_GRAPH.id, "relayoutData"),
+)
+def update_prices(context, commodities, quote, relayout):
+    # Zooming re-slices the series at full resolution
+    begin, end = parse_relayout_range(relayout) or _time_range(context)
+    return price_figure(context, tuple(commodities or ()), quote, begin, end)
+
+
+def _time_range(context: Context) -> tuple[date | None, date | None]:
+    if not context.time:
+        return None, None
+    date_range = context.filtered.date_range
+    if date_range is None:
+        return None, None
+    return date_range.begin, date_range.end_inclusive
+
+
+def price_figure(context: Context, commodities: tuple, quote: str, begin, end):
+    """Price history of commodities (default: the most often priced ones), as
+    quoted or in the operating currency, downsampled to MAX_POINTS each"""
+    conversion = context.generation.conversion
+    pairs = [p for p in conversion.quoted if not commodities or p[0] in commodities]
+    if not commodities:
+        pairs.sort(key=lambda p: len(conversion.pairs[p][0]), reverse=True)
+        pairs = pairs[:DEFAULT_SERIES]
+    if quote == "converted":
+        currency = context.operating_currency
+        pairs = sorted({(base, currency) for base, _ in pairs if base != currency})
+
+    fig = go.Figure()
+    positive = True
+    for base, quote_currency in pairs:
+        dates, prices = conversion.series(base, quote_currency, begin, end)
+        dates, prices = downsample(dates, prices, MAX_POINTS)
+        positive = positive and bool(np.all(np.asarray(prices, dtype=float) > 0))
+        fig.add_trace(
+            go.Scattergl(
+                x=dates,
+                y=prices,
+                mode="lines",
+                name="{} in {}".format(base, quote_currency),
+            )
+        )
+    fig.update_layout(
+        # Keeps the zoom when the series are redrawn for it
+        uirevision="{}:{}:{}".format(context.bfile, quote, ",".join(commodities)),
+        hovermode="x unified",
+        # Log scale compares the moves of prices of any size, but can not show
+        # zero or negative prices
+        yaxis_type="log" if positive and fig.data else "linear",
+        xaxis_title=None,
+        yaxis_title=None,
+    )
+    return fig
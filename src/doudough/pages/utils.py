@@ -1,18 +1,23 @@
+import math
 import os
 from collections import defaultdict
 from contextlib import contextmanager
-from datetime import date
+from datetime import date, timedelta
 from decimal import Decimal
 from time import time
+from typing import TYPE_CHECKING
 
 import dash
-import pandas as pd
+import numpy as np
 from beancount.core.data import D
 from dash import dash_table
-from fava.core.tree import SerialisedTreeNode
-from fava.util.date import Interval
+from fava.util.date import Interval, get_next_interval, get_prev_interval
 from plotly import graph_objects as go
 
+if TYPE_CHECKING:
+    import pandas as pd
+    from fava.core.tree import SerialisedTreeNode
+
 
 @contextmanager
 def timeit(prompt="Time"):
@@ -21,7 +26,7 @@ def timeit(prompt="Time"):
     print(prompt + ":", time() - t0)
 
 
-def yield_tree_nodes(node: SerialisedTreeNode):
+def yield_tree_nodes(node: "SerialisedTreeNode"):
     """Iterate through tree nodes in depth-first topological order"""
     yield node
     for child in node.children:
@@ -42,7 +47,7 @@ def register(name=None, path=None, **kwargs):
     return wrapper
 
 
-def table_from_df(df: pd.DataFrame, **kwargs) -> dash_table.DataTable:
+def table_from_df(df: "pd.DataFrame", **kwargs) -> dash_table.DataTable:
     # Convert all decimals
     df = df.reset_index()
     df = df.astype(
@@ -71,12 +76,16 @@ def table_from_df(df: pd.DataFrame, **kwargs) -> dash_table.DataTable:
     )
 
 
-def densify_time_index(df: pd.DataFrame) -> pd.DataFrame:
+def densify_time_index(df: "pd.DataFrame") -> "pd.DataFrame":
+    import pandas as pd
+
     new_index = pd.period_range(df.index.min(), df.index.max(), freq=df.index.freq)
     return df.reindex(new_index, fill_value=0)
 
 
-def rollup_accounts(series: pd.Series) -> pd.Series:
+def rollup_accounts(series: "pd.Series") -> "pd.Series":
+    import pandas as pd
+
     rollup = defaultdict(lambda: D(0))
     series = series[series.notna()]  # nan's can be issues??
     for account, val in series.items():
@@ -105,42 +114,155 @@ def treeify_accounts(accounts):
     return [treeify_accounts(a) for a in accounts]
 
 
-def interval_plot(
-    x,
-    y,
-    interval: Interval = Interval.MONTH,
-    fig: go.Figure = None,
-    **bar_kwargs,
-) -> go.Figure:
+#: Intervals from finest to coarsest, used to pick a level of detail
+LOD_INTERVALS = [
+    Interval.DAY,
+    Interval.WEEK,
+    Interval.MONTH,
+    Interval.QUARTER,
+    Interval.YEAR,
+]
+_APPROX_DAYS = {
+    Interval.DAY: 1,
+    Interval.WEEK: 7,
+    Interval.MONTH: 365.25 / 12,
+    Interval.QUARTER: 365.25 / 4,
+    Interval.YEAR: 365.25,
+}
+
+#: Narrowest bar (in pixels) worth sending to the browser
+MIN_BAR_PIXELS = 4
+#: Chart width assumed until the browser reports the real one
+DEFAULT_CHART_WIDTH = 1200
+#: Intervals fava's `interval_totals` returns at most (the last ones)
+MAX_INTERVALS = 100
 
+
+def bar_budget(width=None, min_bar_pixels=MIN_BAR_PIXELS) -> int:
+    """Maximum number of bars that can be told apart in a chart `width` pixels
+    wide, and that fava computes"""
+    bars = int(width or DEFAULT_CHART_WIDTH) // min_bar_pixels
+    return max(1, min(bars, MAX_INTERVALS))
+
+
+def lod_interval(
+    interval: Interval, begin: date, end: date, max_bars: int
+) -> Interval:
+    """The finest interval, no finer than `interval`, spanning begin..end in max_bars
+
+    Falls back to the coarsest interval if nothing fits; `coarsen_series` can then
+    merge neighbouring years.
+    """
     if not isinstance(interval, Interval):
         interval = Interval.get(interval)
+    span = max((end - begin).days, 1)
+    candidates = LOD_INTERVALS[LOD_INTERVALS.index(interval) :]
+    for candidate in candidates:
+        # Plus one for the partial intervals at either end
+        if math.ceil(span / _APPROX_DAYS[candidate]) + 1 <= max_bars:
+            return candidate
+    return candidates[-1]
+
+
+def snap_window(begin: date, end: date, interval: Interval) -> tuple[date, date]:
+    """begin..end (inclusive) widened to whole intervals, so that no bar of a
+    zoomed chart only covers part of its interval"""
+    end = get_next_interval(end, interval) - timedelta(days=1)
+    return get_prev_interval(begin, interval), end
+
+
+def coarsen_series(x, y, max_bars: int) -> tuple[list, list, int]:
+    """Merge runs of consecutive buckets so at most max_bars remain
+
+    Merged buckets take the first x and the exact sum of their y values, so
+    totals are preserved.  Returns the new x, y and the number of buckets merged
+    into each bar.
+    """
+    x = list(x)
+    y = list(y)
+    if len(x) <= max_bars:
+        return x, y, 1
+
+    step = -(-len(x) // max_bars)  # ceil
+    return (
+        x[::step],
+        [sum(y[i : i + step]) for i in range(0, len(y), step)],
+        step,
+    )
+
+
+def parse_relayout_range(relayout: dict | None) -> tuple[date, date] | None:
+    """Extract the zoomed x-axis window from a dcc.Graph relayoutData
+
+    Returns None when the axis is autoscaled (or was never zoomed).
+    """
+    if not relayout or relayout.get("xaxis.autorange"):
+        return None
+    if "xaxis.range[0]" in relayout:
+        bounds = relayout["xaxis.range[0]"], relayout["xaxis.range[1]"]
+    elif "xaxis.range" in relayout:
+        bounds = relayout["xaxis.range"]
+    else:
+        return None
+    begin, end = (date.fromisoformat(str(b)[:10]) for b in bounds)
+    return begin, end
+
+
+def _interval_period(interval: Interval, multiple: int = 1):
 
     match interval:
         case Interval.DAY:
-            xperiod = 1000 * 60 * 60 * 24
+            xperiod = 1000 * 60 * 60 * 24 * multiple
             # tickformat = "%d\n%Y-%m"
             dtick = None
             tickformat = None
         case Interval.WEEK:
-            xperiod = 1000 * 60 * 60 * 24 * 7
+            xperiod = 1000 * 60 * 60 * 24 * 7 * multiple
             # tickformat = "%d\n%Y-%m"
             dtick = None
             tickformat = None
         case Interval.MONTH:
-            xperiod = "M1"
+            xperiod = "M{}".format(multiple)
             dtick = xperiod
             tickformat = "%b\n%Y"
         case Interval.QUARTER:
-            xperiod = "M3"
+            xperiod = "M{}".format(3 * multiple)
             tickformat = "Q%q\n%Y"
             dtick = xperiod
         case Interval.YEAR:
-            xperiod = "M12"
+            xperiod = "M{}".format(12 * multiple)
             tickformat = "%Y"
             dtick = xperiod
         case _:
             raise ValueError("Unknonw interval {}".format(interval))
+
+    return xperiod, dtick, tickformat
+
+
+def interval_plot(
+    x,
+    y,
+    interval: Interval = Interval.MONTH,
+    fig: go.Figure = None,
+    max_bars: int = None,
+    **bar_kwargs,
+) -> go.Figure:
+    """Bar chart with one bar per interval
+
+    If max_bars is given, neighbouring bars are merged (summed) so that no more
+    than max_bars are emitted.
+    """
+
+    if not isinstance(interval, Interval):
+        interval = Interval.get(interval)
+
+    multiple = 1
+    if max_bars:
+        x, y, multiple = coarsen_series(x, y, max_bars)
+    # Numeric arrays are sent to the browser as binary typed arrays
+    y = np.asarray(y, dtype=float)
+
+    xperiod, dtick, tickformat = _interval_period(interval, multiple)
     now = date.today()
     # pastx = []
     # pasty = []
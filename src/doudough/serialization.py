@@ -0,0 +1,137 @@
+"""Fast JSON serialization for callback responses and figures
+
+Dash encodes every callback response with plotly's JSON encoder, which walks the
+whole payload in python to clean up Decimals, dates and numpy arrays before
+encoding.  Here orjson does the walking natively; only types it does not know
+(Decimal, numpy arrays, dash components and plotly figures) come back through
+`default`.  Numeric numpy arrays are sent as plotly base64 typed arrays.
+
+Like plotly's encoder, the output escapes `<`, `>` and `/` (so that it can not
+close a <script> it is embedded in) and the line separators U+2028 and U+2029
+(which are not valid in JavaScript strings).
+"""
+
+import base64
+import importlib
+from datetime import date
+from decimal import Decimal
+from typing import Any
+
+import numpy as np
+import orjson
+from flask.json.provider import JSONProvider
+
+#: Plotly.js typed array dtypes
+_TYPED_DTYPES = {"f8", "f4", "i4", "u4", "i2", "u2", "i1", "u1"}
+
+_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+#: As plotly.io.json's `_swap_orjson`
+_SWAP = (
+    (b"<", b"\\u003c"),
+    (b">", b"\\u003e"),
+    (b"/", b"\\u002f"),
+    ("\u2028".encode(), b"\\u2028"),
+    ("\u2029".encode(), b"\\u2029"),
+)
+
+
+def typed_array(values, dtype=None) -> dict:
+    """Encode a sequence of numbers as a plotly base64 typed array spec
+
+    Decimals are converted to floats; int64 (unsupported in plotly.js) is
+    narrowed to int32 if it fits, otherwise sent as float64.
+    """
+    arr = np.asarray(values, dtype=dtype)
+    if arr.dtype.kind not in "fiu":
+        arr = arr.astype("f8")
+    if arr.dtype.str[1:] not in _TYPED_DTYPES:
+        if arr.dtype.kind in "iu" and arr.size and (
+            arr.min() >= np.iinfo("i4").min and arr.max() <= np.iinfo("i4").max
+        ):
+            arr = arr.astype("i4")
+        else:
+            arr = arr.astype("f8")
+    arr = np.ascontiguousarray(arr, dtype=arr.dtype.newbyteorder("<"))
+    spec = {
+        "dtype": arr.dtype.str[1:],
+        "bdata": base64.b64encode(arr.tobytes()).decode("ascii"),
+    }
+    if arr.ndim > 1:
+        spec["shape"] = ", ".join(map(str, arr.shape))
+    return spec
+
+
+def default(obj: Any) -> Any:
+    """orjson fallback for the types found in doudough payloads"""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, np.ndarray):
+        if obj.dtype.kind in "fiu":
+            return typed_array(obj)
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if hasattr(obj, "to_plotly_json"):
+        # Dash components and plotly figures
+        return obj.to_plotly_json()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if isinstance(obj, date):  # eg pandas.Timestamp
+        return obj.isoformat()
+    if hasattr(obj, "tolist"):  # pandas
+        return obj.tolist()
+    raise TypeError(type(obj).__name__)
+
+
+def dumps(obj: Any) -> bytes:
+    return _safe(orjson.dumps(obj, default=default, option=_OPTIONS))
+
+
+def _safe(encoded: bytes) -> bytes:
+    for unsafe, safe in _SWAP:
+        if unsafe in encoded:
+            encoded = encoded.replace(unsafe, safe)
+    return encoded
+
+
+def to_json(obj: Any) -> str:
+    return dumps(obj).decode("utf-8")
+
+
+class OrjsonProvider(JSONProvider):
+    """Flask JSON provider using orjson"""
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return to_json(obj)
+
+    def loads(self, s: str | bytes, **kwargs: Any) -> Any:
+        return orjson.loads(s)
+
+
+def install(app) -> None:
+    """Use orjson for the dash app's callback responses, layouts and flask routes
+
+    Dash does not expose its encoder, so this swaps the `to_json` it imports into
+    its callback and app modules.  Anything orjson cannot encode still falls
+    back to dash's own encoder.
+    """
+    app.server.json = OrjsonProvider(app.server)
+
+    for name in ("dash._callback", "dash.dash"):
+        module = importlib.import_module(name)
+        original = getattr(module, "to_json", None)
+        if original is None or getattr(original, "__wrapped__", None):
+            continue
+        module.to_json = _with_fallback(original)
+
+
+def _with_fallback(original):
+    def encode(obj):
+        try:
+            return to_json(obj)
+        except (TypeError, orjson.JSONEncodeError):
+            return original(obj)
+
+    encode.__wrapped__ = original
+    return encode
@@ -0,0 +1,33 @@
+from doudough.core.cache import MISSING, MemoryCache, SqliteCache, create_cache
+
+
+def test_memory_cache_evicts_least_recently_used():
+    cache = MemoryCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is MISSING
+    assert cache.get("a") == 1
+    assert cache.stats()["hit_rate"] == round(2 / 3, 3)
+
+
+def test_sqlite_cache_is_shared_and_bounded(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = create_cache("sqlite://" + path, max_bytes=4096)
+    cache.set("small", {"x": [1.5, None]})
+    assert SqliteCache(path).get("small") == {"x": [1.5, None]}
+
+    for i in range(10):
+        cache.set(str(i), b"x" * 1000)
+    stats = cache.stats()
+    assert stats["bytes"] <= 4096
+    assert cache.get("9") == b"x" * 1000
+    assert cache.get("small") is MISSING
+
+
+def test_unpicklable_values_are_not_shared(tmp_path):
+    cache = SqliteCache(str(tmp_path / "cache.db"))
+    cache.set("f", lambda: None)
+    assert cache.get("f") is MISSING
+    assert cache.stats()["errors"] == 1
@@ -0,0 +1,79 @@
+import gzip
+from types import SimpleNamespace
+
+from flask import Flask, Response
+
+from doudough import compression
+from doudough.compression import accepted_encodings
+
+
+def test_accepted_encodings():
+    assert accepted_encodings("gzip, br") == {"gzip", "br"}
+    assert accepted_encodings("GZIP;q=0.5, br;q=1.0") == {"gzip", "br"}
+    assert accepted_encodings("gzip;q=0, br") == {"br"}
+    assert accepted_encodings("identity;q=0, *") == {"*"}
+    assert accepted_encodings("gzip;q=x") == set()
+    assert accepted_encodings("") == set()
+    assert accepted_encodings(None) == set()
+
+
+def _client(tmp_path):
+    server = Flask("test")
+    app = SimpleNamespace(
+        server=server,
+        config=SimpleNamespace(
+            requests_pathname_prefix="/",
+            assets_url_path="assets",
+            assets_folder=str(tmp_path),
+        ),
+    )
+    compression.init_app(app, min_size=100)
+    body = "x" * 1000
+
+    @server.route("/big")
+    def big():
+        return Response(body, mimetype="application/json")
+
+    @server.route("/small")
+    def small():
+        return Response("x" * 10, mimetype="application/json")
+
+    @server.route("/streamed")
+    def streamed():
+        return Response(iter([body]), mimetype="application/json")
+
+    @server.route("/encoded")
+    def encoded():
+        response = Response(body, mimetype="application/json")
+        response.headers["Content-Encoding"] = "identity"
+        return response
+
+    return server.test_client(), body
+
+
+def test_after_request_compresses(tmp_path):
+    client, body = _client(tmp_path)
+    response = client.get("/big", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert gzip.decompress(response.data).decode() == body
+
+    response = client.get("/big", headers={"Accept-Encoding": "gzip;q=0"})
+    assert "Content-Encoding" not in response.headers
+    assert response.data.decode() == body
+
+
+def test_after_request_skips(tmp_path):
+    client, body = _client(tmp_path)
+    headers = {"Accept-Encoding": "gzip"}
+
+    response = client.get("/small", headers=headers)
+    assert "Content-Encoding" not in response.headers
+
+    response = client.get("/streamed", headers=headers)
+    assert "Content-Encoding" not in response.headers
+    assert response.data.decode() == body
+
+    response = client.get("/encoded", headers=headers)
+    assert response.headers["Content-Encoding"] == "identity"
+    assert response.data.decode() == body
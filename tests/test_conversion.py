@@ -0,0 +1,58 @@
+import datetime
+
+import numpy as np
+import pytest
+
+from doudough.core.conversion import ConversionEngine, downsample
+
+D = datetime.date
+
+
+def _engine():
+    return ConversionEngine(
+        {
+            ("EUR", "USD"): [(D(2024, 1, 1), 1.1), (D(2024, 3, 1), 1.2)],
+            ("FUND", "EUR"): [(D(2024, 2, 1), 10.0), (D(2024, 2, 1), 11.0)],
+        }
+    )
+
+
+def test_rates_as_of_each_date():
+    rates = _engine().rates(
+        "EUR", "USD", [D(2023, 12, 31), D(2024, 1, 1), D(2024, 2, 15), D(2024, 5, 1)]
+    )
+    np.testing.assert_allclose(rates, [np.nan, 1.1, 1.1, 1.2])
+
+
+def test_inverse_and_indirect_rates():
+    engine = _engine()
+    np.testing.assert_allclose(engine.rates("USD", "EUR", [D(2024, 3, 1)]), [1 / 1.2])
+    # The last price of a day wins, then converted through EUR
+    np.testing.assert_allclose(engine.rates("FUND", "USD", [D(2024, 3, 1)]), [13.2])
+
+
+def test_value_keeps_unconvertible_currencies():
+    total, rest = _engine().value(
+        {"USD": 1, "EUR": 10, "GBP": 5}, "USD", D(2024, 1, 2)
+    )
+    assert total == pytest.approx(12.0)
+    assert rest == {"GBP": 5}
+
+
+def test_series_slices_and_implies_prices():
+    engine = _engine()
+    dates, prices = engine.series("EUR", "USD", begin=D(2024, 2, 1))
+    assert dates.tolist() == [D(2024, 3, 1)]
+    dates, prices = engine.series("FUND", "USD")
+    assert dates.tolist() == [D(2024, 2, 1), D(2024, 3, 1)]
+    np.testing.assert_allclose(prices, [12.1, 13.2])
+
+
+def test_downsample_keeps_extremes():
+    dates = np.arange(10000).astype("datetime64[D]")
+    values = np.sin(np.arange(10000) / 100.0)
+    values[1234] = 5
+    small_dates, small_values = downsample(dates, values, 100)
+    assert len(small_dates) <= 100
+    assert np.all(np.diff(small_dates.astype(int)) > 0)
+    assert small_values.max() == 5
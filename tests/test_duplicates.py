@@ -0,0 +1,59 @@
+import datetime
+from types import SimpleNamespace
+
+import numpy as np
+
+from doudough.core.duplicates import find_duplicates, similarity
+from doudough.core.postings import ARRAYS, PostingsTable
+
+D = datetime.date
+
+
+def _txn(date, payee, narration):
+    return SimpleNamespace(date=date, payee=payee, narration=narration)
+
+
+def _generation(rows):
+    """rows: (date, payee, narration, account, amount), one posting each"""
+    n = len(rows)
+    arrays = {name: np.zeros(n) for name in ARRAYS}
+    arrays.update(
+        entry=np.arange(n, dtype=np.int32),
+        date=np.array([r[0] for r in rows], dtype="datetime64[D]"),
+        account=np.array([r[3] for r in rows], dtype=np.int32),
+        currency=np.zeros(n, dtype=np.int32),
+        number=np.array([r[4] for r in rows], dtype=np.float64),
+        entry_offsets=np.arange(n + 1),
+    )
+    strings = {"accounts": ["Assets:Bank", "Assets:Card"], "currencies": ["USD"]}
+    table = PostingsTable.from_arrays(arrays, {**strings, "payees": []})
+    entries = [_txn(*r[:3]) for r in rows]
+    return SimpleNamespace(postings=table, entries=entries)
+
+
+def test_similarity_compares_payee_in_narration():
+    a = _txn(D(2024, 1, 1), None, "AMAZON MKTPLACE 1234")
+    b = _txn(D(2024, 1, 1), "Amazon Mktplace", "")
+    assert similarity(a, b) > 0.8
+    c = _txn(D(2024, 1, 1), "Shell", "Fuel")
+    assert similarity(b, c) < 0.2
+
+
+def test_duplicates_are_blocked_by_account_amount_and_window():
+    generation = _generation(
+        [
+            (D(2024, 1, 1), "Coffee Shop", "Latte", 0, -4.5),
+            (D(2024, 1, 2), "COFFEE SHOP", "Latte", 0, -4.5),
+            # Same amount and text, other account
+            (D(2024, 1, 2), "Coffee Shop", "Latte", 1, -4.5),
+            # Same account and text, other amount
+            (D(2024, 1, 2), "Coffee Shop", "Latte", 0, -5.0),
+            # A month later
+            (D(2024, 2, 1), "Coffee Shop", "Latte", 0, -4.5),
+            # Same day and amount, but another payee
+            (D(2024, 1, 1), "Bookstore", "Novel", 0, -4.5),
+        ]
+    )
+    duplicates = find_duplicates(generation, range(6))
+    assert [(d.first, d.second, d.days) for d in duplicates] == [(0, 1, 1)]
+    assert find_duplicates(generation, [1, 2, 3, 4, 5]) == []
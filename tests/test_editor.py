@@ -0,0 +1,40 @@
+from datetime import date
+
+import pytest
+
+from doudough.core.editor import edit_header, parse_field, set_payee
+
+
+def test_set_payee_replaces_or_inserts_the_payee():
+    assert (
+        set_payee('2024-01-02 * "Shop" "Food" #tag ; note', "Market")
+        == '2024-01-02 * "Market" "Food" #tag ; note'
+    )
+    assert set_payee('2024-01-02 ! "Food"', 'Al "The" Shop') == (
+        '2024-01-02 ! "Al \\"The\\" Shop" "Food"'
+    )
+    assert set_payee('2024-01-02 txn "Shop" "Food"', None) == '2024-01-02 txn "Food"'
+
+
+def test_set_payee_ignores_other_directives():
+    assert set_payee("2024-01-02 open Assets:Cash", "Shop") is None
+
+
+def test_edit_header_changes_date_flag_and_narration():
+    header = '2024-01-02 * "Shop" "Food" ^link'
+    assert edit_header(header, date=date(2024, 2, 3), flag="!") == (
+        '2024-02-03 ! "Shop" "Food" ^link'
+    )
+    assert edit_header(header, narration="Groceries") == (
+        '2024-01-02 * "Shop" "Groceries" ^link'
+    )
+
+
+def test_parse_field_validates_values():
+    assert parse_field("date", "2024-01-02") == date(2024, 1, 2)
+    assert parse_field("flag", "txn") == "*"
+    assert parse_field("payee", "  ") is None
+    with pytest.raises(ValueError):
+        parse_field("flag", "**")
+    with pytest.raises(ValueError):
+        parse_field("postings", "")
@@ -0,0 +1,51 @@
+from types import SimpleNamespace
+
+import pytest
+
+from doudough.core.entries import EntryIndex
+
+
+def _entries(n):
+    return [SimpleNamespace(n=i) for i in range(n)]
+
+
+def test_ids_round_trip():
+    entries = _entries(3)
+    index = EntryIndex(entries, "a" * 32)
+    for i, entry in enumerate(entries):
+        assert index.position(entry) == i
+        assert index.get(index.entry_id(entry)) is entry
+    # Same files, same ids, in any process
+    assert EntryIndex(list(entries), "a" * 32).entry_id(entries[1]) == (
+        index.entry_id(entries[1])
+    )
+
+
+def test_ids_of_an_old_generation_are_unknown():
+    entries = _entries(3)
+    old = EntryIndex(entries, "a" * 32)
+    new = EntryIndex(entries[1:], "b" * 32)
+    entry_id = old.entry_id(entries[1])
+    with pytest.raises(KeyError):
+        new.get(entry_id)
+    with pytest.raises(KeyError):
+        old.get(old.key + "-3")
+
+
+def test_entries_outside_all_entries_can_not_be_looked_up():
+    index = EntryIndex(_entries(2), "a" * 32)
+    synthesized = SimpleNamespace(n=-1)
+    assert index.position(synthesized) is None
+    with pytest.raises(KeyError):
+        index.get(index.entry_id(synthesized))
+
+
+def test_replaced_keeps_the_other_positions():
+    entries = _entries(3)
+    index = EntryIndex(entries, "a" * 32)
+    patched = list(entries)
+    patched[1] = SimpleNamespace(n=10)
+    new = index.replaced(patched, "b" * 32, 1)
+    assert new.position(patched[1]) == 1
+    assert new.position(entries[1]) is None
+    assert new.get(new.entry_id(entries[2])) is entries[2]
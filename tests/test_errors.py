@@ -0,0 +1,54 @@
+from types import SimpleNamespace
+
+from doudough.core.errors import NONE, ErrorIndex
+
+
+class ParserError(SimpleNamespace):
+    pass
+
+
+class BalanceError(SimpleNamespace):
+    pass
+
+
+def _errors():
+    posting = SimpleNamespace(account="Assets:Bank")
+    return [
+        ParserError(source={"filename": "/books/main.beancount", "lineno": 3}),
+        BalanceError(
+            source={"filename": "/books/bank.beancount", "lineno": 10},
+            entry=SimpleNamespace(account="Assets:Bank"),
+        ),
+        BalanceError(
+            source={"filename": "/books/bank.beancount", "lineno": 20},
+            entry=SimpleNamespace(postings=[posting]),
+        ),
+        ParserError(source=None),
+    ]
+
+
+def test_grouping():
+    index = ErrorIndex(_errors(), root="/books")
+    assert len(index) == 4
+    assert index.counts["type"] == [("ParserError", 2), ("BalanceError", 2)]
+    assert index.counts["file"][0] == ("/books/bank.beancount", 2)
+    assert dict(index.counts["account"]) == {"Assets:Bank": 2, NONE: 2}
+    assert index.locations == [
+        "main.beancount:3",
+        "bank.beancount:10",
+        "bank.beancount:20",
+        NONE,
+    ]
+    assert index.select("type", "BalanceError") == [1, 2]
+    assert index.select("account", NONE) == [0, 3]
+    assert index.select("file", "/elsewhere") == []
+    assert index.select() == [0, 1, 2, 3]
+
+
+def test_paging():
+    index = ErrorIndex([ParserError(source=None)] * 5)
+    selection = index.select()
+    assert index.page(selection, 1, 2) == [0, 1]
+    assert index.page(selection, 3, 2) == [4]
+    assert index.page(selection, 4, 2) == []
+    assert index.page(selection, 0, 2) == [0, 1]
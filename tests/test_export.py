@@ -0,0 +1,68 @@
+import datetime
+from decimal import Decimal
+from types import SimpleNamespace
+
+from beancount.core.amount import Amount
+from beancount.core.data import Open, Posting, Transaction
+
+from doudough.core.entries import EntryIndex
+from doudough.core.postings import PostingsTable
+from doudough.export import COLUMNS, iter_chunks, write_csv
+
+D = datetime.date
+
+
+def _posting(account, number):
+    return Posting(account, Amount(number, "USD"), None, None, None, None)
+
+
+def _txn(day, payee, amount):
+    postings = [
+        _posting("Expenses:Food", Decimal(amount)),
+        _posting("Assets:Bank", -Decimal(amount)),
+    ]
+    return Transaction(
+        {}, D(2024, 1, day), "*", payee, "", frozenset(), frozenset(), postings
+    )
+
+
+def _generation(entries):
+    return SimpleNamespace(
+        entries=entries,
+        postings=PostingsTable(entries),
+        entry_index=EntryIndex(entries, "f" * 32),
+    )
+
+
+def test_chunks_follow_the_entries():
+    entries = [
+        Open({}, D(2024, 1, 1), "Assets:Bank", None, None),
+        _txn(2, "Bakery", "3.50"),
+        _txn(3, "Grocer", "20"),
+        _txn(4, "Bakery", "4"),
+    ]
+    generation = _generation(entries)
+    # eg. an opening balance synthesized by a time filter
+    summary = _txn(1, None, "100")
+
+    chunks = list(iter_chunks(generation, [summary, *entries], chunk_entries=2))
+    assert [chunk["payee"] for chunk in chunks] == [
+        [None, None],
+        ["Bakery", "Bakery", "Grocer", "Grocer"],
+        ["Bakery", "Bakery"],
+    ]
+    assert all(set(chunk) == set(COLUMNS) for chunk in chunks)
+    assert chunks[1]["date"][:3] == [D(2024, 1, 2), D(2024, 1, 2), D(2024, 1, 3)]
+    assert chunks[1]["number"][:2] == [3.5, -3.5]
+    assert chunks[0]["account"] == ["Expenses:Food", "Assets:Bank"]
+
+
+def test_csv_is_written_per_chunk():
+    entries = [_txn(2, "Bakery", "3.50"), _txn(3, "Grocer", "20")]
+    chunks = iter_chunks(_generation(entries), entries, chunk_entries=1)
+    parts = list(write_csv(chunks))
+    assert len(parts) == 2
+    lines = b"".join(parts).decode().splitlines()
+    assert lines[0] == ",".join(COLUMNS)
+    assert lines[1] == "2024-01-02,*,Bakery,,Expenses:Food,3.5,USD,3.5,USD,,"
+    assert len(lines) == 5
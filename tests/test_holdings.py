@@ -0,0 +1,106 @@
+import datetime
+from types import SimpleNamespace
+
+import numpy as np
+
+from doudough.core.holdings import by_commodity, holdings, lot_table
+from doudough.core.postings import PostingsTable
+
+D = datetime.date
+
+ACCOUNTS = ["Assets:Broker", "Assets:Bank", "Assets:Fund"]
+CURRENCIES = ["EUR", "FUND", "STOCK", "USD"]
+#: Prices of (base, quote)
+PRICES = {("STOCK", "USD"): 150.0}
+
+
+def _conversion():
+    def rates(base, quote, dates):
+        rate = 1.0 if base == quote else PRICES.get((base, quote), np.nan)
+        return np.full(len(dates), rate)
+
+    return SimpleNamespace(rates=rates)
+
+
+def _table(rows):
+    """rows: (date, account, units, currency, cost number, cost currency,
+    cost date), one posting per entry"""
+    n = len(rows)
+
+    def column(i, dtype, codes=None):
+        values = [r[i] if codes is None else codes.index(r[i]) for r in rows]
+        return np.array(values, dtype=dtype)
+
+    arrays = dict(
+        entry=np.arange(n, dtype=np.int32),
+        date=column(0, "datetime64[D]"),
+        account=column(1, np.int32, ACCOUNTS),
+        payee=np.full(n, -1, dtype=np.int32),
+        number=column(2, np.float64),
+        currency=column(3, np.int32, CURRENCIES),
+        weight=np.zeros(n),
+        weight_currency=np.zeros(n, dtype=np.int32),
+        cost_number=np.array(
+            [np.nan if r[4] is None else r[4] for r in rows], dtype=np.float64
+        ),
+        cost_currency=np.array(
+            [-1 if r[5] is None else CURRENCIES.index(r[5]) for r in rows],
+            dtype=np.int32,
+        ),
+        cost_date=np.array([r[6] or r[0] for r in rows], dtype="datetime64[D]"),
+        entry_offsets=np.arange(n + 1),
+    )
+    strings = {"accounts": ACCOUNTS, "currencies": CURRENCIES, "payees": []}
+    return PostingsTable.from_arrays(arrays, strings)
+
+
+LOTS = _table(
+    [
+        (D(2024, 1, 1), "Assets:Broker", 10, "STOCK", 100.0, "USD", D(2024, 1, 1)),
+        # Same lot, bought in two postings
+        (D(2024, 2, 1), "Assets:Broker", 5, "STOCK", 100.0, "USD", D(2024, 1, 1)),
+        (D(2024, 3, 1), "Assets:Broker", 4, "STOCK", 120.0, "USD", D(2024, 3, 1)),
+        (D(2024, 4, 1), "Assets:Broker", -4, "STOCK", 120.0, "USD", D(2024, 3, 1)),
+        (D(2024, 1, 1), "Assets:Bank", -1000, "USD", None, None, None),
+        (D(2024, 1, 1), "Assets:Fund", 2, "FUND", 50.0, "EUR", D(2024, 1, 1)),
+    ]
+)
+
+
+def test_lot_table_holds_postings_at_cost():
+    lots = lot_table(LOTS)
+    assert len(lots) == 5
+    assert "Assets:Bank" not in set(lots["account"].astype(str))
+
+
+def test_lots_are_summed_per_account_commodity_and_cost():
+    held = holdings(lot_table(LOTS), _conversion(), "USD", on=D(2024, 3, 15))
+    held = held.sort_values(["currency", "cost_number"]).reset_index(drop=True)
+    assert held["currency"].astype(str).tolist() == ["FUND", "STOCK", "STOCK"]
+    assert held["units"].tolist() == [2, 15, 4]
+    assert held["postings"].tolist() == [1, 2, 1]
+    assert held["book_value"].tolist() == [100, 1500, 480]
+    assert held["market_value"].tolist()[1:] == [2250, 600]
+    assert held["gain"].tolist()[1:] == [750, 120]
+    # No price of FUND, nor of EUR in USD
+    assert np.isnan(held["value"][0])
+
+
+def test_closed_lots_are_dropped():
+    held = holdings(lot_table(LOTS), _conversion(), "USD", on=D(2024, 4, 1))
+    assert sorted(held["units"].tolist()) == [2, 15]
+
+    held = holdings(
+        lot_table(LOTS), _conversion(), "USD", on=D(2024, 4, 1), account="Assets:Broker"
+    )
+    assert held["units"].tolist() == [15]
+
+
+def test_by_commodity():
+    held = holdings(lot_table(LOTS), _conversion(), "USD", on=D(2024, 3, 15))
+    summed = by_commodity(held).set_index("currency")
+    assert summed.loc["STOCK", "lots"] == 2
+    assert summed.loc["STOCK", "units"] == 19
+    assert summed.loc["STOCK", "value"] == 2850
+    assert not summed.loc["STOCK", "unpriced"]
+    assert summed.loc["FUND", "unpriced"]
@@ -0,0 +1,22 @@
+import importlib.util
+from pathlib import Path
+
+# The benchmark defines what is heavy, and how to tell it was imported
+_spec = importlib.util.spec_from_file_location(
+    "import_time", Path(__file__).parents[1] / "benchmarks" / "import_time.py"
+)
+import_time = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(import_time)
+
+
+def _imported(module: str) -> list:
+    _, _, heavy = import_time.import_time(module)
+    return heavy
+
+
+def test_cli_import_is_light():
+    assert _imported("doudough.cli") == []
+
+
+def test_app_defers_compute_dependencies():
+    assert _imported("doudough.app") == ["dash"]
@@ -0,0 +1,51 @@
+from doudough.core import get_generation
+from doudough.core.loader import LedgerLoader
+
+
+def _loader(reloads):
+    loader = LedgerLoader([], poll_watcher=True, warmup=False)
+    loader.reload = reloads.append
+    return loader
+
+
+def test_own_writes_do_not_reload(tmp_path):
+    main, other = tmp_path / "main.beancount", tmp_path / "other.beancount"
+    main.write_text("")
+    other.write_text("")
+    reloads = []
+    loader = _loader(reloads)
+
+    main.write_text("edited")
+    loader.wrote("main", [str(main)])
+    loader._files_changed("main", {str(main)})
+    assert reloads == []
+
+    # Another file changing in the same burst is not ignored
+    main.write_text("edited again")
+    loader.wrote("main", [str(main)])
+    other.write_text("outside edit")
+    loader._files_changed("main", {str(main), str(other)})
+    assert reloads == ["main"]
+
+    # Nor is a later outside change of a file doudough wrote
+    main.write_text("outside edit, longer")
+    loader._files_changed("main", {str(main)})
+    assert reloads == ["main", "main"]
+
+
+def test_eviction_frees_the_payee_index(tmp_path):
+    from doudough.core import payees
+
+    path = tmp_path / "main.beancount"
+    path.write_text(
+        "2024-01-01 open Assets:Bank\n2024-01-01 open Expenses:Food\n\n"
+        '2024-01-02 * "Corner Bakery" ""\n  Expenses:Food  5 USD\n  Assets:Bank\n'
+    )
+    loader = LedgerLoader([str(path)], poll_watcher=True, warmup=False)
+    slug = loader.first_slug()
+    ledger = loader[slug]
+    get_generation(ledger).payee_clusters
+    assert ledger.beancount_file_path in payees._INDEXES
+
+    loader.evict(slug)
+    assert ledger.beancount_file_path not in payees._INDEXES
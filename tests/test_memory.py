@@ -0,0 +1,16 @@
+import sys
+
+from doudough.core.memory import sampled_size
+
+
+def test_sampled_size_scales_up_the_sample():
+    items = [(str(i) * 10, [i]) for i in range(10000)]
+    exact = sampled_size(items, sample=len(items))
+    assert abs(sampled_size(items, sample=100) - exact) < exact * 0.1
+    # The list, its tuples, their strings, lists and ints
+    assert exact > sys.getsizeof(items) + len(items) * sys.getsizeof(("", []))
+
+
+def test_shared_objects_are_counted_once():
+    shared = "x" * 10000
+    assert sampled_size([(shared,)] * 100) < 2 * len(shared)
@@ -0,0 +1,75 @@
+import logging
+
+import pytest
+
+from doudough.core import warmup
+from doudough.core.loader import LedgerLoader
+from doudough.pages.app_shell import controls
+
+LEDGER = """
+option "title" "Two currencies"
+option "operating_currency" "USD"
+
+2024-01-01 open Assets:Bank USD
+2024-01-01 open Assets:Euro EUR
+2024-01-01 open Assets:Pound GBP
+2024-01-01 open Income:Salary USD
+2024-01-01 open Expenses:Food
+2024-01-01 open Expenses:Travel
+
+2024-01-01 price EUR 1.10 USD
+; Only through EUR
+2024-01-01 price GBP 1.20 EUR
+
+2024-01-05 * "Employer" "Salary"
+  Income:Salary  -1000 USD
+  Assets:Bank
+
+2024-01-10 * "Bakery" "Bread"
+  Expenses:Food  5 USD
+  Assets:Bank
+
+2024-02-10 * "Hotel" "Trip"
+  Expenses:Travel  100 EUR
+  Assets:Euro
+
+2024-03-10 * "Inn" "Trip"
+  Expenses:Travel  10 GBP
+  Assets:Pound
+"""
+
+
+@pytest.fixture
+def loader(tmp_path, monkeypatch):
+    path = tmp_path / "main.beancount"
+    path.write_text(LEDGER)
+    loader = LedgerLoader([str(path)], poll_watcher=True, warmup=False)
+    monkeypatch.setattr(controls, "LEDGER_LOADER", loader)
+    return loader
+
+
+@pytest.fixture
+def context(loader):
+    return controls.Context(bfile=loader.first_slug())
+
+
+def test_hierarchy_is_in_the_operating_currency(context):
+    expenses = context.hierarchy("Expenses")
+    travel = {node.account: node for node in expenses.children}["Expenses:Travel"]
+    assert travel.balance.keys() == {"USD"}
+    assert float(travel.balance["USD"]) == pytest.approx(100 * 1.1 + 10 * 1.2 * 1.1)
+    assert float(expenses.balance_children["USD"]) == pytest.approx(5 + 123.2)
+
+
+def test_warm_ups_succeed(loader, caplog):
+    # Registers the pages, and with them their warm-ups
+    import doudough.app  # noqa: F401
+
+    assert warmup.VIEWS
+    slug = loader.first_slug()
+    loader[slug]
+    with caplog.at_level(logging.INFO, logger=warmup.__name__):
+        warmup.WarmupScheduler(loader).warm(slug)
+    failures = [r for r in caplog.records if r.levelno >= logging.WARNING]
+    assert failures == []
+    assert "Warmed up" in caplog.text
@@ -0,0 +1,27 @@
+from doudough.core.payees import PayeeIndex
+
+
+def test_clusters_near_duplicate_payees():
+    payees = [
+        "AMAZON MKTP US*2K4",
+        "Amazon Mktp US*9Z1",
+        "AMAZON MKTP US",
+        "Whole Foods Market #123",
+        "WHOLE FOODS MARKET 456",
+        "Shell Oil",
+    ]
+    index = PayeeIndex()
+    assert index.update(payees[:4]) == 4
+    # Only the new payees are indexed on a reload
+    assert index.update(payees) == 2
+
+    clusters = sorted(index.clusters(payees))
+    assert clusters == [sorted(payees[:3]), sorted(payees[3:5])]
+    # Payees no longer in the ledger are left out
+    assert index.clusters(payees[1:4]) == [sorted(payees[1:3])]
+
+
+def test_payees_without_text_are_not_clustered():
+    index = PayeeIndex()
+    assert index.update(["1234", "5678", "#12", "Ab", "Shell Oil"]) == 1
+    assert index.clusters(["1234", "5678", "#12", "Ab", "Shell Oil"]) == []
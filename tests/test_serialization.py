@@ -0,0 +1,11 @@
+import orjson
+
+from doudough.serialization import to_json
+
+
+def test_output_is_safe_in_html():
+    text = "</script><b>\u2028\u2029"
+    encoded = to_json({"text": text})
+    for unsafe in "<>/\u2028\u2029":
+        assert unsafe not in encoded
+    assert orjson.loads(encoded) == {"text": text}
@@ -0,0 +1,68 @@
+import threading
+import time
+
+from doudough.core.singleflight import SingleFlight, hashable
+
+THREADS = 5
+
+
+def _concurrently(flight, key, func):
+    """flight.do(key, func) from THREADS threads, all calling before func returns"""
+    results = []
+
+    def run():
+        try:
+            results.append(flight.do(key, func))
+        except Exception as e:
+            results.append(e)
+
+    threads = [threading.Thread(target=run) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    return results
+
+
+def _waiting_for(flight, count):
+    """A function which returns once count callers are waiting on it"""
+    calls = []
+
+    def func():
+        calls.append(None)
+        while flight.stats()["calls"] < count:
+            time.sleep(0.01)
+        return len(calls)
+
+    return func, calls
+
+
+def test_concurrent_calls_share_one_computation():
+    flight = SingleFlight()
+    func, calls = _waiting_for(flight, THREADS)
+    assert _concurrently(flight, "key", func) == [1] * THREADS
+    assert len(calls) == 1
+    assert flight.stats() == {"calls": THREADS, "shared": THREADS - 1}
+
+    # Nothing is kept once the call returns
+    assert flight.do("key", lambda: "again") == "again"
+
+
+def test_errors_are_shared():
+    flight = SingleFlight()
+    func, calls = _waiting_for(flight, THREADS)
+
+    def failing():
+        func()
+        raise ValueError("boom")
+
+    results = _concurrently(flight, "key", failing)
+    assert len(calls) == 1
+    assert len(results) == THREADS
+    assert all(isinstance(r, ValueError) for r in results)
+
+
+def test_hashable():
+    assert hashable(("a", 1)) == ("a", 1)
+    assert hashable(["a", {"b": 1, "a": 2}]) == hashable(["a", {"a": 2, "b": 1}])
+    hash(hashable(["a"]))
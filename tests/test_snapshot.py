@@ -0,0 +1,93 @@
+import datetime
+import os
+
+import numpy as np
+from beancount.core.amount import Amount
+from beancount.core.data import Posting, Transaction
+from beancount.core.number import D
+
+from doudough.core.postings import ARRAYS, PostingsTable
+from doudough.core.snapshot import fingerprint, load, save, shared_postings
+
+
+def _txn(*accounts):
+    postings = [
+        Posting(account, Amount(D(1), "USD"), None, None, None, None)
+        for account in accounts
+    ]
+    return Transaction(
+        {}, datetime.date(2024, 1, 1), "*", None, "", frozenset(), frozenset(), postings
+    )
+
+
+def test_fingerprint_changes_with_files_and_postings(tmp_path):
+    path = tmp_path / "main.beancount"
+    path.write_text("2024-01-01 open Assets:Bank\n")
+    entries = [_txn("Assets:Bank", "Income:Salary")]
+
+    first = fingerprint([str(path)], entries)
+    assert len(first) == 32
+    assert fingerprint([str(path)], list(entries)) == first
+
+    # Another number of postings
+    assert fingerprint([str(path)], [_txn("Assets:Bank")]) != first
+    # Another size of the file
+    path.write_text("2024-01-01 open Assets:Bank USD\n")
+    assert fingerprint([str(path)], entries) != first
+    # Another modification time of the file, same size
+    changed = fingerprint([str(path)], entries)
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert fingerprint([str(path)], entries) != changed
+    # A missing file
+    assert fingerprint([str(tmp_path / "gone")], entries) != changed
+
+
+def _table():
+    n = 3
+    arrays = {name: np.zeros(n) for name in ARRAYS}
+    arrays.update(
+        entry=np.array([0, 0, 2], dtype=np.int32),
+        date=np.array(["2024-01-01"] * n, dtype="datetime64[D]"),
+        account=np.array([0, 1, 0], dtype=np.int32),
+        payee=np.array([0, 0, -1], dtype=np.int32),
+        number=np.array([1.5, -1.5, np.nan]),
+        currency=np.zeros(n, dtype=np.int32),
+        entry_offsets=np.array([0, 2, 2, 3]),
+    )
+    strings = {
+        "accounts": ["Assets:Bank", "Income:Salary"],
+        "currencies": ["USD"],
+        "payees": ["Employer"],
+    }
+    return PostingsTable.from_arrays(arrays, strings)
+
+
+def test_save_and_map_round_trip(tmp_path):
+    table = _table()
+    directory = str(tmp_path / "ledger-snapshot")
+    save(table, directory)
+    assert [p for p in os.listdir(tmp_path) if p.startswith(".")] == []
+
+    mapped = load(directory)
+    for name in ARRAYS:
+        assert isinstance(getattr(mapped, name), np.memmap)
+        np.testing.assert_array_equal(getattr(mapped, name), getattr(table, name))
+    assert mapped.accounts.lookup([1, 0]) == ["Income:Salary", "Assets:Bank"]
+    assert mapped.payees.lookup([0, -1]) == ["Employer", None]
+    assert mapped.rows([2]).tolist() == [2]
+
+
+def test_shared_postings_replaces_stale_snapshots(tmp_path):
+    root = str(tmp_path)
+    shared_postings(root, "ledger", "a" * 32, [])
+    first = os.path.join(root, "ledger-" + "a" * 32)
+    built = os.stat(first).st_mtime_ns
+    # Another worker with the same version maps the same snapshot
+    shared_postings(root, "ledger", "a" * 32, [])
+    assert os.stat(first).st_mtime_ns == built
+
+    shared_postings(root, "ledger", "b" * 32, [])
+    assert sorted(p for p in os.listdir(root) if not p.endswith(".lock")) == [
+        "ledger-" + "b" * 32
+    ]
@@ -0,0 +1,35 @@
+from doudough.core.source import SourceFile
+
+LEDGER = """option "title" "Test"
+
+2020-01-01 open Assets:Cash
+2020-01-02 * "Payee" "Narration"
+  Assets:Cash  -1 USD
+  Expenses:Food
+\t
+2020-01-03 * "Other"
+  Assets:Cash  -1 USD
+  Expenses:Food
+; comment
+2020-01-04 balance Assets:Cash -2 USD
+"""
+
+
+def test_source_file_extents(tmp_path):
+    path = tmp_path / "test.beancount"
+    path.write_text(LEDGER)
+
+    source = SourceFile(str(path))
+    offsets, lengths = source.extents([3, 4, 8, 12])
+    sources = [source.read(o, l) for o, l in zip(offsets, lengths)]
+
+    assert sources == [
+        "2020-01-01 open Assets:Cash",
+        '2020-01-02 * "Payee" "Narration"\n  Assets:Cash  -1 USD\n  Expenses:Food',
+        '2020-01-03 * "Other"\n  Assets:Cash  -1 USD\n  Expenses:Food',
+        "2020-01-04 balance Assets:Cash -2 USD",
+    ]
+    assert source.is_current()
+
+    path.write_text(LEDGER + "\n")
+    assert not source.is_current()
@@ -0,0 +1,65 @@
+from datetime import date
+from decimal import Decimal
+
+from fava.util.date import Interval
+
+from doudough.pages.utils import (
+    MAX_INTERVALS,
+    bar_budget,
+    coarsen_series,
+    lod_interval,
+    parse_relayout_range,
+    snap_window,
+)
+
+
+def test_coarsen_series_preserves_totals():
+    x = list(range(10))
+    y = [Decimal(i) / 3 for i in range(10)]
+    cx, cy, step = coarsen_series(x, y, 4)
+
+    assert step == 3
+    assert cx == [0, 3, 6, 9]
+    assert sum(cy) == sum(y)
+
+    assert coarsen_series(x, y, 10) == (x, y, 1)
+
+
+def test_lod_interval():
+    begin, end = date(2000, 1, 1), date(2020, 1, 1)
+
+    assert lod_interval(Interval.DAY, begin, end, 10000) == Interval.DAY
+    assert lod_interval(Interval.DAY, begin, end, 300) == Interval.MONTH
+    assert lod_interval(Interval.DAY, begin, end, 5) == Interval.YEAR
+    # Never finer than requested
+    assert lod_interval(Interval.QUARTER, begin, end, 10000) == Interval.QUARTER
+    # Counting the partial intervals at both ends
+    assert lod_interval(Interval.DAY, date(2020, 1, 1), date(2020, 4, 10), 100) == (
+        Interval.WEEK
+    )
+
+
+def test_bar_budget_is_capped_by_fava():
+    assert bar_budget(400) == 100 == MAX_INTERVALS
+    assert bar_budget(10000) == MAX_INTERVALS
+    assert bar_budget(40) == 10
+
+
+def test_snap_window():
+    assert snap_window(date(2020, 3, 15), date(2020, 5, 2), Interval.MONTH) == (
+        date(2020, 3, 1),
+        date(2020, 5, 31),
+    )
+    assert snap_window(date(2020, 3, 1), date(2020, 3, 31), Interval.MONTH) == (
+        date(2020, 3, 1),
+        date(2020, 3, 31),
+    )
+
+
+def test_parse_relayout_range():
+    assert parse_relayout_range(None) is None
+    assert parse_relayout_range({"autosize": True}) is None
+    assert parse_relayout_range({"xaxis.autorange": True}) is None
+    assert parse_relayout_range(
+        {"xaxis.range[0]": "2020-01-03 12:00", "xaxis.range[1]": "2020-03-01"}
+    ) == (date(2020, 1, 3), date(2020, 3, 1))
@@ -0,0 +1,34 @@
+import time
+
+from doudough.core.watcher import create_watcher
+
+
+def _burst(tmp_path, poll):
+    path = tmp_path / "main.beancount"
+    path.write_text("")
+    calls = []
+    watcher = create_watcher(
+        lambda key, paths: calls.append((key, paths)),
+        poll=poll,
+        debounce=0.2,
+        interval=0.05,
+    )
+    watcher.watch("ledger", [str(path)])
+    time.sleep(0.1)
+
+    for i in range(5):
+        path.write_text("x" * (i + 1))
+        time.sleep(0.05)
+    (tmp_path / "unrelated.txt").write_text("")
+    time.sleep(0.6)
+    return calls, str(path)
+
+
+def test_polling_watcher_coalesces_bursts(tmp_path):
+    calls, path = _burst(tmp_path, poll=True)
+    assert calls == [("ledger", {path})]
+
+
+def test_watcher_coalesces_bursts(tmp_path):
+    calls, path = _burst(tmp_path, poll=False)
+    assert calls == [("ledger", {path})]